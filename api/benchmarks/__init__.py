@@ -0,0 +1 @@
+"""API benchmarks and load testing, run as scripts from the api folder (see each module)."""
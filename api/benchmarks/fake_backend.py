@@ -0,0 +1,126 @@
+"""
+Fake pipeline and analysis backends for load testing the API offline.
+
+Selected through the API's extension points:
+    PIPELINE_JOB=benchmarks.fake_backend:run_fake_pipeline_job
+    ANALYSIS_CLIENT=benchmarks.fake_backend:FakeAnalysisClient
+
+FAKE_PIPELINE_PROFILE (JSON) sets how a job behaves:
+    mode       "sleep" (waits, like a GPU-bound job) or "cpu" (burns a core)
+    seconds    job duration, default 2.0
+    jitter     +- share of seconds picked at random per job, default 0.25
+    frames     frame count reported to the API, default 750
+    fail_rate  share of jobs that fail, default 0.0
+FAKE_ANALYSIS_SECONDS sets how long an analysis call blocks, default 1.5.
+"""
+import json
+import os
+import random
+import struct
+import time
+import zlib
+from types import SimpleNamespace
+
+DEFAULT_PROFILE = {"mode": "sleep", "seconds": 2.0, "jitter": 0.25, "frames": 750, "fail_rate": 0.0}
+
+# Same names the render stage writes
+IMAGE_NAMES = [
+    f"team{team}_formation_{label}.png" for team in (1, 2) for label in ("start", "middle", "end")
+] + [f"formations_comparison_{label}.png" for label in ("start", "middle", "end")]
+
+DIAGRAM_SIZE = (960, 540)
+
+
+def get_profile() -> dict:
+    return {**DEFAULT_PROFILE, **json.loads(os.getenv("FAKE_PIPELINE_PROFILE", "{}"))}
+
+
+def encode_png(width: int, height: int, rows) -> bytes:
+    """PNG bytes for 8-bit RGB rows, standard library only."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    raw = b"".join(b"\x00" + row for row in rows)
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6))
+            + chunk(b"IEND", b""))
+
+
+def make_diagram(seed: int, width: int = DIAGRAM_SIZE[0], height: int = DIAGRAM_SIZE[1]) -> bytes:
+    """Pitch-green image with mowing stripes and 22 player dots, roughly the size of a real diagram."""
+    rng = random.Random(seed)
+    players = [(rng.randrange(20, width - 20), rng.randrange(20, height - 20)) for _ in range(22)]
+    rows = []
+    for y in range(height):
+        row = bytearray((bytes((34, 139, 34)) if (y // 40) % 2 else bytes((40, 150, 40))) * width)
+        for px, py in players:
+            if abs(y - py) < 10:
+                for x in range(px - 10, px + 10):
+                    row[3 * x:3 * x + 3] = b"\xff\xff\xff"
+        rows.append(bytes(row))
+    return encode_png(width, height, rows)
+
+
+def run_fake_pipeline_job(config_kwargs: dict) -> dict:
+    """
+    Stand-in for run_pipeline_job: waits or burns CPU per FAKE_PIPELINE_PROFILE, honours
+    the cancel file, then writes synthetic diagrams and results.json to the output dir
+    """
+    started_at = time.time()
+    cpu_start = time.process_time()
+    profile = get_profile()
+    seconds = profile["seconds"] * (1 + random.uniform(-profile["jitter"], profile["jitter"]))
+    cancel_path = config_kwargs.get("cancel_path")
+    # the real pipeline reads its video in every stage, a job whose upload went missing fails
+    video_path = config_kwargs["video_path"]
+    if not os.path.exists(video_path):
+        return {"timed_out": False, "error": f"OSError: Could not open video: {video_path}",
+                "started_at": started_at, "stages": []}
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if cancel_path and os.path.exists(cancel_path):
+            return {"cancelled": True, "error": "Pipeline cancelled during fake stage", "started_at": started_at,
+                    "stages": []}
+        if profile["mode"] == "cpu":
+            slice_end = min(deadline, time.perf_counter() + 0.05)
+            while time.perf_counter() < slice_end:
+                sum(i * i for i in range(1000))
+        else:
+            time.sleep(min(0.05, max(0.0, deadline - time.perf_counter())))
+
+    stages = [{"stage": "fake", "calls": 1, "wall_s": round(seconds, 3),
+               "cpu_s": round(time.process_time() - cpu_start, 3), "items": profile["frames"],
+               "items_per_s": round(profile["frames"] / seconds, 2), "peak_rss_mb": None}]
+    if not os.path.exists(video_path):
+        return {"timed_out": False, "error": f"OSError: Could not open video: {video_path}",
+                "started_at": started_at, "stages": stages}
+    if random.random() < profile["fail_rate"]:
+        return {"timed_out": False, "error": "FakeError: injected failure", "started_at": started_at, "stages": stages}
+
+    output_dir = config_kwargs["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    for i, name in enumerate(IMAGE_NAMES):
+        width = 2 * DIAGRAM_SIZE[0] if name.startswith("formations_comparison") else DIAGRAM_SIZE[0]
+        with open(os.path.join(output_dir, name), "wb") as f:
+            f.write(make_diagram(i, width=width))
+    with open(os.path.join(output_dir, "results.json"), "w") as f:
+        json.dump({"version": 1, "video": {"frame_count": profile["frames"]}, "possession": {}, "formations": []}, f)
+
+    return {"images": IMAGE_NAMES, "data_files": ["results.json"], "frames": profile["frames"],
+            "started_at": started_at, "stages": stages}
+
+
+class FakeCompletions:
+    def create(self, **kwargs):
+        # blocks like the real (synchronous) SDK call does
+        time.sleep(float(os.getenv("FAKE_ANALYSIS_SECONDS", "1.5")))
+        content = "## TEAM 1 ANALYSIS\n\n### Formation\n4-4-2\n\n## TEAM 2 ANALYSIS\n\n### Formation\n4-3-3\n"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class FakeAnalysisClient:
+    """Offline stand-in for openai.OpenAI, only chat.completions.create is used by the API."""
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=FakeCompletions())
@@ -0,0 +1,331 @@
+"""
+API load test with a fake pipeline and a fake analysis backend, fully offline.
+
+Starts the API under uvicorn with the fakes from benchmarks/fake_backend.py and
+throwaway input/result folders, runs a scenario with concurrent virtual users and
+prints p50/p95/p99 latency and throughput per endpoint as JSON.
+
+Scenarios:
+    full      upload, poll status until done, list results, download images, analyze, cleanup
+    upload    uploads only (every upload queues a fake job)
+    poll      GET /status on tasks finished during setup
+    download  GET /download of finished tasks' images
+    analyze   POST /analyze, each call on a task not analyzed yet (the API caches analyses)
+    concurrent  every user uploads once at the same time and waits for its job, exits with
+              status 1 unless all jobs completed (jobs must not disturb each other's uploads)
+
+Usage (from the api folder, needs httpx):
+    python benchmarks/load_test.py --scenario full --users 8 --duration 30
+    python benchmarks/load_test.py --scenario poll --users 50 --duration 10
+    python benchmarks/load_test.py --scenario full --pipeline-mode cpu --pipeline-seconds 3 --workers 2
+    python benchmarks/load_test.py --scenario concurrent --users 2 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = ["full", "upload", "poll", "download", "analyze", "concurrent"]
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, seconds):
+    values = sorted(latencies)
+    to_ms = lambda value: None if value is None else round(1000 * value, 2)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / seconds, 2) if seconds > 0 else None,
+        "p50_ms": to_ms(percentile(values, 50)),
+        "p95_ms": to_ms(percentile(values, 95)),
+        "p99_ms": to_ms(percentile(values, 99)),
+        "max_ms": to_ms(values[-1] if values else None),
+    }
+
+
+class Recorder:
+    """Latency and error count per endpoint (method and route template)."""
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.job_seconds = []
+        self.job_statuses = defaultdict(int)
+        self.iterations = 0
+
+    async def request(self, client, method, url, route, expected=(200,), **kwargs):
+        endpoint = f"{method} {route}"
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[endpoint].append(time.perf_counter() - start)
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code not in expected:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self, seconds):
+        endpoints = {
+            endpoint: summarize(latencies, self.errors[endpoint], seconds)
+            for endpoint, latencies in sorted(self.latencies.items())
+        }
+        all_latencies = [value for latencies in self.latencies.values() for value in latencies]
+        return {
+            "seconds": round(seconds, 3),
+            "iterations": self.iterations,
+            "total": summarize(all_latencies, sum(self.errors.values()), seconds),
+            "endpoints": endpoints,
+            "job_seconds": summarize(self.job_seconds, 0, seconds) if self.job_seconds else None,
+            "job_statuses": dict(self.job_statuses),
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url, args):
+        self.base_url = base_url
+        self.args = args
+        self.video = os.urandom(args.video_kb * 1024)
+        self.recorder = Recorder()
+
+    async def upload(self, client):
+        response = await self.recorder.request(
+            client, "POST", "/upload-video", "/upload-video",
+            files={"video": (f"load_{time.perf_counter_ns()}.mp4", self.video, "video/mp4")}
+        )
+        return None if response is None or response.status_code != 200 else response.json()["task_id"]
+
+    async def wait_for_task(self, client, task_id):
+        """Poll /status until the job finishes, returns the final status"""
+        start = time.perf_counter()
+        while True:
+            response = await self.recorder.request(client, "GET", f"/status/{task_id}", "/status/{task_id}")
+            if response is not None and response.status_code == 200:
+                status = response.json()["status"]
+                if status in FINISHED_STATUSES:
+                    self.recorder.job_seconds.append(time.perf_counter() - start)
+                    self.recorder.job_statuses[status] += 1
+                    return status
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def download_results(self, client, task_id):
+        response = await self.recorder.request(client, "GET", f"/results/{task_id}", "/results/{task_id}")
+        if response is None or response.status_code != 200:
+            return
+        for filename in response.json()["image_filenames"][:self.args.downloads]:
+            await self.recorder.request(client, "GET", f"/download/{task_id}/{filename}",
+                                        "/download/{task_id}/{filename}")
+
+    async def analyze(self, client, task_id):
+        await self.recorder.request(client, "POST", f"/analyze/{task_id}", "/analyze/{task_id}")
+
+    async def cleanup(self, client, task_id):
+        await self.recorder.request(client, "DELETE", f"/cleanup/{task_id}", "/cleanup/{task_id}")
+
+    async def full_iteration(self, client, _):
+        task_id = await self.upload(client)
+        if task_id is None:
+            return
+        if await self.wait_for_task(client, task_id) == "completed":
+            await self.download_results(client, task_id)
+            await self.analyze(client, task_id)
+        await self.cleanup(client, task_id)
+
+    async def concurrent_iteration(self, client, _):
+        task_id = await self.upload(client)
+        if task_id is not None:
+            await self.wait_for_task(client, task_id)
+        else:
+            self.recorder.job_statuses["upload failed"] += 1
+        raise StopAsyncIteration
+
+    async def upload_iteration(self, client, _):
+        await self.upload(client)
+
+    async def poll_iteration(self, client, task_ids):
+        task_id = task_ids[self.recorder.iterations % len(task_ids)]
+        await self.recorder.request(client, "GET", f"/status/{task_id}", "/status/{task_id}")
+
+    async def download_iteration(self, client, task_ids):
+        task_id = task_ids[self.recorder.iterations % len(task_ids)]
+        await self.download_results(client, task_id)
+
+    async def analyze_iteration(self, client, task_ids):
+        if not task_ids:
+            raise StopAsyncIteration
+        await self.analyze(client, task_ids.pop())
+
+    async def setup_tasks(self, client, count):
+        """Finished tasks for the poll, download and analyze scenarios, not measured"""
+        recorder, self.recorder = self.recorder, Recorder()
+        try:
+            task_ids = []
+            for _ in range(count):
+                task_id = await self.upload(client)
+                if task_id is not None:
+                    task_ids.append(task_id)
+            statuses = await asyncio.gather(*(self.wait_for_task(client, task_id) for task_id in task_ids))
+            return [task_id for task_id, status in zip(task_ids, statuses) if status == "completed"]
+        finally:
+            self.recorder = recorder
+
+    async def user(self, client, iteration, state, deadline):
+        while time.perf_counter() < deadline:
+            if self.args.iterations and self.recorder.iterations >= self.args.iterations:
+                return
+            try:
+                await iteration(client, state)
+            except StopAsyncIteration:
+                return
+            self.recorder.iterations += 1
+
+    async def run(self):
+        args = self.args
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=args.request_timeout) as client:
+            state = None
+            if args.scenario in ("poll", "download", "analyze"):
+                count = args.setup_tasks or (args.users * 4 if args.scenario == "analyze" else min(args.users, 8))
+                print(f"Setting up {count} finished tasks...", file=sys.stderr)
+                state = await self.setup_tasks(client, count)
+
+            iteration = getattr(self, f"{args.scenario}_iteration")
+            print(f"Running {args.scenario} with {args.users} users for {args.duration}s...", file=sys.stderr)
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(self.user(client, iteration, state, deadline) for _ in range(args.users)))
+            return self.recorder.report(time.perf_counter() - start)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(args, work_dir):
+    """uvicorn running the API with the fake backends, returns (process, base url)"""
+    port = get_free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(API_DIR)] + [p for p in [os.getenv("PYTHONPATH")] if p]),
+        "PIPELINE_JOB": "benchmarks.fake_backend:run_fake_pipeline_job",
+        "ANALYSIS_CLIENT": "benchmarks.fake_backend:FakeAnalysisClient",
+        "INPUT_DIR": str(work_dir / "input_videos"),
+        "TEMP_RESULTS_DIR": str(work_dir / "temp_results"),
+        "PROCESSING_WORKERS": str(args.workers),
+        # the fake jobs never detect, no inference server to start
+        "SHARED_INFERENCE": "0",
+        "FAKE_PIPELINE_PROFILE": json.dumps({
+            "mode": args.pipeline_mode,
+            "seconds": args.pipeline_seconds,
+            "jitter": args.pipeline_jitter,
+            "fail_rate": args.fail_rate,
+        }),
+        "FAKE_ANALYSIS_SECONDS": str(args.analysis_seconds),
+    }
+    (work_dir / "input_videos").mkdir(parents=True)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=None if args.server_logs else subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"API exited with status {process.returncode} during startup")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("API did not answer /health within 30s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the API with fake pipeline and analysis backends")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="full")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run the scenario")
+    parser.add_argument("--iterations", type=int, default=None, help="Stop after this many iterations in total")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between status polls")
+    parser.add_argument("--downloads", type=int, default=3, help="Images downloaded per finished task")
+    parser.add_argument("--setup-tasks", type=int, default=None,
+                        help="Finished tasks created before poll, download and analyze scenarios")
+    parser.add_argument("--video-kb", type=int, default=512, help="Size of each uploaded (random) video")
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=1, help="PROCESSING_WORKERS of the API")
+    parser.add_argument("--pipeline-mode", choices=["sleep", "cpu"], default="sleep",
+                        help="Fake jobs wait (GPU-like) or burn a CPU core")
+    parser.add_argument("--pipeline-seconds", type=float, default=2.0, help="Fake job duration")
+    parser.add_argument("--pipeline-jitter", type=float, default=0.25, help="+- share of the job duration")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of fake jobs that fail")
+    parser.add_argument("--analysis-seconds", type=float, default=1.5, help="Fake analysis call duration")
+    parser.add_argument("--url", default=None,
+                        help="Load test an API that is already running (with its own backends) instead")
+    parser.add_argument("--server-logs", action="store_true", help="Show the API's log output")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    process = None
+    work_dir = Path(tempfile.mkdtemp(prefix="api_load_test_"))
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            process, base_url = start_api(args, work_dir)
+        report = asyncio.run(LoadTest(base_url, args).run())
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "server_logs")}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.scenario == "concurrent" and report["job_statuses"] != {"completed": args.users}:
+        sys.exit(f"Concurrent jobs did not all complete: {report['job_statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+API cold start benchmark.
+
+Starts fresh interpreters that import the API and answer GET /health, which is the
+work every uvicorn worker does before it can serve its first request, and prints
+the timings as JSON.
+
+Usage (from the api folder):
+    python benchmarks/startup_benchmark.py --runs 10 --max-seconds 1.0
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+# Runs inside each fresh interpreter, timings are measured from inside the process
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+client_ready = time.perf_counter()
+response = client.get("/health")
+answered = time.perf_counter()
+heavy = [m for m in ("cv2", "torch", "ultralytics", "supervision", "sklearn", "openai") if m in sys.modules]
+print(json.dumps({
+    "import_s": imported - start,
+    "first_request_s": answered - client_ready,
+    "status_code": response.status_code,
+    "heavy_modules_loaded": heavy,
+}))
+"""
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "median": round(statistics.median(values), 4),
+        "p95": round(values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))], 4),
+        "max": round(values[-1], 4),
+    }
+
+
+def run_once():
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    wall = time.perf_counter() - start
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_wall_s"] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API cold start time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to start")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="Exit with status 1 if the median import + first request time exceeds this")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    startup = [run["import_s"] + run["first_request_s"] for run in runs]
+
+    report = {
+        "runs": args.runs,
+        "import_s": summarize([run["import_s"] for run in runs]),
+        "first_request_s": summarize([run["first_request_s"] for run in runs]),
+        "startup_s": summarize(startup),
+        "process_wall_s": summarize([run["process_wall_s"] for run in runs]),
+        "heavy_modules_loaded": sorted({m for run in runs for m in run["heavy_modules_loaded"]}),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.max_seconds is not None and report["startup_s"]["median"] > args.max_seconds:
+        print(f"Startup median {report['startup_s']['median']}s exceeds {args.max_seconds}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
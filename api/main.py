@@ -1,16 +1,27 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 import shutil
-import subprocess
 import uuid
 import os
+import sys
 from typing import Dict, List, Optional
 import logging
 import base64
-from openai import OpenAI
+import json
+import asyncio
+import hashlib
+import mimetypes
+from functools import lru_cache
 from dotenv import load_dotenv
+import importlib
+import importlib.util
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+import multiprocessing
+import metrics
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,51 +30,48 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client (set API key via environment variable OPENAI_API_KEY)
+# OpenAI client (set API key via environment variable OPENAI_API_KEY), created on
+# first use so the SDK isn't imported while the API starts
 openai_client = None
-try:
-    openai_client = OpenAI()
-    logger.info("OpenAI client initialized ✓")
-except Exception as e:
-    logger.warning(f"OpenAI client not initialized: {e}")
-    logger.warning("Set OPENAI_API_KEY environment variable to enable AI analysis")
-
-# Check and install backend dependencies if needed
-def ensure_backend_dependencies():
-    """Ensure backend dependencies are installed in the current Python environment."""
-    import sys
-    import subprocess
-    from pathlib import Path
-    
-    backend_requirements = Path(__file__).parent.parent / "backend" / "requirements.txt"
-    
-    if not backend_requirements.exists():
-        logger.warning(f"Backend requirements.txt not found at {backend_requirements}")
-        return
-    
-    # Try importing a key backend dependency to check if installed
-    try:
-        import cv2
-        import supervision
-        from ultralytics import YOLO
-        logger.info("Backend dependencies already installed ✓")
-    except ImportError as e:
-        logger.warning(f"Backend dependencies not found: {e}")
-        logger.info("Installing backend dependencies...")
+
+
+# Stand-in for the OpenAI client as "module:attribute" (a class or factory with the same
+# chat.completions.create), used by the load test to run offline
+ANALYSIS_CLIENT = os.getenv("ANALYSIS_CLIENT")
+
+
+def load_object(reference: str):
+    """Import "module:attribute"."""
+    module_name, _, attribute = reference.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def get_openai_client():
+    """Return the OpenAI client, initializing it on first call. None if not configured."""
+    global openai_client
+    if openai_client is None:
         try:
-            subprocess.run(
-                [sys.executable, "-m", "pip", "install", "-r", str(backend_requirements)],
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            logger.info("Backend dependencies installed successfully ✓")
-        except subprocess.CalledProcessError as install_error:
-            logger.error(f"Failed to install backend dependencies: {install_error}")
-            logger.error("Please manually run: pip install -r backend/requirements.txt")
+            if ANALYSIS_CLIENT:
+                openai_client = load_object(ANALYSIS_CLIENT)()
+            else:
+                from openai import OpenAI
+                openai_client = OpenAI()
+            logger.info("OpenAI client initialized ✓")
+        except Exception as e:
+            logger.warning(f"OpenAI client not initialized: {e}")
+            logger.warning("Set OPENAI_API_KEY environment variable to enable AI analysis")
+    return openai_client
+
+
+# Backend modules the processing workers need. Only looked up (never imported) by the
+# API process, see GET /ready
+BACKEND_MODULES = ["cv2", "numpy", "sklearn", "supervision", "ultralytics"]
+
+
+def check_backend_dependencies() -> List[str]:
+    """Return the backend modules that are not installed, without importing any of them."""
+    return [module for module in BACKEND_MODULES if importlib.util.find_spec(module) is None]
 
-# Install dependencies at startup
-ensure_backend_dependencies()
 
 # Initialize FastAPI app
 app = FastAPI(title="Soccer Analytics API", version="1.0.0")
@@ -80,23 +88,336 @@ app.add_middleware(
 # Directory paths (relative to project root)
 BASE_DIR = Path(__file__).parent.parent  # Go up to project root
 BACKEND_DIR = BASE_DIR / "backend"  # Backend folder
-INPUT_DIR = BACKEND_DIR / "input_videos"
-OUTPUT_DIR = BACKEND_DIR / "output_images"
-PROCESSING_SCRIPT = BACKEND_DIR / "main.py"
-TEMP_RESULTS_DIR = Path(__file__).parent / "temp_results"
+INPUT_DIR = Path(os.getenv("INPUT_DIR", BACKEND_DIR / "input_videos"))
+MODEL_PATH = BACKEND_DIR / "models" / "best.pt"
+TEMP_RESULTS_DIR = Path(os.getenv("TEMP_RESULTS_DIR", Path(__file__).parent / "temp_results"))
+
+# Uploaded videos, one folder per task so concurrent jobs never touch each other's input.
+# A task's folder is only deleted by DELETE /cleanup/{task_id} (and on startup)
+UPLOAD_DIR = INPUT_DIR / "uploads"
+
+# Processing timeout in seconds, checked between pipeline chunks
+PROCESSING_TIMEOUT = 600
+
+# Seconds each pipeline stage may take before the job stops, checked between batches and frames
+PROCESSING_STAGE_BUDGETS = {"ingest": 120, "detect": 420, "track": 60, "camera": 60, "team": 120, "formation": 60, "render": 60}
+
+# Created in a task's cache directory by POST /cancel, the worker stops at its next check
+CANCEL_FILENAME = "cancel"
+
+# Number of worker processes running the analysis pipeline
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "1"))
+
+# CPUs the API may schedule on, shared out between the workers' thread pools
+HOST_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+# Threads each worker's torch, OpenMP/BLAS and OpenCV pools may use, so workers don't
+# oversubscribe the cores (see backend/utils/thread_budget.py). An equal share by default
+PROCESSING_THREADS = int(os.getenv("PROCESSING_THREADS", str(max(1, HOST_CPUS // PROCESSING_WORKERS))))
+
+# Detection for all jobs runs in one shared inference server process: one copy of the model,
+# frame batches coalesced across jobs. On by default when several jobs can run at once
+SHARED_INFERENCE = os.getenv("SHARED_INFERENCE", "1" if PROCESSING_WORKERS > 1 else "0") == "1"
+
+# Largest coalesced batch and how long the server waits for other jobs' frames to fill it
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "32"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "20"))
+
+# Threads of the inference server, it runs the detection of every job
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(HOST_CPUS)))
+
+# Seconds the inference server may take to start listening before jobs fall back to their own model
+INFERENCE_START_TIMEOUT = 60
+
+# Job run in the worker processes as "module:function", run_pipeline_job by default.
+# Same signature and outcome dict as run_pipeline_job, the load test swaps in a fake pipeline
+PIPELINE_JOB = os.getenv("PIPELINE_JOB")
+
+# Uploads above the analysis profile are transcoded (scaled down, frame-decimated, frequent
+# keyframes) in an ingest worker as soon as they are saved, while the job waits for a processing
+# worker, and the pipeline analyzes the copy (see backend/utils/transcode.py). Off for the load test
+INGEST_TRANSCODE = os.getenv("INGEST_TRANSCODE", "0" if PIPELINE_JOB else "1") == "1"
+ANALYSIS_PROFILE = {
+    "max_height": int(os.getenv("ANALYSIS_MAX_HEIGHT", "720")),
+    "max_fps": float(os.getenv("ANALYSIS_MAX_FPS", "25")),
+    "keyframe_interval": int(os.getenv("ANALYSIS_KEYFRAME_INTERVAL", "25")),
+}
+
+# Processes transcoding uploads, separate from the processing workers so ingest never waits behind a job
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+
+# Transcoded copy of an upload, in the task's cache directory
+ANALYSIS_VIDEO_FILENAME = "analysis.mp4"
+
+# Structured result files written by the pipeline (see backend/pipeline/results.py)
+RESULTS_FILENAME = "results.json"
+TRACKS_FILENAME = "tracks.parquet"
+HEATMAPS_FILENAME = "heatmaps.npz"
+RUNS_FILENAME = "possession_runs.parquet"
 
 # Create necessary directories
 INPUT_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR.mkdir(exist_ok=True)
 TEMP_RESULTS_DIR.mkdir(exist_ok=True)
 
+# Backend packages (pipeline, trackers, ...) are imported lazily: in the worker processes
+# for jobs, and on first use for on-demand rendering. Appended (not prepended) so this
+# module stays "main" rather than backend/main.py when spawned workers unpickle jobs
+sys.path.append(str(BACKEND_DIR))
+
+# Worker pool for analysis jobs, processes are spawned when the first job is submitted
+processing_executor: Optional[ProcessPoolExecutor] = None
+
+# Worker pool transcoding uploads, spawned with the first upload
+ingest_executor: Optional[ProcessPoolExecutor] = None
+
+# Shared inference server process and the address jobs connect to, started with the first job
+inference_process: Optional[multiprocessing.Process] = None
+inference_address = None
+inference_lock = threading.Lock()
+
+# Futures of submitted jobs by task id, so queued jobs can be cancelled before they start
+job_futures: Dict[str, Future] = {}
+
+# Futures of upload transcodes by task id, the task's job waits for its transcode
+ingest_futures: Dict[str, Future] = {}
+
+# Jobs submitted to the worker pool and not finished yet (queued or running), for /metrics
+jobs_in_flight = 0
+jobs_in_flight_lock = threading.Lock()
+
+
+def get_processing_executor() -> ProcessPoolExecutor:
+    global processing_executor
+    if processing_executor is None:
+        # spawn gives the same clean workers on every platform (and no forked uvicorn threads)
+        processing_executor = ProcessPoolExecutor(
+            max_workers=PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_processing_worker,
+            initargs=(PROCESSING_THREADS,)
+        )
+    return processing_executor
+
+
+def get_ingest_executor() -> ProcessPoolExecutor:
+    global ingest_executor
+    if ingest_executor is None:
+        ingest_executor = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_processing_worker,
+            initargs=(PROCESSING_THREADS,)
+        )
+    return ingest_executor
+
+
+def init_processing_worker(threads: int):
+    """Budget a worker's thread pools before a job loads torch or sklearn."""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    try:
+        from utils import init_worker_threads
+    except ImportError:
+        # a broken initializer breaks the whole pool, the job reports missing dependencies itself
+        return
+    
+    init_worker_threads(threads)
+
+
+def run_inference_server(model_path: str, ready_conn, max_batch: int, max_wait: float, threads: int):
+    """Run the shared inference server in its own process, the model is loaded there on first use."""
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    from trackers import serve
+    
+    serve(model_path, ready_conn, max_batch=max_batch, max_wait=max_wait, threads=threads)
+
+
+def get_inference_address():
+    """
+    Address of the shared inference server, started (or restarted after it died) on first use.
+    
+    Returns None when it does not come up, jobs then detect with their own model.
+    """
+    global inference_process, inference_address
+    with inference_lock:
+        if inference_process is not None and inference_process.is_alive():
+            return inference_address
+        
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        inference_process = context.Process(
+            target=run_inference_server,
+            args=(str(MODEL_PATH), sender, INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS / 1000, INFERENCE_THREADS),
+            daemon=True
+        )
+        inference_process.start()
+        sender.close()
+        try:
+            if not receiver.poll(INFERENCE_START_TIMEOUT):
+                raise TimeoutError(f"not listening after {INFERENCE_START_TIMEOUT}s")
+            inference_address = receiver.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            logger.warning(f"Inference server did not start, jobs use their own model: {e!r}")
+            inference_process.kill()
+            inference_address = None
+        finally:
+            receiver.close()
+        
+        if inference_address is not None:
+            logger.info(f"Inference server listening on {inference_address}")
+        return inference_address
+
+
+def run_pipeline_job(config_kwargs: dict) -> dict:
+    """
+    Run the analysis pipeline in a worker process, so the heavy backend imports
+    (torch, ultralytics) happen in the worker and never in the API process.
+    
+    Errors are returned as strings rather than raised, so the API process never has
+    to unpickle (and import) backend exception types. Per-stage metrics and the time
+    the worker picked the job up are returned either way.
+    """
+    started_at = time.time()
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    from pipeline import Pipeline, PipelineConfig, PipelineTimeout, PipelineCancelled
+    
+    pipeline = Pipeline(PipelineConfig(**config_kwargs))
+    try:
+        result = pipeline.run()
+    except PipelineCancelled as e:
+        return {"cancelled": True, "error": str(e), "started_at": started_at,
+                "stages": pipeline.instrumentation.summary()}
+    except PipelineTimeout as e:
+        return {"timed_out": True, "error": str(e), "started_at": started_at,
+                "stages": pipeline.instrumentation.summary()}
+    except Exception as e:
+        return {"timed_out": False, "error": f"{type(e).__name__}: {e}", "started_at": started_at,
+                "stages": pipeline.instrumentation.summary()}
+    
+    return {"images": result["images"], "data_files": result["data_files"], "frames": result["frames"],
+            "started_at": started_at, "stages": result["metrics"]}
+
+
+def run_ingest_job(source_path: str, path: str, profile: dict, cancel_path: str) -> dict:
+    """
+    Transcode an upload to the analysis profile in an ingest worker, OpenCV is only
+    imported there. Videos already within the profile are left alone (path None).
+    
+    Errors are returned as strings like run_pipeline_job's, the job then analyzes the upload itself.
+    """
+    started_at = time.time()
+    try:
+        if str(BACKEND_DIR) not in sys.path:
+            sys.path.append(str(BACKEND_DIR))
+        from utils import get_video_info, needs_transcode, transcode_video
+        
+        if not needs_transcode(get_video_info(source_path), profile):
+            return {"path": None, "seconds": round(time.time() - started_at, 3)}
+        
+        def check_cancelled():
+            if os.path.exists(cancel_path):
+                raise RuntimeError("Cancelled during ingest")
+        
+        info = transcode_video(source_path, path, profile, before_frame=check_cancelled)
+    except Exception as e:
+        return {"path": None, "error": f"{type(e).__name__}: {e}", "seconds": round(time.time() - started_at, 3)}
+    
+    return {"path": path, "info": info, "seconds": round(time.time() - started_at, 3)}
+
+
+def get_task_video_path(task_id: str, video_filename: str) -> Path:
+    """Where a task's upload is stored, see UPLOAD_DIR."""
+    return UPLOAD_DIR / task_id / video_filename
+
+
+def submit_ingest(task_id: str, video_filename: str):
+    """Start transcoding an upload for its task, the job picks the copy up in run_processing_script."""
+    task_cache_dir = TEMP_RESULTS_DIR / task_id
+    task_cache_dir.mkdir(exist_ok=True)
+    ingest_futures[task_id] = get_ingest_executor().submit(
+        run_ingest_job, str(get_task_video_path(task_id, video_filename)), str(task_cache_dir / ANALYSIS_VIDEO_FILENAME),
+        ANALYSIS_PROFILE, str(task_cache_dir / CANCEL_FILENAME)
+    )
+
+
+def wait_for_ingest(task_id: str) -> Optional[str]:
+    """
+    Path of the task's transcoded upload once its ingest finished, None to analyze the upload
+    itself (no transcode needed, or it failed). A retried task reuses the finished copy.
+    """
+    task_cache_dir = TEMP_RESULTS_DIR / task_id
+    future = ingest_futures.pop(task_id, None)
+    if future is None:
+        # written under a temporary name and renamed when complete, so an existing copy is whole
+        path = task_cache_dir / ANALYSIS_VIDEO_FILENAME
+        return str(path) if path.exists() else None
+    
+    try:
+        outcome = future.result()
+    except Exception as e:
+        # cancelled before it started, or the ingest worker died
+        outcome = {"path": None, "error": f"{type(e).__name__}: {e}"}
+    if outcome.get("error"):
+        logger.warning(f"Task {task_id}: Transcode failed, analyzing the upload as it is - {outcome['error']}")
+    elif outcome["path"] is not None:
+        source, info = outcome["info"]["source"], outcome["info"]
+        logger.info(f"Task {task_id}: Transcoded {source['width']}x{source['height']}@{source['fps']:g} to "
+                    f"{info['width']}x{info['height']}@{info['fps']:g} in {outcome['seconds']}s")
+    return outcome.get("path")
+
+
+def get_job_metrics(outcome: dict, submitted_at: float, finished_at: float) -> dict:
+    """
+    Metrics stored on the task: job timings (queue wait, worker run time, total, fps)
+    and the pipeline's per-stage wall time, CPU time, item counts and peak RSS.
+    """
+    started_at = outcome.get("started_at")
+    run_s = finished_at - started_at if started_at is not None else None
+    frames = outcome.get("frames")
+    return {
+        "job": {
+            "queue_wait_s": round(max(0.0, started_at - submitted_at), 3) if started_at is not None else None,
+            "run_s": round(run_s, 3) if run_s is not None else None,
+            "total_s": round(finished_at - submitted_at, 3),
+            "frames": frames,
+            "fps": round(frames / run_s, 2) if frames and run_s else None
+        },
+        "stages": outcome.get("stages", [])
+    }
+
+
+def run_live_job(config: dict):
+    """
+    Run live analysis in its own process until the source ends or the stop file appears.
+    
+    Every update is appended to the session's updates file as a JSON line, which
+    GET /live/{live_id}/stream tails. Errors are written as an "error" update.
+    """
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    from live import FrameSource, LiveAnalyzer, JsonLinesPublisher
+    
+    stop_path = Path(config["stop_path"])
+    with open(config["updates_path"], "a") as f:
+        publish = JsonLinesPublisher(f)
+        try:
+            analyzer = LiveAnalyzer(model_path=config["model_path"], latency_budget=config["latency_budget"])
+            analyzer.run(FrameSource(config["source"]), publish, should_stop=stop_path.exists)
+        except Exception as e:
+            publish({"type": "error", "error": f"{type(e).__name__}: {e}", "published_at": time.time()})
+
 # Startup event to clean temp_results
 @app.on_event("startup")
 async def startup_event():
-    """Clean up temp_results directory on startup."""
+    """Clean up temp_results and the uploads of previous runs on startup (tasks live in memory)."""
     logger.info("Cleaning up temp_results directory...")
-    if TEMP_RESULTS_DIR.exists():
-        for item in TEMP_RESULTS_DIR.iterdir():
+    for directory in (TEMP_RESULTS_DIR, UPLOAD_DIR):
+        if not directory.exists():
+            continue
+        for item in directory.iterdir():
             if item.is_dir():
                 shutil.rmtree(item)
                 logger.info(f"Deleted temp directory: {item.name}")
@@ -105,143 +426,165 @@ async def startup_event():
                 logger.info(f"Deleted temp file: {item.name}")
     logger.info("Temp results cleanup complete ✓")
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the processing workers, the inference server and live sessions."""
+    if processing_executor is not None:
+        processing_executor.shutdown(wait=False, cancel_futures=True)
+    if ingest_executor is not None:
+        ingest_executor.shutdown(wait=False, cancel_futures=True)
+    if inference_process is not None and inference_process.is_alive():
+        inference_process.terminate()
+    
+    for session in live_sessions.values():
+        session["stop_path"].touch()
+    for session in live_sessions.values():
+        session["process"].join(timeout=2)
+        if session["process"].is_alive():
+            session["process"].terminate()
+
 # In-memory task storage
 tasks: Dict[str, dict] = {}
 
+# Task statuses while a job may still be using the task's files
+ACTIVE_STATUSES = ("queued", "processing", "cancelling")
 
-def clear_directory(directory: Path, file_extensions: List[str] = None):
-    """
-    Clear all files in a directory, optionally filtering by extensions.
-    
-    Args:
-        directory: Path to directory to clear
-        file_extensions: List of extensions to delete (e.g., ['.mp4', '.avi']). None = delete all files
-    """
-    if not directory.exists():
-        return
-    
-    for item in directory.iterdir():
-        if item.is_file():
-            if file_extensions is None or item.suffix.lower() in file_extensions:
-                try:
-                    item.unlink()
-                    logger.info(f"Deleted file: {item}")
-                except Exception as e:
-                    logger.error(f"Error deleting {item}: {e}")
+# Live analysis sessions, one process each (see run_live_job)
+live_sessions: Dict[str, dict] = {}
+
+# Seconds between SSE keep-alive comments when a live session has nothing new
+LIVE_KEEPALIVE_SECONDS = 15
+
+# Stream URLs live analysis may open, comma-separated prefixes (e.g. "rtsp://cameras.local/").
+# Empty by default: only camera indexes and video files in input_videos are accepted
+LIVE_STREAM_PREFIXES = [prefix for prefix in os.getenv("LIVE_STREAM_PREFIXES", "").split(",") if prefix]
+
+# Bytes read from a live session's updates file per read, off the event loop
+LIVE_READ_BYTES = 64 * 1024
 
 
 def run_processing_script(task_id: str, video_filename: str):
     """
-    Background task to run the video processing script.
+    Background task to run the analysis pipeline.
+    
+    Diagrams are written straight into the task cache directory. Stage checkpoints
+    are kept next to them, so a failed, timed out or cancelled task resumes at the
+    last finished chunk when retried with POST /retry/{task_id}. The job is submitted
+    once the upload's transcode (see submit_ingest) is done.
     
     Args:
         task_id: Unique identifier for this task
         video_filename: Name of the video file being processed
     """
     try:
+        # the task stays queued while its upload is transcoded
+        analysis_video_path = wait_for_ingest(task_id)
+        
         # Update task status to processing
         tasks[task_id]["status"] = "processing"
         logger.info(f"Task {task_id}: Starting processing for {video_filename}")
         
-        # Clear output directory before processing
-        logger.info(f"Task {task_id}: Clearing output directory")
-        clear_directory(OUTPUT_DIR, ['.png', '.jpg', '.jpeg', '.avi', '.mp4'])
-        
-        # Change to backend directory (where main.py is)
-        original_cwd = os.getcwd()
-        os.chdir(BACKEND_DIR)
-        
-        # Find Python executable - prioritize api venv (has all deps), then backend venv, then system
-        import sys
-        python_exe = sys.executable
-        
-        # Check for Python with all dependencies installed
-        venv_paths = [
-            BASE_DIR / "api" / "venv" / "Scripts" / "python.exe",  # API venv (Windows) - has backend deps
-            BASE_DIR / "api" / "venv" / "bin" / "python",  # API venv (Linux/Mac)
-            BACKEND_DIR / "venv" / "Scripts" / "python.exe",  # Backend venv (Windows)
-            BACKEND_DIR / "venv" / "bin" / "python",  # Backend venv (Linux/Mac)
-            BASE_DIR / "venv" / "Scripts" / "python.exe",  # Root venv (Windows)
-            BASE_DIR / "venv" / "bin" / "python",  # Root venv (Linux/Mac)
-        ]
+        # Create task-specific cache directory
+        task_cache_dir = TEMP_RESULTS_DIR / task_id
+        task_cache_dir.mkdir(exist_ok=True)
+        cancel_path = task_cache_dir / CANCEL_FILENAME
         
-        for venv_python in venv_paths:
-            if venv_python.exists():
-                python_exe = str(venv_python)
-                logger.info(f"Task {task_id}: Using venv Python: {python_exe}")
-                break
+        # cancelled before the job was even submitted
+        if cancel_path.exists():
+            mark_cancelled(task_id, "Cancelled before processing started")
+            return
+        
+        global jobs_in_flight
+        with jobs_in_flight_lock:
+            jobs_in_flight += 1
+        submitted_at = time.time()
+        try:
+            job = load_object(PIPELINE_JOB) if PIPELINE_JOB else run_pipeline_job
+            future = get_processing_executor().submit(job, {
+                "video_path": str(get_task_video_path(task_id, video_filename)),
+                "model_path": str(MODEL_PATH),
+                "output_dir": str(task_cache_dir),
+                "checkpoint_dir": str(task_cache_dir / "checkpoints"),
+                "timeout": PROCESSING_TIMEOUT,
+                "stage_budgets": PROCESSING_STAGE_BUDGETS,
+                "cancel_path": str(cancel_path),
+                "threads": PROCESSING_THREADS,
+                "analysis_video_path": analysis_video_path,
+                "inference_address": get_inference_address() if SHARED_INFERENCE else None
+            })
+            job_futures[task_id] = future
+            try:
+                outcome = future.result()
+            except CancelledError:
+                outcome = {"cancelled": True, "error": "Cancelled before processing started"}
+        finally:
+            job_futures.pop(task_id, None)
+            with jobs_in_flight_lock:
+                jobs_in_flight -= 1
+        
+        job_metrics = get_job_metrics(outcome, submitted_at, time.time())
+        tasks[task_id]["metrics"] = job_metrics
+        if outcome.get("cancelled"):
+            job_outcome = "cancelled"
+        elif outcome.get("timed_out"):
+            job_outcome = "timed_out"
+        elif outcome.get("error"):
+            job_outcome = "failed"
         else:
-            logger.info(f"Task {task_id}: Using system Python: {python_exe}")
-        
-        # Run the processing script
-        logger.info(f"Task {task_id}: Running main.py processing script")
-        result = subprocess.run(
-            [python_exe, "main.py"],
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minute timeout
-        )
+            job_outcome = "completed"
+        metrics.record_job(job_outcome, job_metrics["job"], job_metrics["stages"])
+        logger.info(f"Task {task_id}: {job_outcome} in {job_metrics['job']['total_s']}s "
+                    f"({job_metrics['job']['fps']} frames/s)")
         
-        # Return to original directory
-        os.chdir(original_cwd)
+        if outcome.get("cancelled"):
+            mark_cancelled(task_id, outcome["error"])
+            return
         
-        # Check if processing succeeded
-        if result.returncode != 0:
-            error_msg = f"Processing script failed with return code {result.returncode}"
-            logger.error(f"Task {task_id}: {error_msg}")
-            logger.error(f"STDOUT: {result.stdout}")
-            logger.error(f"STDERR: {result.stderr}")
-            
+        if outcome.get("timed_out"):
+            logger.error(f"Task {task_id}: {outcome['error']}")
             tasks[task_id]["status"] = "failed"
-            tasks[task_id]["error"] = error_msg
-            tasks[task_id]["stdout"] = result.stdout
-            tasks[task_id]["stderr"] = result.stderr
+            tasks[task_id]["error"] = f"Processing timed out: {outcome['error']}"
+            tasks[task_id]["resumable"] = True
             return
         
-        logger.info(f"Task {task_id}: Processing completed successfully")
-        logger.info(f"STDOUT: {result.stdout}")
+        if outcome.get("error"):
+            logger.error(f"Task {task_id}: Pipeline failed - {outcome['error']}")
+            tasks[task_id]["status"] = "failed"
+            tasks[task_id]["error"] = f"Processing failed: {outcome['error']}"
+            tasks[task_id]["resumable"] = True
+            return
         
-        # Scan output_images directory for generated images
-        image_extensions = {'.png', '.jpg', '.jpeg'}
-        generated_images = [
-            f for f in OUTPUT_DIR.iterdir() 
-            if f.is_file() and f.suffix.lower() in image_extensions
-        ]
+        cached_images = outcome["images"]
         
-        if not generated_images:
-            logger.warning(f"Task {task_id}: No images found in output directory")
+        if not cached_images:
+            logger.warning(f"Task {task_id}: No images were generated")
             tasks[task_id]["status"] = "failed"
             tasks[task_id]["error"] = "No images were generated"
             return
         
-        # Create task-specific cache directory
-        task_cache_dir = TEMP_RESULTS_DIR / task_id
-        task_cache_dir.mkdir(exist_ok=True)
-        
-        # Copy images to task cache
-        cached_images = []
-        for img in generated_images:
-            dest_path = task_cache_dir / img.name
-            shutil.copy2(img, dest_path)
-            cached_images.append(img.name)
-            logger.info(f"Task {task_id}: Cached image {img.name}")
-        
         # Update task with results
         tasks[task_id]["status"] = "completed"
         tasks[task_id]["result_images"] = cached_images
         tasks[task_id]["result_count"] = len(cached_images)
-        tasks[task_id]["stdout"] = result.stdout
+        tasks[task_id]["result_data"] = outcome["data_files"]
+        tasks[task_id]["resumable"] = False
         
         logger.info(f"Task {task_id}: Processing complete with {len(cached_images)} images")
 
-    except subprocess.TimeoutExpired:
-        logger.error(f"Task {task_id}: Processing timed out after 10 minutes")
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["error"] = "Processing timed out after 10 minutes"
     except Exception as e:
         logger.error(f"Task {task_id}: Unexpected error - {str(e)}")
         tasks[task_id]["status"] = "failed"
         tasks[task_id]["error"] = f"Unexpected error: {str(e)}"
+        tasks[task_id]["resumable"] = True
+
+
+def mark_cancelled(task_id: str, reason: str):
+    """Final state of a cancelled task, finished stages stay checkpointed for a retry."""
+    logger.info(f"Task {task_id}: {reason}")
+    tasks[task_id]["status"] = "cancelled"
+    tasks[task_id]["error"] = reason
+    tasks[task_id]["resumable"] = True
 
 
 @app.get("/")
@@ -251,15 +594,76 @@ async def root():
         "status": "running",
         "message": "Soccer Analytics API",
         "endpoints": {
+            "health": "GET /health",
+            "ready": "GET /ready",
             "upload": "POST /upload-video",
             "status": "GET /status/{task_id}",
             "results": "GET /results/{task_id}",
-            "download": "GET /download/{task_id}/{filename}",
-            "cleanup": "DELETE /cleanup/{task_id}"
+            "download": "GET /download/{task_id}/{filename}?w={width}&fmt={png|jpeg|webp}",
+            "data": "GET /results/{task_id}/data",
+            "tracks": "GET /results/{task_id}/tracks",
+            "render": "GET /render/{task_id}/{diagram}?width={width}",
+            "retry": "POST /retry/{task_id}",
+            "cancel": "POST /cancel/{task_id}",
+            "cleanup": "DELETE /cleanup/{task_id}",
+            "metrics": "GET /metrics",
+            "live": "POST /live/start?source={source}&latency_budget={seconds}",
+            "live_status": "GET /live/{live_id}",
+            "live_stream": "GET /live/{live_id}/stream",
+            "live_stop": "POST /live/{live_id}/stop"
         }
     }
 
 
+@app.get("/health")
+async def health():
+    """Liveness check - the API process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness check - can this replica process videos?
+    
+    Checks that the backend dependencies are installed (without importing them) and
+    that the model weights exist. Returns 503 when not ready.
+    """
+    missing_dependencies = check_backend_dependencies()
+    model_found = MODEL_PATH.exists()
+    is_ready = not missing_dependencies and model_found
+    
+    body = {
+        "ready": is_ready,
+        "missing_dependencies": missing_dependencies,
+        "model_found": model_found,
+        "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
+        "processing_workers": PROCESSING_WORKERS
+    }
+    if missing_dependencies:
+        body["hint"] = "Run: pip install -r backend/requirements.txt"
+    
+    return JSONResponse(status_code=200 if is_ready else 503, content=body)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics: job queue depth, job latency and frames per second
+    histograms, per-stage time totals and worker peak memory.
+    """
+    with jobs_in_flight_lock:
+        in_flight = jobs_in_flight
+    # jobs past the worker count wait in the pool's queue
+    running = min(in_flight, PROCESSING_WORKERS)
+    queued_tasks = sum(1 for task in tasks.values() if task["status"] == "queued")
+    metrics.JOBS_RUNNING.set(running)
+    metrics.JOBS_QUEUED.set(queued_tasks + in_flight - running)
+    metrics.LIVE_SESSIONS.set(sum(1 for session in live_sessions.values() if session["process"].is_alive()))
+    
+    return Response(content=metrics.render(metrics.REGISTRY), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/upload-video")
 async def upload_video(
     background_tasks: BackgroundTasks,
@@ -279,35 +683,40 @@ async def upload_video(
         # Generate unique task ID
         task_id = str(uuid.uuid4())
         
-        # Clear input_videos directory (only one video at a time)
-        logger.info("Clearing input_videos directory")
-        clear_directory(INPUT_DIR, ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'])
-        
-        # Save uploaded video to input_videos
-        video_path = INPUT_DIR / video.filename
+        # Save uploaded video in the task's own folder, other tasks' videos stay in place
+        # (only the file name is kept, the client's path is not trusted)
+        video_filename = Path(video.filename).name or "video.mp4"
+        video_path = get_task_video_path(task_id, video_filename)
+        video_path.parent.mkdir(parents=True)
         with video_path.open("wb") as buffer:
             shutil.copyfileobj(video.file, buffer)
         
         logger.info(f"Saved video: {video_path}")
         
+        # transcoding starts now and overlaps with the wait for a processing worker
+        if INGEST_TRANSCODE:
+            submit_ingest(task_id, video_filename)
+        
         # Initialize task in memory
         tasks[task_id] = {
             "task_id": task_id,
             "status": "queued",
-            "video_filename": video.filename,
+            "video_filename": video_filename,
             "result_images": [],
+            "result_data": [],
             "result_count": 0,
-            "error": None
+            "error": None,
+            "resumable": False
         }
         
         # Start background processing
-        background_tasks.add_task(run_processing_script, task_id, video.filename)
+        background_tasks.add_task(run_processing_script, task_id, video_filename)
         
         return {
             "task_id": task_id,
             "status": "queued",
             "message": f"Video uploaded successfully. Processing started.",
-            "video_filename": video.filename
+            "video_filename": video_filename
         }
         
     except Exception as e:
@@ -334,11 +743,94 @@ async def get_status(task_id: str):
         "video_filename": task["video_filename"],
         "result_count": task["result_count"],
         "error": task.get("error"),
+        "resumable": task.get("resumable", False),
+        "metrics": task.get("metrics"),
         "stdout": task.get("stdout") if task["status"] == "failed" else None,
         "stderr": task.get("stderr") if task["status"] == "failed" else None
     }
 
 
+@app.post("/retry/{task_id}")
+async def retry_task(task_id: str, background_tasks: BackgroundTasks):
+    """
+    Re-run a failed task. Finished pipeline stages and chunks are loaded from
+    the task's checkpoints instead of being processed again.
+    
+    Returns:
+        Task status information
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    task = tasks[task_id]
+    
+    if task["status"] not in ("failed", "cancelled"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only failed or cancelled tasks can be retried. Current status: {task['status']}"
+        )
+    
+    if not get_task_video_path(task_id, task["video_filename"]).exists():
+        raise HTTPException(status_code=410, detail="Video file no longer available, upload it again")
+    
+    cancel_path = TEMP_RESULTS_DIR / task_id / CANCEL_FILENAME
+    if cancel_path.exists():
+        cancel_path.unlink()
+    
+    task["status"] = "queued"
+    task["error"] = None
+    background_tasks.add_task(run_processing_script, task_id, task["video_filename"])
+    
+    return {
+        "task_id": task_id,
+        "status": "queued",
+        "message": "Task requeued. Processing resumes from the last checkpoint."
+    }
+
+
+@app.post("/cancel/{task_id}")
+async def cancel_task(task_id: str):
+    """
+    Cancel a queued or processing task. A queued job is dropped before it starts, a
+    running one stops at its next check (between detection batches and frames) and
+    frees its worker. Finished stages and chunks stay checkpointed, so the task can
+    be resumed with POST /retry/{task_id}.
+    
+    Returns:
+        Task status information
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    task = tasks[task_id]
+    
+    if task["status"] not in ACTIVE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only queued or processing tasks can be cancelled. Current status: {task['status']}"
+        )
+    
+    task_cache_dir = TEMP_RESULTS_DIR / task_id
+    task_cache_dir.mkdir(exist_ok=True)
+    (task_cache_dir / CANCEL_FILENAME).touch()
+    
+    # a job still waiting for a worker never starts, run_processing_script marks it cancelled
+    for futures in (ingest_futures, job_futures):
+        future = futures.get(task_id)
+        if future is not None:
+            future.cancel()
+    
+    if task["status"] != "cancelled":
+        task["status"] = "cancelling"
+    logger.info(f"Task {task_id}: Cancellation requested")
+    
+    return {
+        "task_id": task_id,
+        "status": task["status"],
+        "message": "Cancellation requested. Finished stages are kept for POST /retry/{task_id}."
+    }
+
+
 @app.get("/results/{task_id}")
 async def get_results(task_id: str):
     """
@@ -364,20 +856,332 @@ async def get_results(task_id: str):
         for filename in task["result_images"]
     ]
     
+    data_urls = {}
+    if RESULTS_FILENAME in task.get("result_data", []):
+        data_urls["results"] = f"/results/{task_id}/data"
+    if TRACKS_FILENAME in task.get("result_data", []):
+        data_urls["tracks"] = f"/results/{task_id}/tracks"
+    if RUNS_FILENAME in task.get("result_data", []):
+        data_urls["events"] = f"/results/{task_id}/events"
+    
     return {
         "task_id": task_id,
         "status": task["status"],
         "result_count": task["result_count"],
         "images": image_urls,
-        "image_filenames": task["result_images"]
+        "image_filenames": task["result_images"],
+        "data": data_urls,
+        "metrics": task.get("metrics")
+    }
+
+
+def get_result_data_path(task_id: str, filename: str) -> Path:
+    """Path of a structured result file for a completed task, 404 if it wasn't written."""
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    task = tasks[task_id]
+    
+    if task["status"] != "completed":
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Task is not completed. Current status: {task['status']}"
+        )
+    
+    data_path = TEMP_RESULTS_DIR / task_id / filename
+    
+    if filename not in task.get("result_data", []) or not data_path.exists():
+        raise HTTPException(status_code=404, detail=f"{filename} not available for this task")
+    
+    return data_path
+
+
+@app.get("/results/{task_id}/data")
+async def get_result_data(task_id: str):
+    """
+    Get the structured result (results.json) for a completed task.
+    
+    Returns:
+        Normalized player positions, line assignments, formation labels, ball
+        position and team colors for every analyzed frame, plus possession
+    """
+    return FileResponse(
+        path=get_result_data_path(task_id, RESULTS_FILENAME),
+        media_type="application/json"
+    )
+
+
+@app.get("/results/{task_id}/tracks")
+async def get_result_tracks(task_id: str):
+    """
+    Get the full track table for a completed task.
+    
+    Returns:
+        Parquet file with one row per detection (frame, object, track_id, bbox, team, has_ball)
+    """
+    return FileResponse(
+        path=get_result_data_path(task_id, TRACKS_FILENAME),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f"attachment; filename={TRACKS_FILENAME}"}
+    )
+
+
+@app.get("/results/{task_id}/events")
+def get_result_events(
+    task_id: str,
+    max_pass_frames: Optional[int] = Query(None, ge=1, le=1500),
+    long_ball_distance: Optional[float] = Query(None, ge=0, le=200),
+    switch_width: Optional[float] = Query(None, ge=0, le=200)
+):
+    """
+    Get the passes, switches and turnovers of a completed task.
+    
+    Events are extracted from the cached possession run table on every request, so any
+    threshold left out keeps its default and changing one doesn't reprocess the match.
+    
+    Returns:
+        Thresholds used, per-team counts and the event table as columns
+    """
+    runs_path = get_result_data_path(task_id, RUNS_FILENAME)
+    
+    from pipeline import load_event_table
+    from player_ball_assigner import EventExtractor, get_event_counts
+    
+    thresholds = {
+        name: value for name, value in [
+            ("max_pass_frames", max_pass_frames),
+            ("long_ball_distance", long_ball_distance),
+            ("switch_width", switch_width),
+        ]
+        if value is not None
+    }
+    extractor = EventExtractor(**thresholds)
+    events = extractor.get_events(load_event_table(runs_path))
+    
+    return {
+        "task_id": task_id,
+        "thresholds": {
+            "max_pass_frames": extractor.max_pass_frames,
+            "long_ball_distance": extractor.long_ball_distance,
+            "switch_width": extractor.switch_width,
+        },
+        "counts": {str(team_id): counts for team_id, counts in get_event_counts(events).items()},
+        "events": {
+            # positions are null where the ball wasn't seen
+            name: [None if v != v else round(v, 2) for v in values.tolist()] if values.dtype.kind == "f"
+            else values.tolist()
+            for name, values in events.items()
+        },
+    }
+
+
+@app.get("/render/{task_id}/{diagram}")
+def render_formation_diagram(
+    request: Request,
+    task_id: str,
+    diagram: str,
+    width: Optional[int] = Query(None, ge=160, le=3840)
+):
+    """
+    Render a formation diagram from the structured result.
+    
+    Diagram names match the PNG names without extension (e.g. team1_formation_start,
+    formations_comparison_end, team1_heatmap), plus player{track_id}_heatmap for any
+    tracked player. Renders are cached on disk per diagram and width.
+    
+    Returns:
+        PNG image
+    """
+    results_path = get_result_data_path(task_id, RESULTS_FILENAME)
+    
+    render_dir = TEMP_RESULTS_DIR / task_id / "renders"
+    render_path = render_dir / f"{diagram}_{width or 'full'}.png"
+    
+    if not render_path.exists():
+        from pipeline import load_results, load_heatmaps, save_diagram, get_diagram_names
+        
+        results = load_results(results_path)
+        heatmaps = None
+        if diagram.endswith("_heatmap"):
+            # the grids cached with the results, drawn onto the cached empty pitch
+            heatmaps = load_heatmaps(get_result_data_path(task_id, HEATMAPS_FILENAME))
+        elif diagram not in get_diagram_names(results):
+            raise HTTPException(status_code=404, detail="Diagram not found")
+        
+        # Render to a temp file first so concurrent requests never read a partial image
+        render_dir.mkdir(exist_ok=True)
+        tmp_path = render_dir / f"{render_path.stem}.{uuid.uuid4().hex}.png"
+        try:
+            save_diagram(results, diagram, tmp_path, width, heatmaps)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Diagram not found")
+        os.replace(tmp_path, render_path)
+        logger.info(f"Task {task_id}: Rendered {render_path.name}")
+    
+    return serve_artifact(request, render_path)
+
+
+# Task artifacts never change once written (task ids are unique), so clients may cache them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Formats for on-demand image variants: extension and encoder quality
+IMAGE_VARIANT_FORMATS = {
+    "png": (".png", []),
+    "jpeg": (".jpg", [1, 85]),   # cv2.IMWRITE_JPEG_QUALITY
+    "webp": (".webp", [64, 80]),  # cv2.IMWRITE_WEBP_QUALITY
+}
+
+
+@lru_cache(maxsize=4096)
+def compute_etag(path: str, size: int, mtime_ns: int) -> str:
+    """Strong ETag from the file content, cached per file version."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def get_etag(path: Path) -> str:
+    stat = path.stat()
+    return compute_etag(str(path), stat.st_size, stat.st_mtime_ns)
+
+
+def parse_byte_range(range_header: str, file_size: int) -> Optional[tuple]:
+    """
+    Parse a single "bytes=start-end" range header.
+    
+    Returns:
+        (start, end) inclusive, or None to serve the whole file (unsupported or multiple ranges)
+    """
+    units, _, ranges = range_header.partition("=")
+    if units.strip().lower() != "bytes" or "," in ranges:
+        return None
+    
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text == "":
+            # Suffix range: the last N bytes
+            start = max(0, file_size - int(end_text))
+            end = file_size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+    except ValueError:
+        return None
+    
+    if start >= file_size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    
+    return start, min(end, file_size - 1)
+
+
+def iter_file_range(path: Path, start: int, end: int, block_size: int = 64 * 1024):
+    with path.open("rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def serve_artifact(request: Request, path: Path, headers: Optional[dict] = None) -> Response:
+    """
+    Serve an immutable task artifact with a strong ETag, conditional 304s and single byte ranges.
+    
+    Full responses go through FileResponse, which hands the file to the server without
+    loading it into memory.
+    """
+    etag = get_etag(path)
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        **(headers or {})
     }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_etags = [tag.strip() for tag in if_none_match.split(",")]
+        client_etags = [tag[2:] if tag.startswith("W/") else tag for tag in client_etags]
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    # If-Range: only honour the range while the client's copy is still current
+    if range_header and request.headers.get("if-range", etag) == etag:
+        file_size = path.stat().st_size
+        byte_range = parse_byte_range(range_header, file_size)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+    
+    return FileResponse(path=path, media_type=media_type, headers=headers)
+
+
+def get_image_variant(image_path: Path, width: Optional[int], fmt: Optional[str]) -> Path:
+    """
+    Resized and/or re-encoded copy of a result image, generated once and cached on disk
+    next to the task's images. Images are never upscaled.
+    """
+    fmt = fmt or image_path.suffix.lstrip(".").replace("jpg", "jpeg")
+    extension, encode_params = IMAGE_VARIANT_FORMATS[fmt]
+    
+    variant_dir = image_path.parent / "variants"
+    variant_path = variant_dir / f"{image_path.stem}_{width or 'full'}{extension}"
+    if variant_path.exists():
+        return variant_path
+    
+    import cv2
+    
+    image = cv2.imread(str(image_path))
+    if width and width < image.shape[1]:
+        height = max(1, round(image.shape[0] * width / image.shape[1]))
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    
+    success, encoded = cv2.imencode(extension, image, encode_params)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Could not encode image as {fmt}")
+    
+    # Write to a temp file first so concurrent requests never read a partial image
+    variant_dir.mkdir(exist_ok=True)
+    tmp_path = variant_dir / f"{variant_path.name}.{uuid.uuid4().hex}.tmp"
+    tmp_path.write_bytes(encoded.tobytes())
+    os.replace(tmp_path, variant_path)
+    
+    return variant_path
 
 
 @app.get("/download/{task_id}/{filename}")
-async def download_image(task_id: str, filename: str):
+def download_image(
+    request: Request,
+    task_id: str,
+    filename: str,
+    w: Optional[int] = Query(None, ge=16, le=3840),
+    fmt: Optional[str] = Query(None, pattern="^(png|jpeg|webp)$")
+):
     """
     Download a specific result image.
     
+    Optional `w` (width in pixels) and `fmt` (png, jpeg, webp) return a resized or
+    re-encoded variant, e.g. `?w=640&fmt=webp`. Responses carry a strong ETag and
+    long-lived Cache-Control, and support If-None-Match and Range requests.
+    
     Returns:
         Image file
     """
@@ -395,34 +1199,246 @@ async def download_image(task_id: str, filename: str):
     if not image_path.exists():
         raise HTTPException(status_code=404, detail="Image file not found on disk")
     
-    return FileResponse(
-        path=image_path,
-        media_type="image/png",
-        headers={"Content-Disposition": f"inline; filename={filename}"}
+    if w is not None or fmt is not None:
+        image_path = get_image_variant(image_path, w, fmt)
+    
+    return serve_artifact(
+        request,
+        image_path,
+        headers={"Content-Disposition": f"inline; filename={image_path.name}"}
     )
 
 
+@app.post("/live/start")
+async def start_live(
+    source: str = Query(..., description="Camera index, stream URL, or video file (may still be growing)"),
+    latency_budget: float = Query(1.0, gt=0, le=30, description="Seconds a frame may wait before it is dropped")
+):
+    """
+    Start live analysis of a camera, stream or growing video file.
+    
+    Detection, tracking, team assignment, possession and rolling formations run in
+    their own process. Frames are dropped or detected less often to stay within the
+    latency budget. Updates are streamed from GET /live/{live_id}/stream.
+    
+    Returns:
+        live_id and the stream URL
+    """
+    source = resolve_live_source(source)
+    
+    live_id = str(uuid.uuid4())
+    live_dir = TEMP_RESULTS_DIR / "live" / live_id
+    live_dir.mkdir(parents=True)
+    updates_path = live_dir / "updates.jsonl"
+    updates_path.touch()
+    stop_path = live_dir / "stop"
+    
+    process = multiprocessing.get_context("spawn").Process(target=run_live_job, args=({
+        "source": source,
+        "model_path": str(MODEL_PATH),
+        "latency_budget": latency_budget,
+        "updates_path": str(updates_path),
+        "stop_path": str(stop_path)
+    },), daemon=True)
+    process.start()
+    
+    live_sessions[live_id] = {
+        "live_id": live_id,
+        "source": source,
+        "latency_budget": latency_budget,
+        "process": process,
+        "updates_path": updates_path,
+        "stop_path": stop_path
+    }
+    logger.info(f"Live {live_id}: Started for {source}")
+    
+    return {
+        "live_id": live_id,
+        "status": "running",
+        "stream": f"/live/{live_id}/stream",
+        "stop": f"/live/{live_id}/stop"
+    }
+
+
+def resolve_live_source(source: str) -> str:
+    """
+    Camera index, allow-listed stream URL (LIVE_STREAM_PREFIXES) or video file inside input_videos.
+    
+    Anything else is rejected: absolute paths and ".." leaving input_videos, and other URLs.
+    """
+    if source.isdigit():
+        return source
+    if "://" in source:
+        if not any(source.startswith(prefix) for prefix in LIVE_STREAM_PREFIXES):
+            raise HTTPException(status_code=400, detail="Stream URL not allowed (see LIVE_STREAM_PREFIXES)")
+        return source
+    
+    input_dir = INPUT_DIR.resolve()
+    source_path = (input_dir / source).resolve()
+    if not source_path.is_relative_to(input_dir):
+        raise HTTPException(status_code=400, detail="Video files must be inside input_videos")
+    if not source_path.is_file():
+        raise HTTPException(status_code=404, detail=f"Video file not found: {source}")
+    return str(source_path)
+
+
+def get_live_session(live_id: str) -> dict:
+    if live_id not in live_sessions:
+        raise HTTPException(status_code=404, detail="Live session not found")
+    return live_sessions[live_id]
+
+
+def read_last_update(path: Path, update_types: tuple, tail_bytes: int = 64 * 1024) -> Optional[dict]:
+    """Most recent update of one of update_types among the last tail_bytes of an updates file."""
+    with path.open("rb") as f:
+        f.seek(max(0, path.stat().st_size - tail_bytes))
+        lines = f.read().decode("utf-8", errors="ignore").splitlines()
+    for line in reversed(lines):
+        try:
+            update = json.loads(line)
+        except ValueError:
+            continue
+        if update.get("type") in update_types:
+            return update
+    return None
+
+
+@app.get("/live/{live_id}")
+async def get_live_status(live_id: str):
+    """
+    Live session status with the latest stats update (frames received, processed,
+    skipped and dropped, detection stride, latency percentiles and possession).
+    """
+    session = get_live_session(live_id)
+    running = session["process"].is_alive()
+    last = await asyncio.to_thread(read_last_update, session["updates_path"], ("stats", "error"))
+    
+    if running:
+        status = "stopping" if session["stop_path"].exists() else "running"
+    else:
+        status = "failed" if last and last["type"] == "error" else "stopped"
+    
+    return {
+        "live_id": live_id,
+        "status": status,
+        "source": session["source"],
+        "latency_budget": session["latency_budget"],
+        "error": last["error"] if last and last["type"] == "error" else None,
+        "stats": last if last and last["type"] == "stats" else None
+    }
+
+
+async def stream_live_updates(request: Request, session: dict, last_event_id: int):
+    """
+    Tail a live session's updates file as server-sent events until the session ends.
+    
+    The event id is the update's line number, so a reconnecting client sending
+    Last-Event-ID continues where it left off. The file is read in blocks on a worker
+    thread, so a slow disk never stalls the event loop.
+    """
+    line_num = 0
+    partial = ""
+    last_sent = time.monotonic()
+    
+    f = await asyncio.to_thread(session["updates_path"].open)
+    try:
+        while True:
+            # checked before reading, so everything the process wrote before exiting is read
+            running = session["process"].is_alive()
+            block = await asyncio.to_thread(f.read, LIVE_READ_BYTES)
+            if block:
+                # the writer may be mid-line, the rest stays in partial until it arrives
+                *lines, partial = (partial + block).split("\n")
+                for line in lines:
+                    line_num += 1
+                    if line_num <= last_event_id:
+                        continue
+                    
+                    update = json.loads(line)
+                    if "captured_at" in update:
+                        # capture to client, on top of the analysis latency_ms
+                        update["delivered_latency_ms"] = round(1000 * (time.time() - update["captured_at"]), 1)
+                    yield f"id: {line_num}\nevent: {update['type']}\ndata: {json.dumps(update)}\n\n"
+                    last_sent = time.monotonic()
+                continue
+            
+            if not running:
+                yield "event: end\ndata: {}\n\n"
+                return
+            
+            if await request.is_disconnected():
+                return
+            
+            if time.monotonic() - last_sent > LIVE_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            
+            await asyncio.sleep(0.05)
+    finally:
+        f.close()
+
+
+@app.get("/live/{live_id}/stream")
+async def stream_live(live_id: str, request: Request):
+    """
+    Server-sent events with live updates: "possession" (possession changes and
+    percentages), "formation" (rolling formation per team), "heatmap" (team
+    occupancy grids so far, every 10 s), "stats" and "error", then "end" when the
+    session stops. Every update carries latency_ms (capture to
+    publish) and delivered_latency_ms (capture to this response).
+    """
+    session = get_live_session(live_id)
+    
+    last_event_id = request.headers.get("last-event-id", "0")
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else 0
+    
+    return StreamingResponse(
+        stream_live_updates(request, session, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/live/{live_id}/stop")
+async def stop_live(live_id: str):
+    """Ask a live session to stop, it finishes the frame in progress and publishes final stats."""
+    session = get_live_session(live_id)
+    session["stop_path"].touch()
+    return {
+        "live_id": live_id,
+        "status": "stopping" if session["process"].is_alive() else "stopped"
+    }
+
+
 @app.delete("/cleanup/{task_id}")
 async def cleanup_task(task_id: str):
     """
     Clean up all files associated with a task.
     
     Deletes:
-        - Video file from input_videos
+        - Uploaded video (input_videos/uploads/<task_id>/)
         - Cached result images
         - Task from memory
+    
+    A queued or processing task has to be cancelled first (POST /cancel/{task_id}).
     """
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     
     task = tasks[task_id]
     
+    if task["status"] in ACTIVE_STATUSES:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Task is still {task['status']}, cancel it with POST /cancel/{task_id} and wait for it to stop"
+        )
+    
     try:
-        # Delete video file from input_videos if it still exists
-        video_path = INPUT_DIR / task["video_filename"]
-        if video_path.exists():
-            video_path.unlink()
-            logger.info(f"Deleted video file: {video_path}")
+        # Delete the task's upload folder if it still exists
+        upload_dir = UPLOAD_DIR / task_id
+        if upload_dir.exists():
+            shutil.rmtree(upload_dir)
+            logger.info(f"Deleted upload directory: {upload_dir}")
         
         # Delete cached result images
         task_cache_dir = TEMP_RESULTS_DIR / task_id
@@ -483,6 +1499,7 @@ async def analyze_formations(task_id: str):
             detail=f"Task is not completed. Current status: {task['status']}"
         )
     
+    openai_client = get_openai_client()
     if not openai_client:
         raise HTTPException(
             status_code=503, 
@@ -618,6 +1635,6 @@ if __name__ == "__main__":
     logger.info(f"Base directory: {BASE_DIR}")
     logger.info(f"Backend directory: {BACKEND_DIR}")
     logger.info(f"Input directory: {INPUT_DIR}")
-    logger.info(f"Output directory: {OUTPUT_DIR}")
+    logger.info(f"Results directory: {TEMP_RESULTS_DIR}")
     
     uvicorn.run(app, host="0.0.0.0", port=8000)
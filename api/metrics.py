@@ -0,0 +1,159 @@
+"""
+Minimal Prometheus metrics for the API, rendered in the text exposition format
+served by GET /metrics (no prometheus_client dependency needed).
+"""
+import math
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Monotonic total, optionally split by labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            values = dict(self.values)
+        return self.header() + [
+            f"{self.name}{format_labels(key)} {format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float]):
+        super().__init__(name, description)
+        self.buckets = sorted(buckets) + [math.inf]
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            # [bucket counts..., sum, count]
+            series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        lines = self.header()
+        for key, values in series.items():
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', format_value(bound)),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {format_value(values[-2])}")
+            lines.append(f"{self.name}_count{format_labels(key)} {values[-1]}")
+        return lines
+
+
+def render(metrics: Sequence[Metric]) -> str:
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+# Job metrics, recorded by run_processing_script in main.py
+JOB_SECONDS = Histogram(
+    "soccer_analytics_job_seconds",
+    "Wall time of analysis jobs from submission to finish, by outcome",
+    [5, 15, 30, 60, 120, 300, 600, 1200, 1800]
+)
+JOB_QUEUE_SECONDS = Histogram(
+    "soccer_analytics_job_queue_seconds",
+    "Time analysis jobs waited for a free worker",
+    [0.1, 1, 5, 15, 60, 300, 900]
+)
+JOB_FPS = Histogram(
+    "soccer_analytics_job_frames_per_second",
+    "Video frames analyzed per second of worker time, completed jobs",
+    [1, 2, 5, 10, 20, 30, 50, 100, 250]
+)
+JOBS_TOTAL = Counter("soccer_analytics_jobs_total", "Finished analysis jobs, by outcome")
+FRAMES_TOTAL = Counter("soccer_analytics_frames_processed_total", "Video frames analyzed by completed jobs")
+STAGE_SECONDS = Counter("soccer_analytics_stage_seconds_total", "Wall time spent in each pipeline stage and component step")
+STAGE_CPU_SECONDS = Counter("soccer_analytics_stage_cpu_seconds_total", "CPU time spent in each pipeline stage and component step")
+WORKER_PEAK_RSS = Gauge("soccer_analytics_worker_peak_rss_megabytes", "Peak resident memory of a worker after its last job")
+LAST_JOB_FPS = Gauge("soccer_analytics_last_job_frames_per_second", "Frames per second of the last completed job")
+
+# Set when /metrics is scraped, from the task table
+JOBS_QUEUED = Gauge("soccer_analytics_jobs_queued", "Jobs waiting for a worker")
+JOBS_RUNNING = Gauge("soccer_analytics_jobs_running", "Jobs running in a worker")
+LIVE_SESSIONS = Gauge("soccer_analytics_live_sessions", "Live analysis sessions running")
+
+REGISTRY = [
+    JOBS_QUEUED, JOBS_RUNNING, LIVE_SESSIONS, JOBS_TOTAL, JOB_SECONDS, JOB_QUEUE_SECONDS, JOB_FPS,
+    LAST_JOB_FPS, FRAMES_TOTAL, STAGE_SECONDS, STAGE_CPU_SECONDS, WORKER_PEAK_RSS
+]
+
+
+def record_job(outcome: str, job: dict, stages: Optional[list]):
+    """Record a finished job: job is the task's metrics["job"], stages the pipeline stage summary."""
+    JOBS_TOTAL.inc(outcome=outcome)
+    JOB_SECONDS.observe(job["total_s"], outcome=outcome)
+    if job.get("queue_wait_s") is not None:
+        JOB_QUEUE_SECONDS.observe(job["queue_wait_s"])
+    if job.get("fps"):
+        JOB_FPS.observe(job["fps"])
+        LAST_JOB_FPS.set(job["fps"])
+        FRAMES_TOTAL.inc(job["frames"])
+
+    peak_rss = None
+    for stage in stages or []:
+        STAGE_SECONDS.inc(stage["wall_s"], stage=stage["stage"])
+        STAGE_CPU_SECONDS.inc(stage["cpu_s"], stage=stage["stage"])
+        if stage.get("peak_rss_mb") is not None:
+            peak_rss = max(peak_rss or 0, stage["peak_rss_mb"])
+    if peak_rss is not None:
+        WORKER_PEAK_RSS.set(peak_rss)
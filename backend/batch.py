@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+from pipeline.batch import VIDEO_EXTENSIONS, find_videos, read_manifest, run_batch
+from utils import ANALYSIS_PROFILE
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of match videos")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input-dir', help="Folder of match videos")
+    source.add_argument('--manifest', help="Text file with one video path per line")
+    parser.add_argument('--output-dir', default='batch_results', help="One folder per match plus index.json/index.csv")
+    parser.add_argument('--model', default='models/best.pt', help="YOLO model weights")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes, each keeps its own model loaded (mind GPU memory)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Threads per worker for torch, OpenMP/BLAS and OpenCV, default CPUs / workers")
+    parser.add_argument('--chunk-size', type=int, default=100, help="Frames per checkpointed chunk")
+    parser.add_argument('--timeout', type=float, default=None, help="Stop a match after this many seconds")
+    parser.add_argument('--no-images', action='store_true', help="Only write results.json and tracks.parquet")
+    parser.add_argument('--transcode', action='store_true',
+                        help=f"Analyze copies of the videos scaled to at most {ANALYSIS_PROFILE['max_height']}p "
+                             f"and {ANALYSIS_PROFILE['max_fps']} fps")
+    parser.add_argument('--force', action='store_true', help="Reprocess matches that already have results")
+    parser.add_argument('--keep-checkpoints', action='store_true',
+                        help="Keep stage checkpoints of finished matches (deleted by default to save disk)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    videos = find_videos(args.input_dir, VIDEO_EXTENSIONS) if args.input_dir else read_manifest(args.manifest)
+    if not videos:
+        sys.exit("No videos found")
+    if not os.path.exists(args.model):
+        print(f"Warning: model not found ({args.model}), matches will fail at detection")
+
+    entries, throughput = run_batch(
+        videos,
+        args.output_dir,
+        model_path=args.model,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        timeout=args.timeout,
+        render_images=not args.no_images,
+        force=args.force,
+        keep_checkpoints=args.keep_checkpoints,
+        threads=args.threads,
+        analysis_profile=ANALYSIS_PROFILE if args.transcode else None,
+    )
+
+    print(f"\n{'Match':<30}{'Status':<11}{'Team 1':>8}{'Team 2':>8}  Formations (start)")
+    for entry in entries:
+        possession = entry.get('possession', {})
+        formations = entry.get('formations', {})
+        start_formations = ' vs '.join(formations.get(team, {}).get('Start', '-') for team in ('1', '2')) if formations else ''
+        print(f"{entry['name']:<30}{entry['status']:<11}{possession.get('1', '-'):>8}{possession.get('2', '-'):>8}  "
+              f"{start_formations or entry.get('error') or ''}")
+
+    print(f"\nProcessed {throughput['processed']} matches ({throughput['cached']} cached, {throughput['failed']} failed) "
+          f"in {throughput['seconds']:.1f}s on {throughput['workers']} workers: "
+          f"{throughput['frames_per_second']} frames/s, {throughput['matches_per_hour']} matches/hour")
+    print(f"Index written to {os.path.join(args.output_dir, 'index.json')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .synthetic import SyntheticMatch, TEAM_COLORS, FORMATION_TEMPLATES
@@ -0,0 +1,120 @@
+"""
+Aggregate detection throughput of concurrent jobs: every job with its own model against
+all jobs sharing one InferenceServer.
+
+Run from the backend folder:
+    python -m benchmarks.inference_benchmark --jobs 4 --frames 100 --output inference.json
+
+Jobs run in their own processes and detect the same synthetic frames in batches, like the
+pipeline's detect stage. Models are loaded and warmed up before the timed run starts, and the
+detections of both modes are compared, they have to be the same.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+import numpy as np
+from .synthetic import SyntheticMatch
+
+
+def run_job(model_path, inference_address, num_frames, seed, barrier, results):
+    """One job: detect num_frames synthetic frames once everyone is ready, report time and boxes"""
+    from trackers import Tracker
+    frames = list(SyntheticMatch(num_frames=num_frames, seed=seed).iter_frames())
+    tracker = Tracker(model_path, inference_address=inference_address)
+    tracker.detect_frames(frames[:1])
+    barrier.wait()
+
+    start = time.perf_counter()
+    detections = tracker.detect_frames(frames)
+    seconds = time.perf_counter() - start
+    boxes = [tracker.to_supervision(detection)[0].xyxy.round(1).tolist() for detection in detections]
+    tracker.close()
+    results.put((seed, start, start + seconds, boxes))
+
+
+def run_mode(args, shared):
+    context = multiprocessing.get_context('spawn')
+    server = None
+    inference_address = None
+    if shared:
+        from trackers import serve
+        receiver, sender = context.Pipe(duplex=False)
+        server = context.Process(target=serve, args=(args.model, sender, args.max_batch, args.max_wait_ms / 1000),
+                                 daemon=True)
+        server.start()
+        inference_address = receiver.recv()
+
+    barrier = context.Barrier(args.jobs)
+    results = context.Queue()
+    jobs = [context.Process(target=run_job, args=(args.model, inference_address, args.frames, seed, barrier, results))
+            for seed in range(args.jobs)]
+    for job in jobs:
+        job.start()
+    outcomes = sorted(results.get() for _ in jobs)
+    for job in jobs:
+        job.join()
+
+    stats = None
+    if server is not None:
+        from trackers import InferenceClient
+        client = InferenceClient(inference_address)
+        stats = client.stats()
+        client.close()
+        server.terminate()
+
+    # wall time from the first job starting to the last one finishing
+    seconds = max(end for _, _, end, _ in outcomes) - min(start for _, start, _, _ in outcomes)
+    frames = args.jobs * args.frames
+    result = {
+        'mode': 'shared' if shared else 'independent',
+        'jobs': args.jobs,
+        'frames': frames,
+        'seconds': round(seconds, 3),
+        'fps': round(frames / seconds, 2),
+        'server': stats,
+    }
+    print(f"{result['mode']:<12} {args.jobs} jobs {frames:>6} frames {seconds:8.2f}s {result['fps']:8.2f} frames/s",
+          file=sys.stderr)
+    return result, [boxes for _, _, _, boxes in outcomes]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare per-job models with a shared inference server")
+    parser.add_argument('--model', default='models/best.pt', help="YOLO weights")
+    parser.add_argument('--jobs', type=int, default=4, help="Concurrent jobs")
+    parser.add_argument('--frames', type=int, default=100, help="Frames detected per job")
+    parser.add_argument('--max-batch', type=int, default=32, help="Largest batch of the inference server")
+    parser.add_argument('--max-wait-ms', type=float, default=20, help="Inference server coalescing deadline")
+    parser.add_argument('--output', default=None, help="Write the results JSON here")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    independent, independent_boxes = run_mode(args, shared=False)
+    shared, shared_boxes = run_mode(args, shared=True)
+
+    same = all(
+        len(a) == len(b) and np.allclose(np.array(a).reshape(-1, 4), np.array(b).reshape(-1, 4), atol=0.5)
+        for job_a, job_b in zip(independent_boxes, shared_boxes)
+        for a, b in zip(job_a, job_b)
+    )
+    report = {
+        'runs': [independent, shared],
+        'speedup': round(shared['fps'] / independent['fps'], 3),
+        'same_detections': same,
+    }
+    print(f"shared server {report['speedup']}x the aggregate throughput, same detections: {same}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmarks for the backend hot paths on a synthetic match.
+
+Run from the backend folder:
+    python -m benchmarks.run_benchmarks --frames 1500 --output bench.json
+
+Every stage reports wall time, throughput (items per second) and peak traced
+memory as JSON, so runs can be diffed to catch regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from formation_analyzer import FormationAnalyzer, TacticalMetrics
+from team_assigner import TeamAssigner
+from player_ball_assigner import PossessionEngine, EventExtractor
+from .synthetic import SyntheticMatch
+
+
+def measure(func, repeat=1, trace_memory=True):
+    """
+    Best wall time over repeat runs, plus peak traced memory from one extra traced run
+    (tracing slows code down, so it never overlaps the timed runs)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    return min(timings), peak_mb
+
+
+def run_stage(name, func, items, unit, repeat, trace_memory):
+    seconds, peak_mb = measure(func, repeat, trace_memory)
+    result = {
+        "stage": name,
+        "items": items,
+        "unit": unit,
+        "seconds": round(seconds, 6),
+        "items_per_s": round(items / seconds, 2) if seconds > 0 else None,
+        "peak_mb": None if peak_mb is None else round(peak_mb, 3),
+    }
+    print(f"{name:<18} {items:>7} {unit:<10} {seconds:9.4f}s  {result['items_per_s']} {unit}/s", file=sys.stderr)
+    return result
+
+
+def get_stages(match, tracks, args):
+    """(name, func, items, unit) for every benchmarked stage"""
+    formation_analyzer = FormationAnalyzer()
+    frame_width, frame_height = match.frame_width, match.frame_height
+
+    sample_frames = np.linspace(0, match.num_frames - 1, min(args.sample_frames, match.num_frames)).astype(int).tolist()
+    positions = [formation_analyzer.get_player_positions(tracks, 1, f) for f in sample_frames]
+    normalized = [formation_analyzer.normalize_positions(p, frame_width, frame_height) for p in positions]
+    position_array, _ = formation_analyzer.get_position_arrays(tracks, 1, sample_frames)
+    cluster_frames = normalized[:args.cluster_frames]
+    formations = [formation_analyzer.get_team_formation(tracks, 1, frame_width, frame_height, f)
+                  for f in sample_frames[:args.render_frames]]
+
+    frames = list(match.iter_frames(sample_frames[:args.color_frames]))
+    crops = [(frame, track['bbox'])
+             for frame, f in zip(frames, sample_frames)
+             for track in tracks['players'][f].values()]
+
+    def roster():
+        for f in sample_frames:
+            formation_analyzer.get_player_positions(tracks, 1, f)
+
+    def best_frames():
+        for team_id in (1, 2):
+            formation_analyzer.get_formation_frames(tracks, team_id)
+
+    def normalization():
+        for p in positions:
+            formation_analyzer.normalize_positions(p, frame_width, frame_height)
+
+    def normalization_array():
+        formation_analyzer.normalize_position_arrays(position_array, frame_width, frame_height)
+
+    def clustering():
+        for p in cluster_frames:
+            formation_analyzer.detect_formation(p)
+
+    def possession():
+        PossessionEngine().get_match_possession(tracks)
+
+    match_possession = PossessionEngine().get_match_possession(tracks)
+
+    def events():
+        EventExtractor().get_match_events(tracks, match_possession, frame_width)
+
+    def tactical_metrics():
+        TacticalMetrics(frame_width, frame_height).get_match_metrics(tracks)
+
+    def color_extraction():
+        team_assigner = TeamAssigner()
+        for frame, bbox in crops:
+            team_assigner.get_player_color(frame, bbox)
+
+    def team_fit():
+        TeamAssigner().assign_team_color(frames[0], tracks['players'][sample_frames[0]])
+
+    def rendering():
+        for formation in formations:
+            diagram = formation_analyzer.draw_team_formation(formation, frame_width, frame_height, 'Start')
+            cv2.imencode('.png', diagram)
+
+    def frame_synthesis():
+        for _ in match.iter_frames(sample_frames[:args.color_frames]):
+            pass
+
+    stages = [
+        ("roster", roster, len(sample_frames), "frames"),
+        ("best_frames", best_frames, 2, "teams"),
+        ("normalization", normalization, len(positions), "frames"),
+        ("normalization_arr", normalization_array, len(position_array), "frames"),
+        ("clustering", clustering, len(cluster_frames), "frames"),
+        ("possession", possession, match.num_frames, "frames"),
+        ("events", events, match.num_frames, "frames"),
+        ("tactical_metrics", tactical_metrics, match.num_frames, "frames"),
+        ("color_extraction", color_extraction, len(crops), "crops"),
+        ("team_fit", team_fit, 1, "fits"),
+        ("rendering", rendering, len(formations), "diagrams"),
+        ("frame_synthesis", frame_synthesis, len(frames), "frames"),
+    ]
+
+    detection = get_detection_stage(match, sample_frames[:args.detect_frames], args.model)
+    if detection is not None:
+        stages.append(detection)
+
+    return stages
+
+
+def get_detection_stage(match, frame_nums, model_path):
+    """Detection needs ultralytics and the model weights, skipped when either is missing"""
+    if not model_path or not os.path.exists(model_path):
+        print(f"detection skipped: model not found ({model_path})", file=sys.stderr)
+        return None
+    try:
+        from trackers import Tracker
+    except ImportError as e:
+        print(f"detection skipped: {e}", file=sys.stderr)
+        return None
+
+    tracker = Tracker(model_path)
+    frames = list(match.iter_frames(frame_nums))
+    # load weights and warm up outside the timed runs
+    tracker.detect_frames(frames[:1])
+
+    def detection():
+        tracker.detect_frames(frames)
+
+    return ("detection", detection, len(frames), "frames")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark backend hot paths on a synthetic match")
+    parser.add_argument('--frames', type=int, default=1500, help="Synthetic match length in frames")
+    parser.add_argument('--fps', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample-frames', type=int, default=200, help="Frames used by per-frame stages")
+    parser.add_argument('--cluster-frames', type=int, default=20, help="Frames used by formation clustering")
+    parser.add_argument('--render-frames', type=int, default=6, help="Diagrams rendered")
+    parser.add_argument('--color-frames', type=int, default=5, help="Frames used for jersey color extraction")
+    parser.add_argument('--detect-frames', type=int, default=20, help="Frames used for detection")
+    parser.add_argument('--model', default='models/best.pt', help="YOLO weights for the detection stage")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage, best is reported")
+    parser.add_argument('--stages', nargs='*', default=None, help="Only run these stages")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced run for peak memory")
+    parser.add_argument('--output', default=None, help="Write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    start = time.perf_counter()
+    match = SyntheticMatch(num_frames=args.frames, fps=args.fps, seed=args.seed)
+    tracks = match.get_tracks()
+    generation_seconds = time.perf_counter() - start
+
+    results = []
+    for name, func, items, unit in get_stages(match, tracks, args):
+        if args.stages and name not in args.stages:
+            continue
+        results.append(run_stage(name, func, items, unit, args.repeat, not args.no_memory))
+
+    report = {
+        "config": {
+            "frames": args.frames,
+            "fps": args.fps,
+            "seed": args.seed,
+            "sample_frames": args.sample_frames,
+            "repeat": args.repeat,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+        },
+        "generation_seconds": round(generation_seconds, 4),
+        "stages": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import numpy as np
+import cv2
+
+# Base positions on a 105x68 pitch for a team attacking towards +x (goalkeeper first)
+FORMATION_TEMPLATES = {
+    '4-4-2': [(5, 34),
+              (20, 10), (20, 26), (20, 42), (20, 58),
+              (40, 10), (40, 26), (40, 42), (40, 58),
+              (58, 26), (58, 42)],
+    '4-3-3': [(5, 34),
+              (20, 10), (20, 26), (20, 42), (20, 58),
+              (38, 17), (38, 34), (38, 51),
+              (56, 12), (56, 34), (56, 56)],
+}
+
+# Jersey colors (BGR) per team
+TEAM_COLORS = {1: (40, 40, 210), 2: (235, 235, 235)}
+
+PITCH_LENGTH = 105
+PITCH_WIDTH = 68
+PLAYERS_PER_TEAM = 11
+
+
+class SyntheticMatch:
+    """
+    Synthetic match for benchmarks: 22 players in two formations drifting with the play,
+    a ball passed between them, a referee, detector jitter, dropped detections and
+    ByteTrack-style id switches. Produces the same tracks structure as Tracker and
+    matching frames with colored jerseys, for any match length
+    """
+    def __init__(self, num_frames=750, fps=25, frame_width=1920, frame_height=1080,
+                 formations=('4-4-2', '4-3-3'), jitter=2.0, dropout_rate=0.03,
+                 id_switch_rate=0.0005, ball_dropout_rate=0.1, seed=0):
+        self.num_frames = num_frames
+        self.fps = fps
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.rng = np.random.default_rng(seed)
+
+        self.player_teams = np.repeat([1, 2], PLAYERS_PER_TEAM)
+        self.player_positions = self.simulate_players(formations)
+        self.player_bboxes = self.to_bboxes(self.player_positions, jitter)
+
+        num_players = len(self.player_teams)
+        # detections missing for a frame (occlusion, low confidence)
+        self.player_visible = self.rng.random((num_frames, num_players)) >= dropout_rate
+        # a switch gives the player a new track id from that frame on
+        switches = np.cumsum(self.rng.random((num_frames, num_players)) < id_switch_rate, axis=0)
+        self.player_track_ids = np.arange(1, num_players + 1)[None, :] + num_players * switches
+
+        self.ball_positions = self.simulate_ball()
+        self.ball_visible = self.rng.random(num_frames) >= ball_dropout_rate
+
+        self.referee_positions = self.ball_positions[:, None, :] + np.array([[[-8.0, 6.0]]])
+        self.referee_bboxes = self.to_bboxes(np.clip(self.referee_positions, 0, [PITCH_LENGTH, PITCH_WIDTH]), jitter)
+
+        self.pitch = self.draw_pitch()
+
+    def simulate_players(self, formations):
+        """(frames, players, 2) pitch positions: formation shape + team block shift + individual drift"""
+        t = np.arange(self.num_frames)[:, None] / self.fps
+
+        base = []
+        for team_index, formation in enumerate(formations):
+            template = np.array(FORMATION_TEMPLATES[formation], dtype=float)
+            if team_index == 1:
+                # second team attacks towards -x
+                template[:, 0] = PITCH_LENGTH - template[:, 0]
+            base.append(template)
+        base = np.concatenate(base)
+
+        # whole teams push up and drop back together over ~40s
+        block_shift = 12 * np.sin(2 * np.pi * t / 40)
+
+        num_players = len(base)
+        frequency = self.rng.uniform(0.05, 0.2, num_players)
+        phase = self.rng.uniform(0, 2 * np.pi, (2, num_players))
+        drift_x = 3 * np.sin(2 * np.pi * frequency * t + phase[0])
+        drift_y = 3 * np.cos(2 * np.pi * frequency * t + phase[1])
+
+        positions = np.empty((self.num_frames, num_players, 2))
+        positions[:, :, 0] = base[:, 0] + block_shift + drift_x
+        positions[:, :, 1] = base[:, 1] + drift_y
+        return np.clip(positions, 1, [PITCH_LENGTH - 1, PITCH_WIDTH - 1])
+
+    def to_image(self, positions):
+        """Pitch to image coordinates with a simple broadcast perspective (far side compressed)"""
+        x = 100 + positions[..., 0] / PITCH_LENGTH * (self.frame_width - 200)
+        y = self.frame_height * (0.25 + 0.65 * positions[..., 1] / PITCH_WIDTH)
+        return x, y
+
+    def to_bboxes(self, positions, jitter):
+        """(frames, n, 4) bboxes with feet at the image position, closer players are taller"""
+        foot_x, foot_y = self.to_image(positions)
+        height = self.frame_height * (0.04 + 0.06 * positions[..., 1] / PITCH_WIDTH)
+        width = 0.45 * height
+
+        bboxes = np.stack([foot_x - width / 2, foot_y - height, foot_x + width / 2, foot_y], axis=-1)
+        bboxes += self.rng.normal(0, jitter, bboxes.shape)
+        return bboxes
+
+    def simulate_ball(self):
+        """
+        (frames, 2) pitch positions of the ball: held at a player's feet, then passed
+        (80% to a teammate) with a short flight between holders
+        """
+        num_players = len(self.player_teams)
+        pass_frames = max(1, self.fps // 3)
+        ball = np.empty((self.num_frames, 2))
+
+        holder = self.rng.integers(num_players)
+        frame_num = 0
+        while frame_num < self.num_frames:
+            hold_frames = int(self.rng.integers(self.fps, 4 * self.fps))
+            hold_end = min(frame_num + hold_frames, self.num_frames)
+            ball[frame_num:hold_end] = self.player_positions[frame_num:hold_end, holder] + [0.5, 0.3]
+
+            teammates = np.flatnonzero(self.player_teams == self.player_teams[holder])
+            candidates = teammates if self.rng.random() < 0.8 else np.flatnonzero(self.player_teams != self.player_teams[holder])
+            next_holder = self.rng.choice(candidates[candidates != holder])
+
+            flight_end = min(hold_end + pass_frames, self.num_frames)
+            if flight_end > hold_end:
+                start = ball[hold_end - 1]
+                end = self.player_positions[flight_end - 1, next_holder]
+                progress = np.linspace(0, 1, flight_end - hold_end + 1)[1:, None]
+                ball[hold_end:flight_end] = start + (end - start) * progress
+
+            holder = next_holder
+            frame_num = flight_end
+        return ball
+
+    def get_tracks(self, with_teams=True):
+        """
+        Tracks in the Tracker format: {'players': [...], 'referees': [...], 'ball': [...]},
+        with 'team' and 'team_color' on players as set by the team assignment step
+        """
+        tracks = {"players": [], "referees": [], "ball": []}
+
+        ball_x, ball_y = self.to_image(self.ball_positions)
+        for frame_num in range(self.num_frames):
+            players = {}
+            for player in np.flatnonzero(self.player_visible[frame_num]):
+                track = {"bbox": self.player_bboxes[frame_num, player].tolist()}
+                if with_teams:
+                    team = int(self.player_teams[player])
+                    track["team"] = team
+                    track["team_color"] = TEAM_COLORS[team]
+                players[int(self.player_track_ids[frame_num, player])] = track
+            tracks["players"].append(players)
+
+            tracks["referees"].append({1000: {"bbox": self.referee_bboxes[frame_num, 0].tolist()}})
+
+            ball = {}
+            if self.ball_visible[frame_num]:
+                ball[1] = {"bbox": [ball_x[frame_num] - 8, ball_y[frame_num] - 8,
+                                    ball_x[frame_num] + 8, ball_y[frame_num] + 8]}
+            tracks["ball"].append(ball)
+
+        return tracks
+
+    def draw_pitch(self):
+        pitch = np.empty((self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        pitch[:] = (50, 140, 60)
+        # mowing stripes and grass noise so jersey crops aren't trivially uniform
+        stripe = (np.arange(self.frame_width) // 120) % 2 == 0
+        pitch[:, stripe] = (45, 125, 55)
+        pitch += self.rng.integers(0, 12, pitch.shape, dtype=np.uint8)
+
+        corner_x, corner_y = self.to_image(np.array([[0, 0], [PITCH_LENGTH, PITCH_WIDTH]], dtype=float))
+        cv2.rectangle(pitch, (int(corner_x[0]), int(corner_y[0])), (int(corner_x[1]), int(corner_y[1])),
+                      (255, 255, 255), 3)
+        center_x = self.frame_width // 2
+        cv2.line(pitch, (center_x, int(corner_y[0])), (center_x, int(corner_y[1])), (255, 255, 255), 3)
+        return pitch
+
+    def get_frame(self, frame_num):
+        """Frame with players drawn as jersey (top half) and shorts (bottom half) boxes, and the ball"""
+        frame = self.pitch.copy()
+
+        for player in np.flatnonzero(self.player_visible[frame_num]):
+            x1, y1, x2, y2 = self.player_bboxes[frame_num, player].astype(int)
+            # shrink a little so the bbox corners stay on grass, like a real detection
+            pad_x = max(1, (x2 - x1) // 6)
+            middle_y = (y1 + y2) // 2
+            jersey = TEAM_COLORS[int(self.player_teams[player])]
+            cv2.rectangle(frame, (x1 + pad_x, y1 + 2), (x2 - pad_x, middle_y), jersey, -1)
+            cv2.rectangle(frame, (x1 + pad_x, middle_y), (x2 - pad_x, y2 - 2), (30, 30, 30), -1)
+
+        if self.ball_visible[frame_num]:
+            ball_x, ball_y = self.to_image(self.ball_positions[frame_num])
+            cv2.circle(frame, (int(ball_x), int(ball_y)), 6, (250, 250, 250), -1)
+
+        return frame
+
+    def iter_frames(self, frame_nums=None):
+        """Yield frames one at a time so long matches never sit in memory"""
+        for frame_num in (range(self.num_frames) if frame_nums is None else frame_nums):
+            yield self.get_frame(frame_num)
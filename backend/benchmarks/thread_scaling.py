@@ -0,0 +1,152 @@
+"""
+Aggregate throughput as more jobs run at once on the host, with every library left to its
+default thread pools against a ThreadBudget sharing the CPUs out between the jobs.
+
+Run from the backend folder:
+    python -m benchmarks.thread_scaling --jobs 1 2 4 8 --frames 50 --output scaling.json
+
+Each job is a process running the CPU-bound stages on its own synthetic match: camera
+movement (OpenCV), jersey colors and team fit (KMeans), formations (KMeans), and detection
+(torch) when models/best.pt exists. Budgeted jobs get the budget's environment from the
+start and apply it per stage, like pipeline workers. The report has the torch threads each
+job's detection actually ran with (torch.get_num_threads() inside the stage).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from contextlib import contextmanager
+from .synthetic import SyntheticMatch
+
+
+def run_job(model_path, threads, num_frames, seed, barrier, results):
+    """One job: the stages on num_frames synthetic frames once everyone is ready, reports its time"""
+    from utils import ThreadBudget
+    from camera_movement_estimator import CameraMovementEstimator
+    from team_assigner import TeamAssigner
+    from formation_analyzer import FormationAnalyzer
+
+    match = SyntheticMatch(num_frames=num_frames, seed=seed)
+    tracks = match.get_tracks()
+    frames = list(match.iter_frames())
+    tracker = None
+    if model_path and os.path.exists(model_path):
+        from trackers import Tracker
+        tracker = Tracker(model_path)
+        tracker.detect_frames(frames[:1])
+    budget = None if threads is None else ThreadBudget(threads)
+
+    def stage(name):
+        if budget is not None:
+            budget.apply(name)
+
+    barrier.wait()
+    start = time.perf_counter()
+
+    detect_threads = None
+    if tracker is not None:
+        stage('detect')
+        detect_threads = sys.modules['torch'].get_num_threads()
+        tracker.detect_frames(frames)
+
+    stage('camera')
+    CameraMovementEstimator().get_camera_movement(frames, tracks)
+
+    stage('team')
+    team_assigner = TeamAssigner()
+    team_assigner.assign_team_color(frames[0], tracks['players'][0])
+    for frame_num in range(0, num_frames, 10):
+        for track in tracks['players'][frame_num].values():
+            team_assigner.get_player_color(frames[frame_num], track['bbox'])
+
+    stage('formation')
+    formation_analyzer = FormationAnalyzer()
+    for frame_num in range(0, num_frames, 10):
+        for team_id in (1, 2):
+            formation_analyzer.get_team_formation(tracks, team_id, match.frame_width, match.frame_height, frame_num)
+
+    results.put((start, time.perf_counter(), detect_threads))
+
+
+@contextmanager
+def environ(values):
+    """Set environment variables for the processes started inside, restored afterwards"""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_jobs(args, jobs, budgeted):
+    from utils import ThreadBudget
+    context = multiprocessing.get_context('spawn')
+    budget = ThreadBudget.for_workers(jobs) if budgeted else None
+    barrier = context.Barrier(jobs)
+    results = context.Queue()
+
+    threads = None if budget is None else budget.threads
+
+    with environ({} if budget is None else budget.environ()):
+        processes = [context.Process(target=run_job, args=(args.model, threads, args.frames, seed, barrier, results))
+                     for seed in range(jobs)]
+        for process in processes:
+            process.start()
+    timings = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    seconds = max(end for _, end, _ in timings) - min(start for start, _, _ in timings)
+    result = {
+        'jobs': jobs,
+        'budget': 'threads' if budgeted else 'default',
+        'threads_per_job': threads,
+        'detect_torch_threads': sorted({detect_threads for _, _, detect_threads in timings} - {None}),
+        'frames': jobs * args.frames,
+        'seconds': round(seconds, 3),
+        'fps': round(jobs * args.frames / seconds, 2),
+    }
+    print(f"{jobs:>3} jobs  {result['budget']:<8} {seconds:8.2f}s {result['fps']:8.2f} frames/s", file=sys.stderr)
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput scaling with jobs per host, with and without thread budgets")
+    parser.add_argument('--jobs', type=int, nargs='+', default=None,
+                        help="Concurrent job counts to run, default 1, 2, 4 ... up to twice the CPU count")
+    parser.add_argument('--frames', type=int, default=50, help="Frames per job")
+    parser.add_argument('--model', default='models/best.pt', help="YOLO weights, detection is skipped without them")
+    parser.add_argument('--output', default=None, help="Write the results JSON here")
+    return parser.parse_args()
+
+
+def main():
+    from utils import get_cpu_count
+    args = parse_args()
+    cpus = get_cpu_count()
+    job_counts = args.jobs
+    if job_counts is None:
+        job_counts = [1]
+        while job_counts[-1] < 2 * cpus:
+            job_counts.append(job_counts[-1] * 2)
+
+    runs = [run_jobs(args, jobs, budgeted) for jobs in job_counts for budgeted in (False, True)]
+    report = {'cpus': cpus, 'frames_per_job': args.frames, 'runs': runs}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
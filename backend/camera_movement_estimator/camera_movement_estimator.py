@@ -0,0 +1,132 @@
+import numpy as np
+import cv2
+import sys
+sys.path.append('../')
+from instrumentation import track_stage
+
+class CameraMovementEstimator:
+    """
+    Camera pan per frame from sparse optical flow on downscaled grayscale frames:
+      - features are picked away from players, referees and the ball and tracked from frame
+        to frame with pyramidal Lucas-Kanade, new ones are only added when too few are left
+      - the scene shift between two frames is the median flow of the tracked features,
+        features that don't follow it (something moving on the pitch) are dropped
+    Shifts are accumulated into a per-frame camera offset, see add_adjusted_positions()
+    """
+    def __init__(self, scale=0.25, max_features=200, min_features=60, min_distance=8, max_error=1.0,
+                 min_agreeing=10, object_margin=3):
+        self.scale = scale
+        self.max_features = max_features
+        self.min_features = min_features
+        self.min_distance = min_distance
+        # features further than this (downscaled pixels) from the median flow are dropped
+        self.max_error = max_error
+        # a shift followed by fewer features is ignored (textureless frames, cuts)
+        self.min_agreeing = min_agreeing
+        # downscaled pixels kept free around objects, their edges move with them
+        self.object_margin = object_margin
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+        self.previous = None
+        self.points = np.empty((0, 1, 2), dtype=np.float32)
+        self.redetections = 0
+
+    def to_gray(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def get_feature_mask(self, shape, bboxes):
+        """Mask without objects (they move on their own) and the surroundings of features already tracked"""
+        mask = np.full(shape, 255, dtype=np.uint8)
+        margin = self.object_margin
+        for x1, y1, x2, y2 in bboxes:
+            mask[max(0, int(y1 * self.scale) - margin):max(0, int(y2 * self.scale) + margin + 1),
+                 max(0, int(x1 * self.scale) - margin):max(0, int(x2 * self.scale) + margin + 1)] = 0
+        for x, y in self.points.reshape(-1, 2):
+            cv2.circle(mask, (int(x), int(y)), self.min_distance, 0, -1)
+        return mask
+
+    def add_features(self, gray, bboxes):
+        mask = self.get_feature_mask(gray.shape, bboxes)
+        features = cv2.goodFeaturesToTrack(gray, maxCorners=self.max_features - len(self.points), qualityLevel=0.01,
+                                           minDistance=self.min_distance, mask=mask, blockSize=7)
+        if features is not None:
+            self.points = np.concatenate([self.points, features.astype(np.float32)])
+        self.redetections += 1
+
+    def update(self, frame, bboxes=()):
+        """
+        Scene shift (dx, dy) in full resolution pixels since the previous frame, (0, 0) for the first
+        bboxes are the frame's objects, no features are picked on them
+        """
+        gray = self.to_gray(frame)
+        shift = np.zeros(2)
+
+        if self.previous is not None and len(self.points):
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.previous, gray, self.points, None, **self.lk_params)
+            found = status.reshape(-1) == 1
+            flow = (next_points - self.points).reshape(-1, 2)
+            keep = found
+            if found.any():
+                median = np.median(flow[found], axis=0)
+                keep = found & (np.linalg.norm(flow - median, axis=1) <= self.max_error)
+                if keep.sum() >= self.min_agreeing:
+                    shift = median
+            self.points = next_points[keep]
+
+        if len(self.points) < self.min_features:
+            self.add_features(gray, bboxes)
+
+        self.previous = gray
+        return shift / self.scale
+
+    def get_camera_movement(self, frames, tracks=None, before_frame=None):
+        """
+        Cumulative camera offset (x, y) per frame, relative to the first frame: a pitch point at
+        image position p in frame t is at p + offset[t] in the first frame's image coordinates
+        frames is any iterable of frames, tracks (Tracker format) keeps features off objects
+        before_frame() is called ahead of every frame, raising from it stops the estimation
+        Returns array (frames, 2)
+        """
+        offsets = []
+        offset = np.zeros(2)
+        for frame_num, frame in enumerate(frames):
+            if before_frame is not None:
+                before_frame()
+            bboxes = []
+            if tracks is not None and frame_num < len(tracks['players']):
+                for object_type in ('players', 'referees', 'ball'):
+                    bboxes += [track['bbox'] for track in tracks[object_type][frame_num].values()]
+            with track_stage('camera_movement.flow', items=1):
+                # the camera moves the opposite way to the scene
+                offset = offset - self.update(frame, bboxes)
+            offsets.append(offset)
+        return np.array(offsets).reshape(-1, 2)
+
+
+def add_adjusted_positions(tracks, camera_movement, frame_width, frame_height):
+    """
+    Set 'position_adjusted' on every track: its bbox center moved into a pitch-anchored
+    canvas covering everything the camera saw
+    Returns the canvas (width, height), normalize adjusted positions against it
+    """
+    camera_movement = np.asarray(camera_movement, dtype=np.float64).reshape(-1, 2)
+    if not len(camera_movement):
+        return frame_width, frame_height
+    origin = camera_movement.min(axis=0)
+    extent = camera_movement.max(axis=0) - origin
+    canvas_offsets = camera_movement - origin
+
+    for object_type, object_tracks in tracks.items():
+        for frame_num, frame_tracks in enumerate(object_tracks):
+            if frame_num >= len(canvas_offsets):
+                break
+            dx, dy = canvas_offsets[frame_num]
+            for track in frame_tracks.values():
+                x1, y1, x2, y2 = track['bbox']
+                track['position_adjusted'] = ((x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy)
+
+    return frame_width + extent[0], frame_height + extent[1]
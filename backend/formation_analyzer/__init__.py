@@ -1,3 +1,9 @@
-from .formation_analyzer import FormationAnalyzer
+from .formation_analyzer import FormationAnalyzer, get_pitch, FORMATIONS, PERSPECTIVE, ROSTER_FRAMES
+from .formation_pool import get_team_formations, slice_tracks
+from .formation_smoother import FormationSmoother
+from .tactical_metrics import TacticalMetrics, METRIC_NAMES
+from .heatmaps import HeatmapBuilder, HEATMAP_BINS, draw_heatmap, draw_heatmap_diagram
 
-__all__ = ['FormationAnalyzer']
+__all__ = ['FormationAnalyzer', 'get_team_formations', 'FormationSmoother', 'TacticalMetrics', 'METRIC_NAMES',
+           'HeatmapBuilder', 'HEATMAP_BINS', 'draw_heatmap', 'draw_heatmap_diagram', 'get_pitch',
+           'FORMATIONS', 'PERSPECTIVE', 'ROSTER_FRAMES', 'slice_tracks']
@@ -1,24 +1,113 @@
 import numpy as np
 import cv2
 from collections import defaultdict
+from functools import lru_cache
 from sklearn.cluster import KMeans
 import sys
 sys.path.append('../')
-from utils import get_center_of_bbox
+from utils import get_track_position, get_frame_arrays
+from instrumentation import track_stage
+
+# Frames before and after a frame searched for players to build a team's roster
+ROSTER_FRAMES = 10
+
+# Camera perspective: a team spread less than max_range across the frame (0-100) has its y
+# positions stretched to spread, ranges under min_range count as min_range
+PERSPECTIVE = {'max_range': 40, 'spread': 50, 'min_range': 10}
+
+FORMATIONS = {
+    '4-4-2': [1, 4, 4, 2],
+    '4-3-3': [1, 4, 3, 3],
+    '3-5-2': [1, 3, 5, 2],
+    '4-2-3-1': [1, 4, 2, 3, 1],
+    '3-4-3': [1, 3, 4, 3],
+    '5-3-2': [1, 5, 3, 2],
+    '4-5-1': [1, 4, 5, 1],
+    '5-4-1': [1, 5, 4, 1],
+    '3-4-2-1': [1, 3, 4, 2, 1],
+}
+
+# Diagram geometry is given in pixels at DIAGRAM_SIZE and scaled to each diagram's size
+DIAGRAM_SIZE = (1920, 1080)
+
+# Pixels between a diagram's edge and the pitch at DIAGRAM_SIZE, normalized positions 0-100 map inside it
+PITCH_MARGIN = 100
+
+# Smallest font scale text is drawn at, smaller text is an unreadable smudge
+MIN_FONT_SCALE = 0.3
+
+
+def get_pitch_layout(frame_width, frame_height):
+    """
+    Pixel geometry of a diagram: the DIAGRAM_SIZE sizes scaled by the smaller of the width
+    and height ratios, so markings, players and text keep their proportions at any size
+    area is the (x1, y1, x2, y2) rectangle normalized coordinates 0-100 map onto
+    """
+    scale = min(frame_width / DIAGRAM_SIZE[0], frame_height / DIAGRAM_SIZE[1])
+    margin = min(int(round(PITCH_MARGIN * scale)), frame_width // 4, frame_height // 4)
+    return {
+        'scale': scale,
+        'area': (margin, margin, frame_width - margin, frame_height - margin),
+        'line': max(1, int(round(2 * scale))),
+        'center_circle': max(1, int(round(100 * scale))),
+        'penalty_box': max(1, int(round(200 * scale))),
+        'player': max(2, int(round(20 * scale))),
+        'ball': max(2, int(round(15 * scale))),
+    }
+
+
+def to_diagram_point(layout, norm_x, norm_y):
+    """Pixel of normalized coordinates (0-100) on a diagram with this layout"""
+    x1, y1, x2, y2 = layout['area']
+    return int(norm_x / 100 * (x2 - x1) + x1), int(norm_y / 100 * (y2 - y1) + y1)
+
+
+def draw_diagram_text(diagram, text, origin, font_scale, color, thickness, layout):
+    """Text with origin, font scale and thickness given at DIAGRAM_SIZE, never below MIN_FONT_SCALE"""
+    scale = layout['scale']
+    font_scale = max(MIN_FONT_SCALE, font_scale * scale)
+    # the text's baseline stays below its own height when the font is held at the minimum
+    text_height = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)[0][1]
+    x, y = int(origin[0] * scale), max(int(origin[1] * scale), int(text_height * origin[1] / 50) + 2)
+    cv2.putText(diagram, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, color,
+                max(1, int(round(thickness * scale))))
+
+
+@lru_cache(maxsize=16)
+def get_pitch(frame_width, frame_height):
+    """Empty pitch diagram, drawn once per size and shared: read-only, copy it before drawing on it"""
+    # Create a blank field representation
+    field = np.ones((frame_height, frame_width, 3), dtype=np.uint8) * 50  # Dark green
+
+    # Draw field markings (simplified), sized for the diagram
+    layout = get_pitch_layout(frame_width, frame_height)
+    x1, y1, x2, y2 = layout['area']
+    line, box = layout['line'], layout['penalty_box']
+    center_x, center_y = frame_width // 2, frame_height // 2
+
+    # Field border
+    cv2.rectangle(field, (x1, y1), (x2, y2), (255, 255, 255), line)
+
+    # Center line
+    cv2.line(field, (center_x, y1), (center_x, y2), (255, 255, 255), line)
+
+    # Center circle
+    cv2.circle(field, (center_x, center_y), layout['center_circle'], (255, 255, 255), line)
+
+    # Penalty boxes
+    cv2.rectangle(field, (x1, center_y - box), (x1 + box, center_y + box), (255, 255, 255), line)
+    cv2.rectangle(field, (x2 - box, center_y - box), (x2, center_y + box), (255, 255, 255), line)
+
+    field.flags.writeable = False
+    return field
+
 
 class FormationAnalyzer:
-    def __init__(self):
-        self.formations = {
-            '4-4-2': [1, 4, 4, 2],
-            '4-3-3': [1, 4, 3, 3],
-            '3-5-2': [1, 3, 5, 2],
-            '4-2-3-1': [1, 4, 2, 3, 1], 
-            '3-4-3': [1, 3, 4, 3],    
-            '5-3-2': [1, 5, 3, 2],    
-            '4-5-1': [1, 4, 5, 1],  
-            '5-4-1': [1, 5, 4, 1],
-            '3-4-2-1': [1, 3, 4, 2, 1], 
-        }
+    def __init__(self, formations=None, roster_frames=ROSTER_FRAMES, perspective=None):
+        # templates: name -> players per line, goalkeeper first
+        self.formations = dict(FORMATIONS if formations is None else formations)
+        self.roster_frames = roster_frames
+        self.perspective = {**PERSPECTIVE, **(perspective or {})}
     
     def get_player_positions(self, tracks, team_id, frame_num):
         positions = {}
@@ -28,7 +117,8 @@ class FormationAnalyzer:
         
         # build roster (full 11) by checking nearby frames to not miss any players
         team_roster = set()
-        frame_range = range(max(0, frame_num - 10), min(len(tracks['players']), frame_num + 11))
+        frame_range = range(max(0, frame_num - self.roster_frames),
+                            min(len(tracks['players']), frame_num + self.roster_frames + 1))
         
         for f in frame_range:
             player_dict = tracks['players'][f]
@@ -43,9 +133,7 @@ class FormationAnalyzer:
                 player_data = player_dict[player_id]
 
                 if player_data.get('team') == team_id:
-                    bbox = player_data['bbox']
-                    x_center, y_center = get_center_of_bbox(bbox)
-                    positions[player_id] = (x_center, y_center)
+                    positions[player_id] = get_track_position(player_data)
         
         return positions
     
@@ -96,9 +184,9 @@ class FormationAnalyzer:
             y_range = y_max - y_min
             
             # adjust for camera perspective
-            if y_range < 40:
+            if y_range < self.perspective['max_range']:
                 y_center = np.mean(y_positions)
-                expansion_factor = 50 / max(y_range, 10)
+                expansion_factor = self.perspective['spread'] / max(y_range, self.perspective['min_range'])
                 
                 for player_id in normalized:
                     x, y = normalized[player_id]
@@ -117,7 +205,80 @@ class FormationAnalyzer:
                 normalized[player_id] = (100 - x, y)
         
         return normalized
-    
+
+    def get_position_arrays(self, tracks, team_id, frame_nums=None, frame_arrays=None):
+        """
+        Player positions of a team over many frames (all frames by default) as one padded array,
+        built from the track table in one pass instead of get_player_positions per frame
+        Same players and positions per frame as get_player_positions, in detection order
+        frame_arrays is a get_frame_arrays(tracks, whole_pixels=True) result shared between teams
+        Returns (positions, player_ids): float array (frames, max_players, 2) padded with NaN
+        and int array (frames, max_players) padded with -1
+        """
+        if frame_arrays is None:
+            frame_arrays = get_frame_arrays(tracks, 'players', whole_pixels=True)
+        track_ids, positions, teams = frame_arrays
+        if frame_nums is not None:
+            frame_nums = np.asarray(frame_nums, dtype=np.int64)
+            track_ids, positions, teams = track_ids[frame_nums], positions[frame_nums], teams[frame_nums]
+
+        # the team's detections first, in detection order, then everything else
+        in_team = teams == team_id
+        order = np.argsort(~in_team, axis=1, kind='stable')[:, :int(in_team.sum(axis=1).max(initial=0))]
+        in_team = np.take_along_axis(in_team, order, axis=1)
+
+        player_ids = np.where(in_team, np.take_along_axis(track_ids, order, axis=1), -1)
+        positions = np.where(in_team[..., None], np.take_along_axis(positions, order[..., None], axis=1), np.nan)
+        return positions, player_ids
+
+    def position_dicts_to_arrays(self, frame_positions):
+        """One {player_id: (x, y)} dict per frame to padded arrays, the inverse of position_arrays_to_dicts"""
+        max_players = max((len(positions) for positions in frame_positions), default=0)
+        positions = np.full((len(frame_positions), max_players, 2), np.nan)
+        player_ids = np.full((len(frame_positions), max_players), -1, dtype=np.int64)
+        for i, frame in enumerate(frame_positions):
+            if frame:
+                positions[i, :len(frame)] = list(frame.values())
+                player_ids[i, :len(frame)] = list(frame)
+        return positions, player_ids
+
+    def normalize_position_arrays(self, positions, frame_width, frame_height):
+        """
+        normalize_positions for every frame of a padded (frames, players, 2) array at once
+        Padding (NaN) stays NaN
+        """
+        # same operation order as normalize_positions so results match
+        normalized = np.asarray(positions, dtype=np.float64) / np.array([frame_width, frame_height]) * 100
+        valid = ~np.isnan(normalized[..., 0])
+        counts = valid.sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            y = normalized[..., 1]
+            y_min = np.where(valid, y, np.inf).min(axis=1, initial=np.inf)
+            y_max = np.where(valid, y, -np.inf).max(axis=1, initial=-np.inf)
+            y_range = y_max - y_min
+            y_center = np.where(valid, y, 0).sum(axis=1) / counts
+
+            # adjust for camera perspective
+            expand = (counts > 1) & (y_range < self.perspective['max_range'])
+            expansion_factor = self.perspective['spread'] / np.maximum(y_range, self.perspective['min_range'])
+            expanded_y = np.clip(y_center[:, None] + (y - y_center[:, None]) * expansion_factor[:, None], 10, 90)
+            normalized[..., 1] = np.where(expand[:, None] & valid, expanded_y, y)
+
+            # flip teams on the right side for consistent orientation
+            avg_x = np.where(valid, normalized[..., 0], 0).sum(axis=1) / counts
+            flip = avg_x > 50
+            normalized[..., 0] = np.where(flip[:, None], 100 - normalized[..., 0], normalized[..., 0])
+
+        return normalized
+
+    def position_arrays_to_dicts(self, positions, player_ids):
+        """Padded arrays back to one {player_id: (x, y)} dict per frame"""
+        return [
+            {int(player_id): (float(x), float(y)) for player_id, (x, y) in zip(frame_ids, frame_positions) if player_id != -1}
+            for frame_ids, frame_positions in zip(player_ids, positions)
+        ]
+
     def cluster_by_depth_position(self, positions, n_lines):
         """
         Cluster players into defensive/midfield/attacking lines based on X position (depth)
@@ -214,22 +375,9 @@ class FormationAnalyzer:
     
     def draw_formation_skeleton(self, frame_width=1920, frame_height=1080, positions=None, 
                                  lines=None, team_color=(255, 0, 0), formation_name="Unknown", ball_pos=None):
-        # Create a blank field representation
-        field = np.ones((frame_height, frame_width, 3), dtype=np.uint8) * 50  # Dark green
-        
-        # Draw field markings (simplified)
-        # Field border
-        cv2.rectangle(field, (100, 100), (frame_width-100, frame_height-100), (255, 255, 255), 2)
-        
-        # Center line
-        cv2.line(field, (frame_width//2, 100), (frame_width//2, frame_height-100), (255, 255, 255), 2)
-        
-        # Center circle
-        cv2.circle(field, (frame_width//2, frame_height//2), 100, (255, 255, 255), 2)
-        
-        # Penalty boxes
-        cv2.rectangle(field, (100, frame_height//2 - 200), (300, frame_height//2 + 200), (255, 255, 255), 2)
-        cv2.rectangle(field, (frame_width-300, frame_height//2 - 200), (frame_width-100, frame_height//2 + 200), (255, 255, 255), 2)
+        field = get_pitch(frame_width, frame_height).copy()
+        layout = get_pitch_layout(frame_width, frame_height)
+        line = layout['line']
         
         if positions and lines:
             # Draw players and connections
@@ -237,49 +385,49 @@ class FormationAnalyzer:
             
             # Convert normalized positions back to pixel coordinates
             for player_id, (norm_x, norm_y) in positions.items():
-                pixel_x = int((norm_x / 100) * (frame_width - 200) + 100)
-                pixel_y = int((norm_y / 100) * (frame_height - 200) + 100)
-                all_positions_pixel[player_id] = (pixel_x, pixel_y)
+                all_positions_pixel[player_id] = to_diagram_point(layout, norm_x, norm_y)
             
-            # Draw players
+            # Draw players, ids only where the circles are large enough to hold them
+            radius = layout['player']
             for player_id, (pixel_x, pixel_y) in all_positions_pixel.items():
                 # Draw player circle
-                cv2.circle(field, (pixel_x, pixel_y), 20, team_color, -1)
-                cv2.circle(field, (pixel_x, pixel_y), 20, (255, 255, 255), 2)
+                cv2.circle(field, (pixel_x, pixel_y), radius, team_color, -1)
+                cv2.circle(field, (pixel_x, pixel_y), radius, (255, 255, 255), line)
                 
                 # Draw player ID
-                cv2.putText(field, str(player_id), (pixel_x - 10, pixel_y + 5),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+                if radius >= 8:
+                    font_scale = max(MIN_FONT_SCALE, 0.5 * layout['scale'])
+                    cv2.putText(field, str(player_id), (pixel_x - radius // 2, pixel_y + radius // 4),
+                               cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), line)
         
         # Draw ball if position is provided
         if ball_pos is not None:
-            ball_x, ball_y = ball_pos
-            pixel_ball_x = int((ball_x / 100) * (frame_width - 200) + 100)
-            pixel_ball_y = int((ball_y / 100) * (frame_height - 200) + 100)
+            pixel_ball_x, pixel_ball_y = to_diagram_point(layout, *ball_pos)
             
             # Draw ball
-            cv2.circle(field, (pixel_ball_x, pixel_ball_y), 15, (0, 0, 255), -1)
-            cv2.circle(field, (pixel_ball_x, pixel_ball_y), 15, (255, 255, 255), 2)
+            cv2.circle(field, (pixel_ball_x, pixel_ball_y), layout['ball'], (0, 0, 255), -1)
+            cv2.circle(field, (pixel_ball_x, pixel_ball_y), layout['ball'], (255, 255, 255), line)
         
         # Draw formation name
-        cv2.putText(field, f"Formation: {formation_name}", (50, 50),
-                   cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        draw_diagram_text(field, f"Formation: {formation_name}", (50, 50), 1.5, (255, 255, 255), 3, layout)
         
         return field
     
-    def analyze_team_formation(self, tracks, team_id, frame_width, frame_height, frame_num):
+    def get_team_formation(self, tracks, team_id, frame_width, frame_height, frame_num):
         """
-        Complete formation analysis for a team at a specific frame
-        Returns (formation_name, formation_diagram, lines)
+        Formation analysis for a team at a specific frame without drawing anything
+        Returns dict with formation name, normalized positions, lines, team color and ball position
         """
         # Get positions at specific frame
-        positions = self.get_player_positions(tracks, team_id, frame_num)
+        with track_stage('formation_analyzer.roster', items=1):
+            positions = self.get_player_positions(tracks, team_id, frame_num)
         
         # Normalize positions
         normalized_positions = self.normalize_positions(positions, frame_width, frame_height)
         
         # Detect formation
-        formation_name, lines = self.detect_formation(normalized_positions)
+        with track_stage('formation_analyzer.detect', items=1):
+            formation_name, lines = self.detect_formation(normalized_positions)
         
         # Get team color from tracks
         team_color = (255, 0, 0)  # Default red
@@ -292,8 +440,7 @@ class FormationAnalyzer:
         # Get ball position at this frame
         ball_pos = None
         if frame_num < len(tracks['ball']) and 1 in tracks['ball'][frame_num]:
-            ball_bbox = tracks['ball'][frame_num][1]['bbox']
-            ball_x, ball_y = get_center_of_bbox(ball_bbox)
+            ball_x, ball_y = get_track_position(tracks['ball'][frame_num][1])
 
             norm_ball_x = (ball_x / frame_width) * 100
             norm_ball_y = (ball_y / frame_height) * 100
@@ -305,19 +452,47 @@ class FormationAnalyzer:
                     ball_pos = (norm_ball_x, norm_ball_y)
                     ball_pos = (100 - norm_ball_x, norm_ball_y)
         
-        # Draw formation diagram
-        formation_diagram = self.draw_formation_skeleton(
-            frame_width, frame_height, 
-            normalized_positions, lines, 
-            team_color, formation_name, ball_pos
-        )
+        return {
+            'frame_num': frame_num,
+            'formation': formation_name,
+            'positions': normalized_positions,
+            'lines': lines,
+            'team_color': team_color,
+            'ball_position': ball_pos,
+        }
+    
+    def draw_team_formation(self, formation, frame_width, frame_height, label=None):
+        """
+        Draw the diagram for a result of get_team_formation, optionally with a frame label
+        """
+        with track_stage('formation_analyzer.draw', items=1):
+            diagram = self.draw_formation_skeleton(
+                frame_width, frame_height, 
+                formation['positions'], formation['lines'], 
+                formation['team_color'], formation['formation'], formation['ball_position']
+            )
+        
+        if label is not None:
+            # Add frame label to diagram
+            draw_diagram_text(diagram, f"Frame: {label} ({formation['frame_num']})", (50, 100), 1.2,
+                              (255, 255, 0), 2, get_pitch_layout(frame_width, frame_height))
         
-        return formation_name, formation_diagram, lines
+        return diagram
     
-    def analyze_team_formation_over_time(self, tracks, team_id, frame_width, frame_height):
+    def analyze_team_formation(self, tracks, team_id, frame_width, frame_height, frame_num):
         """
-        analyze team formation at first, middle, and last frames
-        selects best frames with most consistent player detection
+        Complete formation analysis for a team at a specific frame
+        Returns (formation_name, formation_diagram, lines)
+        """
+        formation = self.get_team_formation(tracks, team_id, frame_width, frame_height, frame_num)
+        formation_diagram = self.draw_team_formation(formation, frame_width, frame_height)
+        
+        return formation['formation'], formation_diagram, formation['lines']
+    
+    def get_formation_windows(self, tracks):
+        """
+        Candidate frames at the start, middle and end of the match
+        Returns list of (label, candidate_frames)
         """
         total_frames = len(tracks['players'])
         
@@ -326,23 +501,38 @@ class FormationAnalyzer:
         middle_range = list(range(max(0, total_frames//2 - 25), min(total_frames, total_frames//2 + 25)))
         end_range = list(range(max(0, total_frames - 50), total_frames))
         
+        return list(zip(['Start', 'Middle', 'End'], [start_range, middle_range, end_range]))
+    
+    def get_formation_frames(self, tracks, team_id):
+        """
+        Best frames (most consistent player detection) at the start, middle and end of the match
+        Returns list of (label, frame_num)
+        """
         # Find best frames (closest to 11 players) for each period
-        first_frame = self.get_best_frame_for_formation(tracks, team_id, start_range)
-        middle_frame = self.get_best_frame_for_formation(tracks, team_id, middle_range)
-        last_frame = self.get_best_frame_for_formation(tracks, team_id, end_range)
-        
+        return [
+            (label, self.get_best_frame_for_formation(tracks, team_id, candidate_frames))
+            for label, candidate_frames in self.get_formation_windows(tracks)
+        ]
+    
+    def get_team_formation_over_time(self, tracks, team_id, frame_width, frame_height):
+        """
+        Formation results (see get_team_formation) at first, middle, and last frames
+        Returns list of (label, formation)
+        """
+        return [
+            (label, self.get_team_formation(tracks, team_id, frame_width, frame_height, frame_num))
+            for label, frame_num in self.get_formation_frames(tracks, team_id)
+        ]
+    
+    def analyze_team_formation_over_time(self, tracks, team_id, frame_width, frame_height):
+        """
+        analyze team formation at first, middle, and last frames
+        selects best frames with most consistent player detection
+        """
         results = []
-        frame_labels = ['Start', 'Middle', 'End']
         
-        for frame_num, label in zip([first_frame, middle_frame, last_frame], frame_labels):
-            formation_name, diagram, lines = self.analyze_team_formation(
-                tracks, team_id, frame_width, frame_height, frame_num
-            )
-            
-            # Add frame label to diagram
-            cv2.putText(diagram, f"Frame: {label} ({frame_num})", (50, 100),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 0), 2)
-            
-            results.append((formation_name, diagram, lines, label))
+        for label, formation in self.get_team_formation_over_time(tracks, team_id, frame_width, frame_height):
+            diagram = self.draw_team_formation(formation, frame_width, frame_height, label)
+            results.append((formation['formation'], diagram, formation['lines'], label))
         
         return results
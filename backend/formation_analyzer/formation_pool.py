@@ -0,0 +1,83 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import sys
+sys.path.append('../')
+from utils import get_cpu_count, init_worker_threads
+from .formation_analyzer import FormationAnalyzer, ROSTER_FRAMES
+
+
+def get_pool_context():
+    """
+    forkserver where available: workers fork from a clean server process that already
+    imported the analyzer, so they start fast and never inherit OpenMP/torch state.
+    spawn elsewhere (Windows)
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['formation_analyzer'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def slice_tracks(tracks, candidate_frames, roster_frames=ROSTER_FRAMES):
+    """
+    The part of tracks a window's analysis reads: its candidate frames plus the roster
+    frames around them. Returns (tracks slice, frame offset)
+    """
+    if not candidate_frames:
+        return {object_type: [] for object_type in tracks}, 0
+
+    total_frames = len(tracks['players'])
+    first_frame = max(0, min(candidate_frames) - roster_frames)
+    last_frame = min(total_frames, max(candidate_frames) + roster_frames + 1)
+    return {object_type: frames[first_frame:last_frame] for object_type, frames in tracks.items()}, first_frame
+
+
+def analyze_window(job):
+    """Best frame search and formation analysis for one team and window, runs in a worker"""
+    tracks, offset, team_id, candidate_frames, frame_width, frame_height = job
+    formation_analyzer = FormationAnalyzer()
+
+    frame_num = formation_analyzer.get_best_frame_for_formation(tracks, team_id, candidate_frames)
+    formation = formation_analyzer.get_team_formation(tracks, team_id, frame_width, frame_height, frame_num)
+    formation['frame_num'] = frame_num + offset
+    return formation
+
+
+def get_team_formations(tracks, team_ids, frame_width, frame_height, workers=None, threads=None):
+    """
+    get_team_formation_over_time for every team, with each (team, window) analyzed in
+    its own worker process. Results are identical to the sequential analysis
+    workers is the pool size, None for one per window (up to the CPU count), 1 to run sequentially
+    threads (the CPU count when None) is shared out between the workers' KMeans thread pools
+    Returns {team_id: [(label, formation)]}
+    """
+    formation_analyzer = FormationAnalyzer()
+    windows = formation_analyzer.get_formation_windows(tracks)
+
+    if workers is None:
+        workers = min(len(team_ids) * len(windows), get_cpu_count())
+    if workers <= 1:
+        return {
+            team_id: formation_analyzer.get_team_formation_over_time(tracks, team_id, frame_width, frame_height)
+            for team_id in team_ids
+        }
+
+    jobs = []
+    keys = []
+    for team_id in team_ids:
+        for label, candidate_frames in windows:
+            window_tracks, offset = slice_tracks(tracks, candidate_frames)
+            local_frames = [frame_num - offset for frame_num in candidate_frames]
+            jobs.append((window_tracks, offset, team_id, local_frames, frame_width, frame_height))
+            keys.append((team_id, label))
+
+    worker_threads = max(1, (threads or get_cpu_count()) // workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_pool_context(),
+                             initializer=init_worker_threads, initargs=(worker_threads,)) as executor:
+        results = list(executor.map(analyze_window, jobs))
+
+    formations = {team_id: [] for team_id in team_ids}
+    for (team_id, label), formation in zip(keys, results):
+        formations[team_id].append((label, formation))
+    return formations
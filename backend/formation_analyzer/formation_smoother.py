@@ -0,0 +1,217 @@
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_track_position, get_frame_arrays
+from instrumentation import track_stage
+from .formation_analyzer import FormationAnalyzer
+
+# Players in a formation, the most observed tracks of a window are used
+TEAM_SIZE = 11
+
+
+class TeamWindow:
+    """
+    Running position sum and observation count per track of one team in the current window,
+    one row per track id, so means are the track's average position over the window
+    """
+    def __init__(self, capacity=32):
+        self.slots = {}
+        self.player_ids = np.zeros(capacity, dtype=np.int64)
+        self.sums = np.zeros((capacity, 2))
+        self.observations = np.zeros(capacity, dtype=np.int64)
+        self.team_color = None
+
+    @property
+    def means(self):
+        """Mean position of every row over the current window, NaN for rows not seen in it"""
+        with np.errstate(invalid='ignore'):
+            return self.sums / self.observations[:, None]
+
+    def get_slots(self, player_ids):
+        new_ids = [player_id for player_id in player_ids if player_id not in self.slots]
+        if len(self.slots) + len(new_ids) > len(self.player_ids):
+            self.grow(2 * (len(self.slots) + len(new_ids)))
+        for player_id in new_ids:
+            slot = len(self.slots)
+            self.slots[player_id] = slot
+            self.player_ids[slot] = player_id
+        return np.array([self.slots[player_id] for player_id in player_ids], dtype=np.int64)
+
+    def grow(self, capacity):
+        extra = capacity - len(self.player_ids)
+        self.player_ids = np.concatenate([self.player_ids, np.zeros(extra, dtype=np.int64)])
+        self.sums = np.concatenate([self.sums, np.zeros((extra, 2))])
+        self.observations = np.concatenate([self.observations, np.zeros(extra, dtype=np.int64)])
+
+    def update(self, player_ids, centers):
+        slots = self.get_slots(player_ids)
+        # a track id appears at most once per frame, so fancy-index adds don't collide
+        self.sums[slots] += centers
+        self.observations[slots] += 1
+
+    def reset_window(self):
+        """Start a new window with empty sums, tracks not seen in the finished one are dropped"""
+        keep = np.flatnonzero(self.observations[:len(self.slots)] > 0)
+        capacity = len(self.player_ids)
+        self.player_ids = np.concatenate([self.player_ids[keep], np.zeros(capacity - len(keep), dtype=np.int64)])
+        self.sums[:] = 0
+        self.observations[:] = 0
+        self.slots = {int(player_id): slot for slot, player_id in enumerate(self.player_ids[:len(keep)])}
+
+
+class FormationSmoother:
+    """
+    Formation per team and window of frames from averaged track positions instead of
+    a single snapshot frame:
+      - every frame adds each visible track's position to its window sum (vectorized over the team)
+      - once a window of window_frames frames is complete the formation is detected once,
+        from the mean positions of the team's most observed tracks over that window
+    Feed frames with update() as they arrive, or a whole match with get_formations_over_time()
+    """
+    def __init__(self, window_frames=250, min_observations=None, team_ids=(1, 2),
+                 formation_analyzer=None):
+        self.window_frames = window_frames
+        # tracks seen in fewer frames of the window are left out, default a fifth of the frames the
+        # window was actually fed (live mode only feeds the frames it runs detection on)
+        self.min_observations = min_observations
+        self.team_ids = team_ids
+        self.formation_analyzer = formation_analyzer or FormationAnalyzer()
+        self.teams = {team_id: TeamWindow() for team_id in team_ids}
+        self.window_start = None
+        self.last_frame = None
+        self.window_frames_seen = 0
+
+    def update(self, frame_num, players, frame_width, frame_height):
+        """
+        Add one frame's player tracks (Tracker format with 'team' set)
+        Returns {team_id: formation} when this frame completes a window, else None
+        """
+        team_players = {team_id: ([], []) for team_id in self.team_ids}
+        for player_id, track in players.items():
+            team_id = track.get('team')
+            if team_id in team_players:
+                team_players[team_id][0].append(player_id)
+                team_players[team_id][1].append(get_track_position(track))
+        self.set_team_colors(players)
+
+        self.add_frame(frame_num, {
+            team_id: (player_ids, np.array(centers, dtype=np.float64).reshape(-1, 2))
+            for team_id, (player_ids, centers) in team_players.items()
+        })
+
+        if frame_num - self.window_start + 1 < self.window_frames:
+            return None
+        return self.close_window(frame_width, frame_height)
+
+    def add_frame(self, frame_num, team_players):
+        """Add one frame given as {team_id: (player_ids, (players, 2) centers)} to the window sums"""
+        if self.window_start is None:
+            self.window_start = frame_num
+        self.last_frame = frame_num
+        self.window_frames_seen += 1
+
+        for team_id, (player_ids, centers) in team_players.items():
+            if len(player_ids):
+                self.teams[team_id].update(player_ids, centers)
+
+    def set_team_colors(self, players):
+        """Team colors from the tracks of one frame that have one"""
+        for track in players.values():
+            if track.get('team') in self.teams and 'team_color' in track:
+                self.teams[track['team']].team_color = track['team_color']
+
+    def close_window(self, frame_width, frame_height):
+        """Formation of every team for the current window, then start a new window"""
+        return self.detect_formations([self.pop_window()], frame_width, frame_height)[0]
+
+    def pop_window(self):
+        """
+        {team_id: (mean positions, team color, (first frame, last frame))} of the current
+        window, then start a new window
+        """
+        window = {
+            team_id: (self.get_smoothed_positions(team_id), self.teams[team_id].team_color,
+                      (self.window_start, self.last_frame))
+            for team_id in self.team_ids
+        }
+        for team in self.teams.values():
+            team.reset_window()
+        self.window_start = None
+        self.window_frames_seen = 0
+        return window
+
+    def get_smoothed_positions(self, team_id):
+        """{player_id: (x, y)} mean centers of the team's most observed tracks over the current window"""
+        team = self.teams[team_id]
+        num_slots = len(team.slots)
+        observations = team.observations[:num_slots]
+        min_observations = self.min_observations
+        if min_observations is None:
+            min_observations = max(1, self.window_frames_seen // 5)
+        eligible = np.flatnonzero(observations >= min_observations)
+        # most observed first, ties by lower track id so results don't depend on arrival order
+        order = np.lexsort((team.player_ids[eligible], -observations[eligible]))
+        chosen = sorted(eligible[order[:TEAM_SIZE]], key=lambda slot: team.player_ids[slot])
+        means = team.means
+        return {int(team.player_ids[slot]): (float(means[slot, 0]), float(means[slot, 1])) for slot in chosen}
+
+    def detect_formations(self, windows, frame_width, frame_height):
+        """
+        Formations of windows from pop_window(), positions of every team and window are
+        normalized together as one padded array
+        Returns one {team_id: formation} per window, same dict as FormationAnalyzer.get_team_formation
+        plus 'window' (first frame, last frame); there is no single ball position so it is None
+        """
+        entries = [(i, team_id, *window[team_id]) for i, window in enumerate(windows) for team_id in self.team_ids]
+        positions, player_ids = self.formation_analyzer.position_dicts_to_arrays([entry[2] for entry in entries])
+        normalized = self.formation_analyzer.position_arrays_to_dicts(
+            self.formation_analyzer.normalize_position_arrays(positions, frame_width, frame_height), player_ids)
+
+        formations = [{} for _ in windows]
+        with track_stage('formation_smoother.detect', items=len(entries)):
+            for (i, team_id, _, team_color, window), normalized_positions in zip(entries, normalized):
+                formation_name, lines = self.formation_analyzer.detect_formation(normalized_positions)
+                formations[i][team_id] = {
+                    'frame_num': window[1],
+                    'window': window,
+                    'formation': formation_name,
+                    'positions': normalized_positions,
+                    'lines': lines,
+                    'team_color': (255, 0, 0) if team_color is None else team_color,
+                    'ball_position': None,
+                }
+        return formations
+
+    def get_formations_over_time(self, tracks, frame_width, frame_height):
+        """
+        Formations for every window of a whole match, a last partial window included
+        when it has at least half the window's frames
+        Team positions come from the track table as padded arrays instead of per-frame dicts
+        Returns {team_id: [formation, ...]} in window order
+        """
+        frame_arrays = get_frame_arrays(tracks, 'players', whole_pixels=True)
+        team_arrays = {}
+        for team_id in self.team_ids:
+            positions, player_ids = self.formation_analyzer.get_position_arrays(tracks, team_id, frame_arrays=frame_arrays)
+            team_arrays[team_id] = (positions, player_ids, (player_ids != -1).sum(axis=1))
+
+        windows = []
+        with track_stage('formation_smoother.update', items=len(tracks['players'])):
+            for frame_num, players in enumerate(tracks['players']):
+                self.add_frame(frame_num, {
+                    team_id: (player_ids[frame_num, :counts[frame_num]], positions[frame_num, :counts[frame_num]])
+                    for team_id, (positions, player_ids, counts) in team_arrays.items()
+                })
+                if frame_num - self.window_start + 1 == self.window_frames:
+                    self.set_team_colors(players)
+                    windows.append(self.pop_window())
+
+        if self.window_start is not None and self.last_frame - self.window_start + 1 >= self.window_frames / 2:
+            self.set_team_colors(tracks['players'][self.last_frame])
+            windows.append(self.pop_window())
+
+        timeline = {team_id: [] for team_id in self.team_ids}
+        for formations in self.detect_formations(windows, frame_width, frame_height):
+            for team_id, formation in formations.items():
+                timeline[team_id].append(formation)
+        return timeline
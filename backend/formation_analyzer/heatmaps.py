@@ -0,0 +1,142 @@
+import numpy as np
+import cv2
+import sys
+sys.path.append('../')
+from utils import get_frame_arrays
+from instrumentation import track_stage
+from .formation_analyzer import get_pitch, get_pitch_layout, draw_diagram_text
+
+# Grid cells along the pitch length (x) and width (y)
+HEATMAP_BINS = (60, 40)
+
+
+class HeatmapBuilder:
+    """
+    Occupancy grids over normalized pitch coordinates (0-100 on both axes of the frame, or of the
+    camera canvas when tracks have position_adjusted), one per player track and one per team:
+      - every update() bins a chunk of frames in one pass: cell indices for all positions at once,
+        then np.bincount over (track row, cell) and (team, cell)
+      - grids hold frame counts, so chunks can arrive in any size and order and simply add up
+        (live mode adds every analyzed frame as it arrives)
+    get_heatmaps() returns the grids, divide by 'frames' for the share of the match per cell
+    """
+    def __init__(self, frame_width, frame_height, bins=HEATMAP_BINS, team_ids=(1, 2)):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.bins = tuple(bins)
+        self.team_ids = tuple(team_ids)
+        self.frames = 0
+        # grid rows in order of first appearance, allocated with spare capacity as tracks come in
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.track_grids = np.zeros((0, self.bins[1], self.bins[0]), dtype=np.uint32)
+        self.team_grids = np.zeros((len(self.team_ids), self.bins[1], self.bins[0]), dtype=np.uint32)
+
+    def get_cells(self, positions):
+        """Flat grid cell (y * x_bins + x) of every position, positions outside the pitch go to the edge cells"""
+        x_bins, y_bins = self.bins
+        x = np.clip((positions[:, 0] * (x_bins / self.frame_width)).astype(np.int64), 0, x_bins - 1)
+        y = np.clip((positions[:, 1] * (y_bins / self.frame_height)).astype(np.int64), 0, y_bins - 1)
+        return y * x_bins + x
+
+    def get_rows(self, track_ids):
+        """Grid row of every id in track_ids (sorted, unique), new tracks get empty grids"""
+        order = np.argsort(self.track_ids)
+        known = self.track_ids[order]
+        positions = np.clip(np.searchsorted(known, track_ids), 0, max(len(known) - 1, 0))
+        found = (known[positions] == track_ids) if len(known) else np.zeros(len(track_ids), dtype=bool)
+
+        rows = np.empty(len(track_ids), dtype=np.int64)
+        rows[found] = order[positions[found]]
+        new_ids = track_ids[~found]
+        rows[~found] = len(self.track_ids) + np.arange(len(new_ids))
+        self.track_ids = np.concatenate([self.track_ids, new_ids])
+
+        if len(self.track_ids) > len(self.track_grids):
+            # double the capacity so a long match doesn't copy every grid for every chunk
+            grids = np.zeros((max(len(self.track_ids), 2 * len(self.track_grids)),) + self.track_grids.shape[1:],
+                             dtype=self.track_grids.dtype)
+            grids[:len(self.track_grids)] = self.track_grids
+            self.track_grids = grids
+        return rows
+
+    def update(self, tracks):
+        """Add a chunk of frames (Tracker format, any number of frames) to the grids"""
+        num_frames = len(tracks['players'])
+        if not num_frames:
+            return
+        with track_stage('heatmaps.update', items=num_frames):
+            track_ids, positions, teams = get_frame_arrays(tracks, 'players')
+            valid = (track_ids >= 0) & ~np.isnan(positions[..., 0])
+            track_ids, positions, teams = track_ids[valid], positions[valid], teams[valid]
+            cells = self.get_cells(positions)
+            grid_shape = self.team_grids.shape[1:]
+            num_cells = self.bins[0] * self.bins[1]
+
+            # only the chunk's tracks are counted, then added to their rows
+            chunk_ids, chunk_rows = np.unique(track_ids, return_inverse=True)
+            counts = np.bincount(chunk_rows * num_cells + cells, minlength=len(chunk_ids) * num_cells)
+            # rows first, new tracks may reallocate the grids
+            rows = self.get_rows(chunk_ids)
+            self.track_grids[rows] += counts.reshape((-1,) + grid_shape).astype(np.uint32)
+
+            team_rows = np.full(len(teams), -1)
+            for row, team_id in enumerate(self.team_ids):
+                team_rows[teams == team_id] = row
+            on_team = team_rows >= 0
+            counts = np.bincount(team_rows[on_team] * num_cells + cells[on_team],
+                                 minlength=len(self.team_ids) * num_cells)
+            self.team_grids += counts.reshape(self.team_grids.shape).astype(np.uint32)
+
+        self.frames += num_frames
+
+    def get_heatmaps(self):
+        """
+        {'frames', 'bins', 'track_ids', 'track_grids' (tracks, y_bins, x_bins), 'teams': {team_id: grid}}
+        Grids count frames per cell
+        """
+        return {
+            'frames': self.frames,
+            'bins': self.bins,
+            'track_ids': self.track_ids.copy(),
+            'track_grids': self.track_grids[:len(self.track_ids)].copy(),
+            'teams': {team_id: self.team_grids[row].copy() for row, team_id in enumerate(self.team_ids)},
+        }
+
+
+def draw_heatmap(pitch, grid, alpha=0.6, blur=1.0):
+    """
+    Blend a heatmap grid onto a pitch diagram (a get_pitch copy) in place:
+    the grid is smoothed and scaled up to the playing area, cells never visited stay transparent
+    Returns the pitch
+    """
+    height, width = pitch.shape[:2]
+    x1, y1, x2, y2 = get_playing_area(width, height)
+    if x2 <= x1 or y2 <= y1 or not grid.any():
+        return pitch
+
+    heat = grid.astype(np.float32)
+    if blur:
+        heat = cv2.GaussianBlur(heat, (0, 0), blur)
+    heat = cv2.resize(heat, (x2 - x1, y2 - y1), interpolation=cv2.INTER_LINEAR)
+    heat /= heat.max()
+
+    area = pitch[y1:y2, x1:x2]
+    colors = cv2.applyColorMap((heat * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    # faint cells fade out instead of tinting the whole pitch blue
+    weights = (alpha * np.clip(heat * 4, 0, 1))[..., None]
+    area[...] = (area * (1 - weights) + colors * weights).astype(np.uint8)
+    return pitch
+
+
+def draw_heatmap_diagram(grid, frame_width, frame_height, title=None):
+    """Heatmap on a copy of the cached empty pitch, with an optional title"""
+    with track_stage('heatmaps.draw', items=1):
+        diagram = draw_heatmap(get_pitch(frame_width, frame_height).copy(), grid)
+    if title is not None:
+        draw_diagram_text(diagram, title, (50, 50), 1.5, (255, 255, 255), 3, get_pitch_layout(frame_width, frame_height))
+    return diagram
+
+
+def get_playing_area(width, height):
+    """Pixel rectangle (x1, y1, x2, y2) of the pitch diagram that normalized coordinates 0-100 map onto"""
+    return get_pitch_layout(width, height)['area']
@@ -0,0 +1,187 @@
+import numpy as np
+import cv2
+from scipy.spatial import cKDTree
+import sys
+sys.path.append('../')
+from utils import get_frame_arrays
+from instrumentation import track_stage
+
+# Per team and frame, in units of 1% of the frame (canvas) width on both axes
+METRIC_NAMES = [
+    'players',                # players of the team detected in the frame
+    'defensive_line',         # mean depth of the back line from the team's own goal side
+    'length',                 # deepest to most advanced outfield player
+    'width',                  # outfield spread across the pitch
+    'hull_area',              # area of the outfield players' convex hull
+    'back_to_mid',            # distance between the back and midfield lines
+    'mid_to_front',           # distance between the midfield and front lines
+    'nearest_opponent_mean',  # mean distance from each player to the closest opponent
+    'nearest_opponent_min',   # tightest marking in the frame
+]
+
+
+def nanmean_rows(values):
+    """Mean of every row ignoring NaN, NaN for empty rows (without numpy's empty slice warning)"""
+    valid = ~np.isnan(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, values, 0).sum(axis=1) / valid.sum(axis=1)
+
+
+def rolling_nanmean(values, window):
+    """Centered rolling mean ignoring NaN, NaN where the window has no values"""
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0], np.cumsum(np.where(valid, values, 0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    frames = np.arange(len(values))
+    start = np.clip(frames - window // 2, 0, len(values))
+    end = np.clip(frames + window // 2 + 1, 0, len(values))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums[end] - sums[start]) / (counts[end] - counts[start])
+
+
+class TacticalMetrics:
+    """
+    Shape metrics of both teams for every frame of a match, computed with array operations
+    over the whole track table:
+      - each team's depth axis points away from its own goal, the side is taken from where its
+        centroid is relative to the opponent's, smoothed over direction_window frames
+      - the goalkeeper is the deepest player when it is more than keeper_gap behind the next one
+      - outfield players are split into back, midfield and front lines at the two largest gaps in depth
+      - nearest-opponent distances come from one KD-tree query for the whole match
+    Uses camera-compensated positions when the tracks have them (see add_adjusted_positions)
+    """
+    def __init__(self, frame_width, frame_height, team_ids=(1, 2), keeper_gap=8.0, direction_window=750):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.team_ids = team_ids
+        self.keeper_gap = keeper_gap
+        self.direction_window = direction_window
+
+    def get_match_metrics(self, tracks):
+        """
+        Returns {'frames': n, team_id: {metric: float32 array (frames,)}} with the metrics in
+        METRIC_NAMES, NaN where a metric isn't defined (too few players detected)
+        """
+        with track_stage('tactical_metrics.arrays', items=len(tracks['players'])):
+            _, positions, teams = get_frame_arrays(tracks, 'players')
+            # same scale on both axes so distances and areas aren't distorted, x runs 0-100
+            positions = positions * (100 / self.frame_width)
+
+        num_frames = len(positions)
+        team_positions = {
+            team_id: np.where((teams == team_id)[..., None], positions, np.nan) for team_id in self.team_ids
+        }
+
+        with np.errstate(invalid='ignore'), track_stage('tactical_metrics.shape', items=num_frames):
+            centroids = {team_id: nanmean_rows(team_positions[team_id][..., 0]) for team_id in self.team_ids}
+
+            metrics = {'frames': num_frames}
+            for team_id in self.team_ids:
+                opponent_id = next(other for other in self.team_ids if other != team_id)
+                side = rolling_nanmean(centroids[team_id] - centroids[opponent_id], self.direction_window)
+                # teams left of the opponent defend the left goal, depth grows towards the right
+                defends_left = ~(side > 0)
+                x = team_positions[team_id][..., 0]
+                depth = np.where(defends_left[:, None], x, 100 - x)
+                metrics[team_id] = self.get_shape_metrics(depth, team_positions[team_id][..., 1])
+
+        with track_stage('tactical_metrics.nearest_opponent', items=num_frames):
+            for team_id in self.team_ids:
+                opponent_id = next(other for other in self.team_ids if other != team_id)
+                mean, minimum = self.get_nearest_opponent(team_positions[team_id], team_positions[opponent_id])
+                metrics[team_id]['nearest_opponent_mean'] = mean
+                metrics[team_id]['nearest_opponent_min'] = minimum
+
+        for team_id in self.team_ids:
+            metrics[team_id] = {name: metrics[team_id][name].astype(np.float32) for name in METRIC_NAMES}
+        return metrics
+
+    def get_shape_metrics(self, depth, y):
+        """Line, length, width and hull metrics from (frames, slots) depth and y arrays, NaN padded"""
+        num_frames = len(depth)
+        players = (~np.isnan(depth)).sum(axis=1)
+
+        # players sorted from deepest to most advanced, padding last
+        order = np.argsort(np.where(np.isnan(depth), np.inf, depth), axis=1)
+        depth = np.take_along_axis(depth, order, axis=1)
+        y = np.take_along_axis(y, order, axis=1)
+
+        # drop the goalkeeper: deepest player well behind the next one
+        gap = depth[:, 1] - depth[:, 0] if depth.shape[1] > 1 else np.full(num_frames, np.nan)
+        keeper = (players >= 2) & (gap > self.keeper_gap)
+        shifted_depth = np.concatenate([depth[:, 1:], np.full((num_frames, 1), np.nan)], axis=1)
+        shifted_y = np.concatenate([y[:, 1:], np.full((num_frames, 1), np.nan)], axis=1)
+        depth = np.where(keeper[:, None], shifted_depth, depth)
+        y = np.where(keeper[:, None], shifted_y, y)
+        outfield = players - keeper
+
+        result = {
+            'players': players.astype(np.float64),
+            'length': np.nanmax(depth, axis=1, initial=-np.inf) - np.nanmin(depth, axis=1, initial=np.inf),
+            'width': np.nanmax(y, axis=1, initial=-np.inf) - np.nanmin(y, axis=1, initial=np.inf),
+        }
+        for name in ('length', 'width'):
+            result[name][outfield < 2] = np.nan
+
+        # lines: split at the two largest gaps in depth, needs three outfield players
+        slots = np.arange(depth.shape[1])
+        gaps = np.diff(depth, axis=1)
+        gaps = np.where(np.isnan(gaps), -np.inf, gaps)
+        splits = np.sort(np.argsort(-gaps, axis=1)[:, :2], axis=1) if gaps.shape[1] >= 2 \
+            else np.zeros((num_frames, 2), dtype=np.int64)
+        valid = slots[None, :] < outfield[:, None]
+        back = valid & (slots[None, :] <= splits[:, :1])
+        mid = valid & (slots[None, :] > splits[:, :1]) & (slots[None, :] <= splits[:, 1:])
+        front = valid & (slots[None, :] > splits[:, 1:])
+
+        filled = np.where(valid, depth, 0)
+        line_depths = [(filled * line).sum(axis=1) / line.sum(axis=1) for line in (back, mid, front)]
+        has_lines = outfield >= 3
+        result['defensive_line'] = np.where(has_lines, line_depths[0], np.nan)
+        result['back_to_mid'] = np.where(has_lines, line_depths[1] - line_depths[0], np.nan)
+        result['mid_to_front'] = np.where(has_lines, line_depths[2] - line_depths[1], np.nan)
+
+        # the hull needs a real polygon per frame, cv2 is quick enough for a frame loop
+        hull_area = np.full(num_frames, np.nan)
+        points = np.stack([depth, y], axis=-1).astype(np.float32)
+        for frame_num in np.flatnonzero(outfield >= 3):
+            hull = cv2.convexHull(points[frame_num, :outfield[frame_num]])
+            hull_area[frame_num] = cv2.contourArea(hull)
+        result['hull_area'] = hull_area
+
+        return result
+
+    def get_nearest_opponent(self, team_positions, opponent_positions):
+        """
+        Mean and minimum distance from the team's players to their closest opponent per frame
+        One KD-tree over every opponent of the match: the frame number is a third coordinate
+        spaced further apart than any two players can be, so a query never leaves its frame
+        """
+        num_frames = len(team_positions)
+        mean = np.full(num_frames, np.nan)
+        minimum = np.full(num_frames, np.nan)
+
+        team_frames, team_slots = np.nonzero(~np.isnan(team_positions[..., 0]))
+        opponent_frames, opponent_slots = np.nonzero(~np.isnan(opponent_positions[..., 0]))
+        if not len(team_frames) or not len(opponent_frames):
+            return mean, minimum
+
+        spacing = 10 * (100 + 100 * self.frame_height / self.frame_width)
+        tree = cKDTree(np.column_stack([opponent_positions[opponent_frames, opponent_slots],
+                                        opponent_frames * spacing]), balanced_tree=False)
+        distances, _ = tree.query(np.column_stack([team_positions[team_frames, team_slots],
+                                                   team_frames * spacing]))
+        # no opponent in the frame, the match is from another frame
+        found = distances < spacing / 2
+        team_frames, distances = team_frames[found], distances[found]
+
+        counts = np.bincount(team_frames, minlength=num_frames)
+        sums = np.bincount(team_frames, weights=distances, minlength=num_frames)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(counts > 0, sums / counts, np.nan)
+        # players come frame by frame (np.nonzero order), so every frame is one contiguous segment
+        frames_with_players = np.flatnonzero(counts)
+        if len(frames_with_players):
+            starts = np.concatenate([[0], np.cumsum(counts[frames_with_players])[:-1]])
+            minimum[frames_with_players] = np.minimum.reduceat(distances, starts)
+        return mean, minimum
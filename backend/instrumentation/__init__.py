@@ -0,0 +1,2 @@
+from .instrumentation import Instrumentation, activate, track_stage, get_peak_rss_mb
+from .sampling_profiler import SamplingProfiler
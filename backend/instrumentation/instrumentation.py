@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from .sampling_profiler import SamplingProfiler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def get_peak_rss_mb():
+    """Peak resident set size of this process so far, None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 1024 ** 2 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+class StageRecord:
+    """Totals for one stage name, summed over every time the stage ran"""
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.items = 0
+        self.peak_rss_mb = None
+
+    def to_dict(self):
+        return {
+            'stage': self.name,
+            'calls': self.calls,
+            'wall_s': round(self.wall_s, 6),
+            'cpu_s': round(self.cpu_s, 6),
+            'items': self.items,
+            'items_per_s': round(self.items / self.wall_s, 2) if self.items and self.wall_s > 0 else None,
+            'peak_rss_mb': None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+        }
+
+
+class StageItems:
+    """Handed out by Instrumentation.stage so the code inside can count processed items"""
+    def __init__(self, items=0):
+        self.items = items
+
+    def add(self, count=1):
+        self.items += count
+
+
+class Instrumentation:
+    """
+    Records wall time, CPU time, item counts and peak RSS per named stage
+    With profile_dir set, stages started with profile=True are also sampled and
+    written to profile_dir/<stage>.folded (profiler_factory swaps in another profiler,
+    it must return an object with start(), stop() and write(path))
+    """
+    def __init__(self, profile_dir=None, profiler_factory=SamplingProfiler):
+        self.profile_dir = profile_dir
+        self.profiler_factory = profiler_factory
+        self.records = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, items=0, profile=False):
+        profiler = None
+        if profile and self.profile_dir is not None:
+            profiler = self.profiler_factory()
+            profiler.start()
+
+        stage_items = StageItems(items)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stage_items
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            peak_rss_mb = get_peak_rss_mb()
+
+            if profiler is not None:
+                profiler.stop()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.write(os.path.join(self.profile_dir, f'{name}.folded'))
+
+            with self.lock:
+                record = self.records.setdefault(name, StageRecord(name))
+                record.calls += 1
+                record.wall_s += wall
+                record.cpu_s += cpu
+                record.items += stage_items.items
+                if peak_rss_mb is not None:
+                    record.peak_rss_mb = max(record.peak_rss_mb or 0, peak_rss_mb)
+
+    def summary(self):
+        with self.lock:
+            return [record.to_dict() for record in self.records.values()]
+
+
+# Instrumentation that track_stage reports to, set by whoever runs a job (see Pipeline.run)
+active_instrumentation = None
+
+
+def activate(instrumentation):
+    """Make instrumentation the target of track_stage, returns the previously active one"""
+    global active_instrumentation
+    previous = active_instrumentation
+    active_instrumentation = instrumentation
+    return previous
+
+
+@contextmanager
+def track_stage(name, items=0):
+    """Time a block under name in the active instrumentation, a no-op when none is active"""
+    if active_instrumentation is None:
+        yield StageItems(items)
+    else:
+        with active_instrumentation.stage(name, items) as stage_items:
+            yield stage_items
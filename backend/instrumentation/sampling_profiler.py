@@ -0,0 +1,43 @@
+import sys
+import threading
+from collections import Counter
+
+class SamplingProfiler:
+    """
+    Samples the call stack of the thread that started it from a background thread
+    Output is in collapsed-stack format (one "a;b;c count" line per stack), which
+    flamegraph.pl and speedscope read directly
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.thread_id = None
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.stop_event.clear()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def sample(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,4 @@
+from .frame_source import FrameSource
+from .live_analyzer import LiveAnalyzer
+from .live_possession import LivePossession
+from .publisher import JsonLinesPublisher
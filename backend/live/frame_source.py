@@ -0,0 +1,72 @@
+import os
+import time
+import cv2
+
+
+class FrameSource:
+    """
+    Continuous frames from a camera index ("0"), a stream URL (rtsp://, udp://, http://...)
+    or a video file that may still be growing (a recording in progress)
+    Iterating yields (frame_num, captured_at, frame), captured_at is time.time() when the
+    frame was read. Files are paced at their fps by default so they play like a camera
+    """
+    def __init__(self, source, realtime=None, poll_interval=0.2, idle_timeout=10.0):
+        self.source = int(source) if str(source).isdigit() else source
+        self.is_file = isinstance(self.source, str) and os.path.exists(self.source)
+        self.realtime = self.is_file if realtime is None else realtime
+        # a growing file is polled this often for new frames, and given up on after
+        # idle_timeout seconds without one
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.fps = None
+        self.stopped = False
+
+    def open(self, start_frame=0):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if fps and fps > 0:
+            self.fps = fps
+        return cap
+
+    def stop(self):
+        self.stopped = True
+
+    def __iter__(self):
+        cap = self.open()
+        if cap is None:
+            raise IOError(f"Could not open frame source: {self.source}")
+
+        frame_num = 0
+        start_time = time.time()
+        last_frame_time = time.monotonic()
+        try:
+            while not self.stopped:
+                ret, frame = cap.read()
+                if not ret:
+                    # streams end when they end, files may just not be written yet
+                    if not self.is_file or time.monotonic() - last_frame_time > self.idle_timeout:
+                        break
+                    time.sleep(self.poll_interval)
+                    # reopen to pick up frames appended since the file was opened
+                    cap.release()
+                    cap = self.open(frame_num)
+                    if cap is None:
+                        break
+                    continue
+
+                last_frame_time = time.monotonic()
+                if self.realtime and self.fps:
+                    delay = start_time + frame_num / self.fps - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                yield frame_num, time.time(), frame
+                frame_num += 1
+        finally:
+            if cap is not None:
+                cap.release()
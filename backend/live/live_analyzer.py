@@ -0,0 +1,317 @@
+import math
+import threading
+import time
+from collections import deque
+import numpy as np
+import sys
+sys.path.append('../')
+from team_assigner import TeamAssigner
+from formation_analyzer import FormationAnalyzer, FormationSmoother, HeatmapBuilder
+from .live_possession import LivePossession
+
+TEAM_IDS = (1, 2)
+
+# Players needed in one frame before the team colors are fitted
+MIN_PLAYERS_FOR_TEAM_FIT = 6
+
+# Most recent detected frames searched for the best formation frame
+FORMATION_CANDIDATES = 25
+
+# Detection may use this share of the time between source frames, the stride covers the rest
+TARGET_UTILIZATION = 0.8
+
+
+class LiveAnalyzer:
+    """
+    Detection, ByteTrack, team assignment, possession and rolling-window formations on a
+    FrameSource while it plays, within a latency budget:
+      - frames older than latency_budget seconds when picked up are dropped
+      - detection runs on every stride-th frame, the stride grows when detection is
+        slower than the source frame rate and shrinks again when it catches up
+    Updates are handed to publish(update) as JSON-serializable dicts with a 'type' of
+    'possession', 'formation', 'heatmap' or 'stats'
+    Every analyzed frame is added to a HeatmapBuilder, the team grids since the start are
+    published every heatmap_interval seconds
+    With formation_window set, formations come from a FormationSmoother over that many
+    frames instead of the best recent snapshot frame, with ball_tile_size set a BallTracker
+    searches a tile that size around the predicted ball position when detection misses it
+    """
+    def __init__(self, model_path='models/best.pt', latency_budget=1.0, window_seconds=10.0,
+                 formation_interval=2.0, stats_interval=1.0, max_stride=8, queue_size=64, tracker=None,
+                 formation_window=None, ball_tile_size=None, heatmap_interval=10.0):
+        self.model_path = model_path
+        self.latency_budget = latency_budget
+        self.window_seconds = window_seconds
+        self.formation_interval = formation_interval
+        self.stats_interval = stats_interval
+        self.heatmap_interval = heatmap_interval
+        self.max_stride = max_stride
+        self.tracker = tracker
+        self.ball_tile_size = ball_tile_size
+        self.ball_tracker = None
+
+        self.team_assigner = TeamAssigner()
+        self.formation_analyzer = FormationAnalyzer()
+        self.possession = LivePossession()
+        self.formation_smoother = None if not formation_window else \
+            FormationSmoother(window_frames=formation_window, team_ids=TEAM_IDS, formation_analyzer=self.formation_analyzer)
+        # created with the first frame's size
+        self.heatmaps = None
+
+        # rolling window of detected frames, tracks in the Tracker format plus (frame_num, captured_at)
+        self.tracks = {"players": [], "referees": [], "ball": []}
+        self.window = []
+
+        # frames waiting to be processed, the oldest falls off when the reader gets too far ahead
+        self.queue = deque(maxlen=queue_size)
+        self.condition = threading.Condition()
+        self.reader_done = False
+        self.reader_error = None
+
+        self.source_fps = None
+        self.stride = 1
+        self.since_detection = max_stride
+        self.detect_seconds = None
+        self.latencies = deque(maxlen=250)
+        self.last_formation_time = 0.0
+        self.last_heatmap_time = 0.0
+        self.last_stats_time = time.time()
+        self.last_stats_processed = 0
+
+        self.received = 0
+        self.processed = 0
+        self.skipped = 0
+        self.dropped_late = 0
+        self.dropped_overflow = 0
+        self.last_frame = None
+
+    def get_tracker(self):
+        if self.tracker is None:
+            from trackers import Tracker
+            self.tracker = Tracker(self.model_path)
+        return self.tracker
+
+    def run(self, source, publish, should_stop=None):
+        """
+        Analyze source until it ends or should_stop() returns True
+        """
+        reader = threading.Thread(target=self.read_frames, args=(source,), daemon=True)
+        reader.start()
+
+        try:
+            while True:
+                if should_stop is not None and should_stop():
+                    break
+
+                item = self.next_frame(timeout=0.5)
+                if item is not None:
+                    self.process(*item, publish)
+                elif self.reader_done:
+                    break
+
+                if time.time() - self.last_stats_time >= self.stats_interval:
+                    publish(self.get_stats())
+        finally:
+            source.stop()
+            reader.join(timeout=5)
+
+        if self.reader_error is not None:
+            raise self.reader_error
+        publish(self.get_stats(final=True))
+
+    def read_frames(self, source):
+        try:
+            for item in source:
+                self.source_fps = source.fps
+                with self.condition:
+                    if len(self.queue) == self.queue.maxlen:
+                        self.dropped_overflow += 1
+                    self.queue.append(item)
+                    self.received += 1
+                    self.condition.notify()
+        except Exception as e:
+            self.reader_error = e
+        finally:
+            with self.condition:
+                self.reader_done = True
+                self.condition.notify()
+
+    def next_frame(self, timeout):
+        with self.condition:
+            if not self.queue and not self.reader_done:
+                self.condition.wait(timeout)
+            return self.queue.popleft() if self.queue else None
+
+    def process(self, frame_num, captured_at, frame, publish):
+        if time.time() - captured_at > self.latency_budget:
+            self.dropped_late += 1
+            return
+
+        self.since_detection += 1
+        if self.since_detection < self.stride:
+            self.skipped += 1
+            return
+        self.since_detection = 0
+
+        start = time.perf_counter()
+        tracker = self.get_tracker()
+        detection = tracker.detect_frames([frame])[0]
+        detection_supervision, cls_names_inv = tracker.to_supervision(detection)
+        tracker.add_frame_tracks(self.tracks, detection_supervision, cls_names_inv)
+        if self.ball_tile_size is not None:
+            if self.ball_tracker is None:
+                from trackers import BallTracker
+                self.ball_tracker = BallTracker(tracker, tile_size=self.ball_tile_size)
+            ball = self.ball_tracker.update(frame_num, frame, detection_supervision, cls_names_inv)
+            self.tracks['ball'][-1] = {} if ball is None else {1: {"bbox": ball}}
+        self.window.append((frame_num, captured_at))
+        self.trim_window(captured_at)
+
+        players = self.tracks['players'][-1]
+        self.assign_teams(frame_num, frame, players)
+        event = self.possession.update(players, self.tracks['ball'][-1])
+        height, width = frame.shape[:2]
+        if self.heatmaps is None:
+            self.heatmaps = HeatmapBuilder(width, height, team_ids=TEAM_IDS)
+        self.heatmaps.update({'players': [players]})
+        self.update_stride(time.perf_counter() - start)
+
+        self.processed += 1
+        self.last_frame = frame_num
+
+        if event is not None:
+            publish(self.make_update('possession', frame_num, captured_at, event=event,
+                                     percentages=self.possession.get_percentages()))
+
+        if self.formation_smoother is not None:
+            formations = self.formation_smoother.update(frame_num, players, width, height)
+            for team_id, formation in (formations or {}).items():
+                if formation['positions']:
+                    publish(self.make_formation_update(frame_num, captured_at, team_id, formation,
+                                                       window=list(formation['window'])))
+        elif captured_at - self.last_formation_time >= self.formation_interval:
+            self.last_formation_time = captured_at
+            for update in self.get_formation_updates(frame_num, captured_at, width, height):
+                publish(update)
+
+        if captured_at - self.last_heatmap_time >= self.heatmap_interval:
+            self.last_heatmap_time = captured_at
+            publish(self.get_heatmap_update(frame_num, captured_at))
+
+        self.latencies.append(time.time() - captured_at)
+
+    def trim_window(self, now):
+        drop = 0
+        while drop < len(self.window) and self.window[drop][1] < now - self.window_seconds:
+            drop += 1
+        if drop:
+            del self.window[:drop]
+            for object_type in self.tracks:
+                del self.tracks[object_type][:drop]
+
+    def assign_teams(self, frame_num, frame, players):
+        self.team_assigner.update_tracks(frame_num, players)
+        if not self.team_assigner.team_colors:
+            if len(players) < MIN_PLAYERS_FOR_TEAM_FIT:
+                return
+            self.team_assigner.assign_team_color(frame, players)
+
+        for player_id, track in players.items():
+            team = int(self.team_assigner.get_player_team(frame, track['bbox'], player_id))
+            track['team'] = team
+            track['team_color'] = self.team_assigner.team_colors[team]
+
+    def update_stride(self, detect_seconds):
+        if self.detect_seconds is None:
+            self.detect_seconds = detect_seconds
+        else:
+            self.detect_seconds = 0.8 * self.detect_seconds + 0.2 * detect_seconds
+
+        fps = self.source_fps or 25
+        stride = math.ceil(self.detect_seconds * fps / TARGET_UTILIZATION)
+        self.stride = max(1, min(self.max_stride, stride))
+
+    def get_formation_updates(self, frame_num, captured_at, width, height):
+        """Formation of each team at the best frame among the most recent detected frames"""
+        num_frames = len(self.tracks['players'])
+        candidates = list(range(max(0, num_frames - FORMATION_CANDIDATES), num_frames))
+
+        updates = []
+        for team_id in TEAM_IDS:
+            best = self.formation_analyzer.get_best_frame_for_formation(self.tracks, team_id, candidates)
+            formation = self.formation_analyzer.get_team_formation(self.tracks, team_id, width, height, best)
+            if not formation['positions']:
+                continue
+
+            updates.append(self.make_formation_update(frame_num, captured_at, team_id, formation,
+                                                      formation_frame=self.window[best][0]))
+        return updates
+
+    def get_heatmap_update(self, frame_num, captured_at):
+        """Team heatmaps over every analyzed frame so far, grids of frame counts (y_bins, x_bins)"""
+        heatmaps = self.heatmaps.get_heatmaps()
+        return self.make_update(
+            'heatmap', frame_num, captured_at,
+            frames=heatmaps['frames'],
+            bins=list(heatmaps['bins']),
+            teams={str(team_id): grid.tolist() for team_id, grid in heatmaps['teams'].items()},
+        )
+
+    def make_formation_update(self, frame_num, captured_at, team_id, formation, **fields):
+        return self.make_update(
+            'formation', frame_num, captured_at,
+            team=team_id,
+            formation=formation['formation'],
+            team_color=[int(round(float(c))) for c in formation['team_color']],
+            players=[
+                {'id': int(player_id), 'x': round(float(x), 2), 'y': round(float(y), 2)}
+                for player_id, (x, y) in formation['positions'].items()
+            ],
+            **fields,
+        )
+
+    def make_update(self, update_type, frame_num, captured_at, **fields):
+        published_at = time.time()
+        return {
+            'type': update_type,
+            'frame': int(frame_num),
+            'captured_at': captured_at,
+            'published_at': published_at,
+            'latency_ms': round(1000 * (published_at - captured_at), 1),
+            **fields,
+        }
+
+    def get_stats(self, final=False):
+        now = time.time()
+        elapsed = now - self.last_stats_time
+        processed_fps = (self.processed - self.last_stats_processed) / elapsed if elapsed > 0 else 0.0
+        self.last_stats_time = now
+        self.last_stats_processed = self.processed
+
+        latency_ms = None
+        if self.latencies:
+            latencies = 1000 * np.array(self.latencies)
+            latency_ms = {
+                'p50': round(float(np.percentile(latencies, 50)), 1),
+                'p95': round(float(np.percentile(latencies, 95)), 1),
+                'max': round(float(latencies.max()), 1),
+            }
+
+        return {
+            'type': 'stats',
+            'final': final,
+            'published_at': now,
+            'frame': self.last_frame,
+            'received': self.received,
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'dropped_late': self.dropped_late,
+            'dropped_overflow': self.dropped_overflow,
+            'queued': len(self.queue),
+            'stride': self.stride,
+            'source_fps': self.source_fps,
+            'processed_fps': round(processed_fps, 2),
+            'latency_budget_ms': round(1000 * self.latency_budget, 1),
+            'latency_ms': latency_ms,
+            'possession': self.possession.get_percentages(),
+        }
@@ -0,0 +1,64 @@
+import numpy as np
+import sys
+sys.path.append('../')
+from player_ball_assigner import PossessionEngine
+
+
+class LivePossession:
+    """
+    Frame-by-frame version of PossessionEngine for live analysis: same foot-to-ball rule
+    and the same min_hold_frames hysteresis, applied as each frame arrives
+    """
+    def __init__(self, min_hold_frames=5):
+        self.engine = PossessionEngine(min_hold_frames)
+        self.holder = -1
+        self.holder_team = 0
+        self.candidate = -1
+        self.candidate_frames = 0
+        self.team_frames = {1: 0, 2: 0}
+
+    def update(self, players, ball):
+        """
+        Add one frame of player tracks (with 'team') and ball tracks
+        Returns a possession-change event dict when the confirmed holder changes, else None
+        """
+        player_ids = list(players)
+        assigned = -1
+        if player_ids and 1 in ball:
+            bboxes = np.array([[players[player_id]['bbox'] for player_id in player_ids]], dtype=float)
+            x1, y1, x2, y2 = ball[1]['bbox']
+            ball_position = np.trunc(np.array([[(x1 + x2) / 2, (y1 + y2) / 2]]))
+            column = self.engine.assign_ball_to_players(bboxes, ball_position)[0]
+            if column != -1:
+                assigned = player_ids[column]
+
+        if assigned == self.candidate:
+            self.candidate_frames += 1
+        else:
+            self.candidate = assigned
+            self.candidate_frames = 1
+
+        event = None
+        if self.candidate != -1 and self.candidate != self.holder \
+                and self.candidate_frames >= self.engine.min_hold_frames:
+            to_team = int(players[self.candidate].get('team', 0))
+            event = {
+                'from_player': int(self.holder),
+                'to_player': int(self.candidate),
+                'from_team': self.holder_team,
+                'to_team': to_team,
+                'turnover': self.holder_team != 0 and self.holder_team != to_team,
+            }
+            self.holder = self.candidate
+            self.holder_team = to_team
+
+        if self.holder_team in self.team_frames:
+            self.team_frames[self.holder_team] += 1
+        return event
+
+    def get_percentages(self):
+        total_frames = self.team_frames[1] + self.team_frames[2]
+        return {
+            team: round(100 * count / total_frames, 2) if total_frames else 0.0
+            for team, count in self.team_frames.items()
+        }
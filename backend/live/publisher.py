@@ -0,0 +1,21 @@
+import json
+
+
+def to_json_value(value):
+    # numpy scalars and arrays that slip into updates
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+class JsonLinesPublisher:
+    """
+    Publish live updates as one JSON object per line, flushed right away so a reader
+    tailing the file (the API's stream endpoint) sees every update as it happens
+    """
+    def __init__(self, file):
+        self.file = file
+
+    def __call__(self, update):
+        self.file.write(json.dumps(update, separators=(',', ':'), default=to_json_value) + '\n')
+        self.file.flush()
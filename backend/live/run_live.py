@@ -0,0 +1,62 @@
+"""
+Live analysis of a camera, stream or growing video file.
+
+Run from the backend folder:
+    python -m live.run_live --source 0 --latency-budget 1.0
+    python -m live.run_live --source input_videos/recording.mkv --output live.jsonl
+
+Possession changes, formation updates, heatmaps and stats are written as JSON lines.
+"""
+import argparse
+import sys
+from .frame_source import FrameSource
+from .live_analyzer import LiveAnalyzer
+from .publisher import JsonLinesPublisher
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze a live frame source")
+    parser.add_argument('--source', required=True, help="Camera index, stream URL or (growing) video file")
+    parser.add_argument('--model', default='models/best.pt', help="YOLO model weights")
+    parser.add_argument('--latency-budget', type=float, default=1.0,
+                        help="Seconds a frame may wait before it is dropped")
+    parser.add_argument('--window', type=float, default=10.0, help="Seconds of tracks kept for formations")
+    parser.add_argument('--formation-interval', type=float, default=2.0, help="Seconds between formation updates")
+    parser.add_argument('--formation-window', type=int, default=None,
+                        help="Formation from smoothed positions once per this many frames")
+    parser.add_argument('--heatmap-interval', type=float, default=10.0, help="Seconds between heatmap updates")
+    parser.add_argument('--ball-tile-size', type=int, default=None,
+                        help="Search a tile this size around the predicted ball when detection misses it")
+    parser.add_argument('--max-stride', type=int, default=8, help="Largest detection stride when falling behind")
+    parser.add_argument('--no-realtime', action='store_true', help="Read files as fast as possible, not at their fps")
+    parser.add_argument('--output', default=None, help="Write updates here instead of stdout")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    source = FrameSource(args.source, realtime=False if args.no_realtime else None)
+    analyzer = LiveAnalyzer(
+        model_path=args.model,
+        latency_budget=args.latency_budget,
+        window_seconds=args.window,
+        formation_interval=args.formation_interval,
+        max_stride=args.max_stride,
+        formation_window=args.formation_window,
+        ball_tile_size=args.ball_tile_size,
+        heatmap_interval=args.heatmap_interval,
+    )
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        analyzer.run(source, JsonLinesPublisher(output))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
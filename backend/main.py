@@ -1,67 +1,131 @@
-from utils import read_video
-from trackers import Tracker
-import cv2
+import argparse
+import os
 import numpy as np
-from team_assigner import TeamAssigner
-from formation_analyzer import FormationAnalyzer
+from pipeline import Pipeline, PipelineConfig, STAGES
+from player_ball_assigner import get_event_counts
+from utils import ANALYSIS_PROFILE
 
-def main():
-    # Read Video
-    video_frames = read_video('input_videos/08fd33_4.mp4')
-    
-    # Initialize Tracker
-    tracker = Tracker('models/best.pt')
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze formations and possession in a match video")
+    parser.add_argument('--video', default='input_videos/08fd33_4.mp4', help="Input video path")
+    parser.add_argument('--model', default='models/best.pt', help="YOLO model weights")
+    parser.add_argument('--output-dir', default='output_images', help="Where formation diagrams are written")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="Stage checkpoints (default: checkpoints/<video name>)")
+    parser.add_argument('--stub', default='stubs/tracks_stub.pkl',
+                        help="Precomputed tracks, used instead of detection when the file exists")
+    parser.add_argument('--no-stub', action='store_true', help="Always run detection and tracking")
+    parser.add_argument('--chunk-size', type=int, default=100, help="Frames per checkpointed chunk")
+    parser.add_argument('--ball-tile-size', type=int, default=320,
+                        help="Tile searched around the predicted ball position when detection misses it")
+    parser.add_argument('--no-ball-search', action='store_true',
+                        help="Only use the full-frame ball detections")
+    parser.add_argument('--no-camera-compensation', action='store_true',
+                        help="Analyze formations in raw image coordinates, ignoring camera pans")
+    parser.add_argument('--no-resume', action='store_true', help="Ignore existing checkpoints")
+    parser.add_argument('--timeout', type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument('--stage-budget', action='append', default=[], metavar='STAGE=SECONDS',
+                        help="Stop when a stage runs longer than this, e.g. detect=300 (repeatable)")
+    parser.add_argument('--no-images', action='store_true',
+                        help="Only write results.json and tracks.parquet, skip the PNG diagrams")
+    parser.add_argument('--video-output', action='store_true',
+                        help="Also write the match video with tracking, formation and possession overlays")
+    parser.add_argument('--formation-workers', type=int, default=1,
+                        help="Processes analyzing formation windows in parallel, 0 for one per window")
+    parser.add_argument('--formation-window', type=int, default=None,
+                        help="Also estimate formations over the whole match, once per this many frames")
+    parser.add_argument('--transcode', action='store_true',
+                        help="Analyze a copy of the video scaled down and frame-decimated to the analysis profile")
+    parser.add_argument('--analysis-height', type=int, default=ANALYSIS_PROFILE['max_height'],
+                        help="Maximum frame height of the analysis copy (with --transcode)")
+    parser.add_argument('--analysis-fps', type=float, default=ANALYSIS_PROFILE['max_fps'],
+                        help="Maximum frame rate of the analysis copy (with --transcode)")
+    parser.add_argument('--keyframe-interval', type=int, default=ANALYSIS_PROFILE['keyframe_interval'],
+                        help="Frames between keyframes of the analysis copy (with --transcode)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Threads for torch, OpenMP/BLAS and OpenCV, given to each stage's main library")
+    parser.add_argument('--profile-dir', default=None,
+                        help="Write a sampled profile of every stage here (<stage>.folded, for flamegraph tools)")
+    parser.add_argument('--metrics', action='store_true', help="Print time, CPU and memory per stage")
+    return parser.parse_args()
 
-    tracks = tracker.get_object_tracks(video_frames,
-                                       read_from_stub=True,
-                                       stub_path='stubs/tracks_stub.pkl')
-    
-    # Assign Teams (needed for formation analysis)
-    team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(video_frames[0], tracks['players'][0])
+def parse_stage_budgets(values):
+    budgets = {}
+    for value in values:
+        stage, _, seconds = value.partition('=')
+        if stage not in STAGES or not seconds:
+            raise SystemExit(f"--stage-budget expects STAGE=SECONDS with a stage from {', '.join(STAGES)}, got {value}")
+        budgets[stage] = float(seconds)
+    return budgets or None
 
-    for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num],   
-                                                 track['bbox'],
-                                                 player_id)
-            tracks['players'][frame_num][player_id]['team'] = team 
-            tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors[team]
-    
-    # Analyze Formations at First, Middle, and Last frames
-    print("\nAnalyzing formations at first, middle, and last frames...")
-    formation_analyzer = FormationAnalyzer()
-    frame_height, frame_width = video_frames[0].shape[:2]
-    
-    # Analyze Team 1 at 3 time points
-    team1_results = formation_analyzer.analyze_team_formation_over_time(
-        tracks, team_id=1, frame_width=frame_width, frame_height=frame_height
-    )
-    
-    # Analyze Team 2 at 3 time points
-    team2_results = formation_analyzer.analyze_team_formation_over_time(
-        tracks, team_id=2, frame_width=frame_width, frame_height=frame_height
+def main():
+    args = parse_args()
+
+    video_name = os.path.splitext(os.path.basename(args.video))[0]
+    config = PipelineConfig(
+        video_path=args.video,
+        model_path=args.model,
+        output_dir=args.output_dir,
+        checkpoint_dir=args.checkpoint_dir or os.path.join('checkpoints', video_name),
+        tracks_stub_path=None if args.no_stub else args.stub,
+        chunk_size=args.chunk_size,
+        ball_tile_size=None if args.no_ball_search else args.ball_tile_size,
+        camera_compensation=not args.no_camera_compensation,
+        resume=not args.no_resume,
+        timeout=args.timeout,
+        stage_budgets=parse_stage_budgets(args.stage_budget),
+        render_images=not args.no_images,
+        render_video=args.video_output,
+        formation_workers=args.formation_workers or None,
+        formation_window=args.formation_window,
+        threads=args.threads,
+        profile_dir=args.profile_dir,
+        analysis_profile={
+            'max_height': args.analysis_height,
+            'max_fps': args.analysis_fps,
+            'keyframe_interval': args.keyframe_interval,
+        } if args.transcode else None,
     )
-    
-    # Save all formation diagrams
-    print("\nTeam 1 Formations:")
-    for formation_name, diagram, lines, label in team1_results:
-        filename = f'output_images/team1_formation_{label.lower()}.png'
-        cv2.imwrite(filename, diagram)
-        print(f"  {label}: {formation_name} - Saved to {filename}")
-    
-    print("\nTeam 2 Formations:")
-    for formation_name, diagram, lines, label in team2_results:
-        filename = f'output_images/team2_formation_{label.lower()}.png'
-        cv2.imwrite(filename, diagram)
-        print(f"  {label}: {formation_name} - Saved to {filename}")
-    
-    # Create side-by-side comparisons for each time point
-    for i, label in enumerate(['start', 'middle', 'end']):
-        combined = np.hstack([team1_results[i][1], team2_results[i][1]])
-        cv2.imwrite(f'output_images/formations_comparison_{label}.png', combined)
-    
-    print("\nAll formation diagrams saved to output_images/")
+
+    result = Pipeline(config).run()
+
+    percentages = result['possession']['possession_percentages']
+    print(f"\nPossession - Team 1: {percentages[1]:.1f}%  Team 2: {percentages[2]:.1f}%"
+          f"  ({len(result['possession']['events'])} possession changes)")
+
+    for team_id, formations in result['formations'].items():
+        print(f"\nTeam {team_id} Formations:")
+        for label, formation in formations:
+            print(f"  {label}: {formation['formation']} (frame {formation['frame_num']})")
+
+    for team_id, formations in (result['formation_timeline'] or {}).items():
+        print(f"\nTeam {team_id} Formation Timeline:")
+        for formation in formations:
+            start, end = formation['window']
+            print(f"  frames {start}-{end}: {formation['formation']}")
+
+    metrics = result['tactical_metrics']
+    print("\nTactical metrics (match average, in % of the frame width):")
+    for team_id in (1, 2):
+        averages = [f"{name} {np.nanmean(metrics[team_id][name]):.1f}"
+                    for name in ('defensive_line', 'length', 'width', 'back_to_mid', 'mid_to_front', 'nearest_opponent_mean')
+                    if not np.isnan(metrics[team_id][name]).all()]
+        print(f"  Team {team_id}: {', '.join(averages)}")
+
+    event_counts = get_event_counts(result['events']['events'])
+    print("\nEvents:")
+    for team_id, counts in event_counts.items():
+        print(f"  Team {team_id}: {counts['passes']} passes, {counts['switches']} switches, "
+              f"{counts['turnovers_won']} turnovers won")
+
+    outputs = result['images'] + result['data_files'] + ([result['video_file']] if result['video_file'] else [])
+    print(f"\nResults saved to {args.output_dir}/: {', '.join(outputs)}")
+
+    if args.metrics:
+        print(f"\n{'Stage':<28}{'Wall s':>9}{'CPU s':>9}{'Items':>9}{'Items/s':>14}{'Peak RSS MB':>13}")
+        for stage in result['metrics']:
+            print(f"{stage['stage']:<28}{stage['wall_s']:>9.3f}{stage['cpu_s']:>9.3f}{stage['items']:>9}"
+                  f"{stage['items_per_s'] or '-':>14}{stage['peak_rss_mb'] or '-':>13}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,6 @@
+from .checkpoints import CheckpointStore
+from .pipeline import Pipeline, PipelineConfig, PipelineTimeout, PipelineCancelled, STAGES
+from .results import load_results, load_heatmaps, load_event_table, render_diagram, save_diagram, get_diagram_names
+
+__all__ = ['Pipeline', 'PipelineConfig', 'PipelineTimeout', 'PipelineCancelled', 'CheckpointStore', 'STAGES',
+           'load_results', 'load_heatmaps', 'load_event_table', 'render_diagram', 'save_diagram', 'get_diagram_names']
@@ -0,0 +1,260 @@
+import csv
+import hashlib
+import json
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import sys
+sys.path.append('../')
+from utils import get_cpu_count, init_worker_threads
+from .pipeline import Pipeline, PipelineConfig, TEAM_IDS
+from .checkpoints import CheckpointStore
+from .results import RESULTS_FILENAME
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv')
+
+# Written next to each match's results, marks them as cached for this video, model and settings
+ENTRY_FILENAME = 'batch_entry.json'
+INDEX_FILENAME = 'index.json'
+INDEX_CSV_FILENAME = 'index.csv'
+
+# Tracker kept warm in each worker process, see init_worker
+worker_tracker = None
+
+
+def find_videos(input_dir, extensions=VIDEO_EXTENSIONS):
+    """Video files in input_dir (not recursive), sorted by name"""
+    return sorted(
+        os.path.join(input_dir, filename)
+        for filename in os.listdir(input_dir)
+        if filename.lower().endswith(extensions)
+    )
+
+
+def read_manifest(manifest_path):
+    """
+    Video paths from a manifest, one per line, blank lines and # comments skipped
+    Relative paths are relative to the manifest's folder
+    """
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    videos = []
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                videos.append(line if os.path.isabs(line) else os.path.join(manifest_dir, line))
+    return videos
+
+
+def get_match_names(videos):
+    """Output folder name per video: the file name without extension, plus a path hash when names clash"""
+    stems = [os.path.splitext(os.path.basename(video))[0] for video in videos]
+    names = []
+    for video, stem in zip(videos, stems):
+        if stems.count(stem) > 1:
+            stem = f"{stem}_{hashlib.sha1(os.path.abspath(video).encode()).hexdigest()[:8]}"
+        names.append(stem)
+    return names
+
+
+def get_fingerprint(video_path, model_path, analysis_profile=None, render_images=True):
+    """
+    What a match's cached results depend on, like Pipeline.prepare_checkpoints:
+    results made under another analysis profile or with images toggled are redone
+    """
+    video_stat = os.stat(video_path)
+    return {
+        'video_path': os.path.abspath(video_path),
+        'video_size': video_stat.st_size,
+        'video_mtime': video_stat.st_mtime,
+        'model_path': os.path.abspath(model_path),
+        'analysis_profile': analysis_profile,
+        'render_images': render_images,
+    }
+
+
+def load_cached_entry(match_dir, fingerprint):
+    """Summary entry of a finished match when its results are still valid, else None"""
+    entry_path = os.path.join(match_dir, ENTRY_FILENAME)
+    if not os.path.exists(entry_path) or not os.path.exists(os.path.join(match_dir, RESULTS_FILENAME)):
+        return None
+    with open(entry_path) as f:
+        entry = json.load(f)
+    return entry if entry.get('fingerprint') == fingerprint else None
+
+
+def init_worker(model_path, threads):
+    """
+    Budget the worker's thread pools, then load the detection model and warm up KMeans
+    once per worker process, so every match the worker processes afterwards starts straight away
+    """
+    global worker_tracker
+    init_worker_threads(threads)
+    import numpy as np
+    from sklearn.cluster import KMeans
+    KMeans(n_clusters=2, n_init=1).fit(np.random.default_rng(0).random((20, 3)))
+
+    if os.path.exists(model_path):
+        try:
+            from trackers import Tracker
+        except ImportError:
+            # reported per match by the pipeline when it needs the tracker
+            return
+        worker_tracker = Tracker(model_path)
+        worker_tracker.model  # loads the weights now rather than on the first match
+
+
+def summarize(result):
+    """Per-match summary for the index: possession and formation names per team and time point"""
+    return {
+        'frames': result['frames'],
+        'possession': {str(team): round(pct, 2) for team, pct in result['possession']['possession_percentages'].items()},
+        'possession_changes': len(result['possession']['events']),
+        'formations': {
+            str(team_id): {label: formation['formation'] for label, formation in result['formations'][team_id]}
+            for team_id in TEAM_IDS
+        },
+    }
+
+
+def process_match(job):
+    """
+    Run the pipeline for one match in a worker process
+    Returns the match's summary entry, errors are reported in the entry rather than raised
+    """
+    start = time.perf_counter()
+    entry = {'name': job['name'], 'video': job['video_path'], 'fingerprint': job['fingerprint']}
+
+    config = PipelineConfig(
+        video_path=job['video_path'],
+        model_path=job['model_path'],
+        output_dir=job['match_dir'],
+        checkpoint_dir=os.path.join(job['match_dir'], 'checkpoints'),
+        chunk_size=job['chunk_size'],
+        timeout=job['timeout'],
+        render_images=job['render_images'],
+        threads=job['threads'],
+        analysis_profile=job['analysis_profile'],
+    )
+    try:
+        result = Pipeline(config, tracker=worker_tracker).run()
+    except Exception as e:
+        entry.update(status='failed', error=f"{type(e).__name__}: {e}",
+                     seconds=round(time.perf_counter() - start, 3))
+        return entry
+
+    entry.update(status='completed', error=None, seconds=round(time.perf_counter() - start, 3), **summarize(result))
+    with open(os.path.join(job['match_dir'], ENTRY_FILENAME), 'w') as f:
+        json.dump(entry, f, indent=2)
+
+    if not job['keep_checkpoints']:
+        CheckpointStore(config.checkpoint_dir).clear()
+    return entry
+
+
+def write_index(output_dir, entries, throughput):
+    """index.json with every match entry and the run's throughput, and index.csv with one row per match"""
+    index = {'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'throughput': throughput, 'matches': entries}
+    with open(os.path.join(output_dir, INDEX_FILENAME), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    labels = []
+    for entry in entries:
+        for label in entry.get('formations', {}).get('1', {}):
+            if label not in labels:
+                labels.append(label)
+
+    with open(os.path.join(output_dir, INDEX_CSV_FILENAME), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'video', 'status', 'frames', 'seconds', 'team1_possession', 'team2_possession']
+                        + [f'team{team_id}_{label.lower()}' for team_id in TEAM_IDS for label in labels] + ['error'])
+        for entry in entries:
+            possession = entry.get('possession', {})
+            formations = entry.get('formations', {})
+            writer.writerow(
+                [entry['name'], entry['video'], entry['status'], entry.get('frames'), entry.get('seconds'),
+                 possession.get('1'), possession.get('2')]
+                + [formations.get(str(team_id), {}).get(label) for team_id in TEAM_IDS for label in labels]
+                + [entry.get('error')]
+            )
+
+
+def run_batch(videos, output_dir, model_path='models/best.pt', workers=1, chunk_size=100, timeout=None,
+              render_images=True, force=False, keep_checkpoints=False, threads=None, analysis_profile=None):
+    """
+    Analyze many matches across a pool of worker processes, each keeping its model loaded
+    threads is each worker's thread budget, an equal share of the CPUs when None
+    analysis_profile (see utils.ANALYSIS_PROFILE) has matches above it analyzed from a transcoded copy
+    Matches with valid cached results are skipped unless force is set
+    Returns (entries, throughput), also written to output_dir/index.json and index.csv
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    threads = threads or max(1, get_cpu_count() // workers)
+
+    entries = {}
+    jobs = []
+    for video_path, name in zip(videos, get_match_names(videos)):
+        match_dir = os.path.join(output_dir, name)
+        if not os.path.exists(video_path):
+            entries[name] = {'name': name, 'video': video_path, 'status': 'failed', 'error': 'Video not found'}
+            continue
+
+        fingerprint = get_fingerprint(video_path, model_path, analysis_profile, render_images)
+        cached = None if force else load_cached_entry(match_dir, fingerprint)
+        if cached is not None:
+            cached['status'] = 'cached'
+            entries[name] = cached
+            continue
+
+        jobs.append({
+            'name': name,
+            'video_path': video_path,
+            'match_dir': match_dir,
+            'fingerprint': fingerprint,
+            'model_path': model_path,
+            'chunk_size': chunk_size,
+            'timeout': timeout,
+            'render_images': render_images,
+            'keep_checkpoints': keep_checkpoints,
+            'threads': threads,
+            'analysis_profile': analysis_profile,
+        })
+
+    print(f"{len(videos)} matches: {len(entries)} cached or missing, {len(jobs)} to process on {workers} workers")
+
+    # longest matches first so a big one doesn't start last and hold up the whole batch
+    jobs.sort(key=lambda job: os.path.getsize(job['video_path']), reverse=True)
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(model_path, threads)) as executor:
+            futures = [executor.submit(process_match, job) for job in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                entry = future.result()
+                entries[entry['name']] = entry
+                detail = entry['error'] if entry['status'] == 'failed' else \
+                    f"{entry['frames']} frames in {entry['seconds']:.1f}s"
+                print(f"[{done}/{len(jobs)}] {entry['name']}: {entry['status']} ({detail})")
+
+    seconds = time.perf_counter() - start
+    processed = [entry for entry in entries.values() if entry['status'] == 'completed']
+    frames = sum(entry['frames'] for entry in processed)
+    throughput = {
+        'matches': len(videos),
+        'processed': len(processed),
+        'cached': sum(1 for entry in entries.values() if entry['status'] == 'cached'),
+        'failed': sum(1 for entry in entries.values() if entry['status'] == 'failed'),
+        'workers': workers,
+        'threads_per_worker': threads,
+        'seconds': round(seconds, 3),
+        'frames': frames,
+        'frames_per_second': round(frames / seconds, 2) if seconds > 0 else None,
+        'matches_per_hour': round(3600 * len(processed) / seconds, 2) if seconds > 0 else None,
+    }
+
+    # index follows the input order
+    ordered = [entries[name] for name in get_match_names(videos)]
+    write_index(output_dir, ordered, throughput)
+    return ordered, throughput
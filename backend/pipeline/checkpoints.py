@@ -0,0 +1,37 @@
+import os
+import pickle
+import shutil
+
+class CheckpointStore:
+    """
+    Pickle checkpoints for pipeline stages, one file per stage or chunk
+    Files are written to a temp path and renamed so an interrupted job never
+    leaves a half-written checkpoint behind
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.pkl')
+
+    def has(self, name):
+        return os.path.exists(self.path(name))
+
+    def load(self, name):
+        with open(self.path(name), 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path(name) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(tmp_path, self.path(name))
+
+    def remove(self, name):
+        if self.has(name):
+            os.remove(self.path(name))
+
+    def clear(self):
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
@@ -0,0 +1,605 @@
+import os
+import time
+import pickle
+from itertools import islice
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_video_info, read_video_chunks, read_video_frames, ImageWriter, BackgroundVideoWriter, \
+    ThreadBudget, transcode_video, needs_transcode, get_analysis_frame, get_pixel_scale
+from team_assigner import TeamAssigner, INHERIT_DISTANCE
+from formation_analyzer import FormationAnalyzer, FormationSmoother, TacticalMetrics, HeatmapBuilder, \
+    get_team_formations, draw_heatmap_diagram
+from player_ball_assigner import PossessionEngine, EventExtractor, MAX_PLAYER_BALL_DISTANCE
+from video_annotator import VideoAnnotator
+from camera_movement_estimator import CameraMovementEstimator, add_adjusted_positions
+from instrumentation import Instrumentation, activate, track_stage
+from .checkpoints import CheckpointStore
+from .results import RESULTS_FILENAME, TRACKS_FILENAME, METRICS_FILENAME, HEATMAPS_FILENAME, EVENTS_FILENAME, \
+    RUNS_FILENAME, build_results, write_results, write_track_table, write_metrics_table, write_heatmaps, \
+    write_event_table, get_render_size
+
+STAGES = ['ingest', 'decode', 'detect', 'track', 'camera', 'team', 'formation', 'render', 'video']
+
+VIDEO_FILENAME = 'annotated_video.mp4'
+
+# Transcoded copy of the input analyzed instead of it, kept with the checkpoints
+ANALYSIS_VIDEO_FILENAME = 'analysis.mp4'
+
+TEAM_IDS = (1, 2)
+
+
+class PipelineTimeout(TimeoutError):
+    """Raised between chunks once the job runs past its timeout or a stage past its budget, checkpoints are kept"""
+
+
+class PipelineCancelled(Exception):
+    """Raised at the next check once the cancel file exists, checkpoints are kept"""
+
+
+@dataclass
+class PipelineConfig:
+    video_path: str
+    model_path: str = 'models/best.pt'
+    output_dir: str = 'output_images'
+    checkpoint_dir: str = 'checkpoints'
+    # Precomputed tracks pickle (same format as Tracker stubs), skips detect and track when it exists
+    tracks_stub_path: Optional[str] = None
+    # Frames per checkpointed chunk, an interrupted job resumes at the last finished chunk
+    chunk_size: int = 100
+    # Side of the tile searched for the ball around its predicted position when the full-frame
+    # detection misses it (trackers.BallTracker), None keeps the full-frame ball detections only
+    ball_tile_size: Optional[int] = 320
+    # Transcode the input to this analysis profile (utils.ANALYSIS_PROFILE keys: max_height, max_fps,
+    # keyframe_interval) before anything is decoded, every stage but the annotated video then reads the
+    # smaller copy. None analyzes the input as it is
+    analysis_profile: Optional[Dict[str, float]] = None
+    # Input already transcoded by the caller (the API does it at upload), analyzed instead of video_path
+    analysis_video_path: Optional[str] = None
+    # Address of a shared trackers.InferenceServer, detection runs there instead of on the job's own
+    # model. Results are the same either way
+    inference_address: Optional[str] = None
+    # Express positions in a pitch-anchored frame that follows camera pans (optical flow on
+    # downscaled frames) before formations are analyzed, False uses raw image coordinates
+    camera_compensation: bool = True
+    # Set False to ignore existing checkpoints and start over
+    resume: bool = True
+    # Seconds before the job stops with PipelineTimeout, None for no limit
+    timeout: Optional[float] = None
+    # Seconds each stage may take, e.g. {'detect': 300}, stages not listed have no budget
+    stage_budgets: Optional[Dict[str, float]] = None
+    # The job stops with PipelineCancelled soon after this file is created
+    cancel_path: Optional[str] = None
+    # Write full size PNG diagrams, results.json is always written and diagrams can be rendered from it
+    render_images: bool = True
+    # Worker processes for formation analysis, one (team, window) each; 1 analyzes in-process,
+    # None uses one per window up to the CPU count. Results are the same either way
+    formation_workers: Optional[int] = 1
+    # Also estimate formations over the whole match, once per window of this many frames from
+    # smoothed track positions (results.json formation_timeline), None to skip
+    formation_window: Optional[int] = None
+    # Also write the match video with players, ball, formation and possession drawn on it
+    render_video: bool = False
+    # FourCC of the annotated video, mp4v plays in most players, avc1 needs an OpenCV build with H.264
+    video_codec: str = 'mp4v'
+    # Threads this job's torch, OpenMP/BLAS and OpenCV pools may use, given to each stage's main library
+    # (utils.STAGE_LIBRARIES) while the others get one, None leaves the libraries their default pools
+    threads: Optional[int] = None
+    # Threads encoding and writing diagram PNGs in the background
+    image_writers: int = 4
+    # Write a sampled profile of every stage here as <stage>.folded (flamegraph input), None to skip
+    profile_dir: Optional[str] = None
+
+
+class Pipeline:
+    """
+    Staged match analysis: ingest -> decode -> detect -> track -> camera -> team -> formation -> render -> video
+    Every stage writes a checkpoint to config.checkpoint_dir and is skipped when its
+    checkpoint already exists, detect and team checkpoint every chunk of frames
+    Per-stage timings are kept in self.instrumentation, including for a failed run
+    A Tracker can be passed in to reuse its loaded model across videos
+    """
+    def __init__(self, config, tracker=None):
+        self.config = config
+        self.checkpoints = CheckpointStore(config.checkpoint_dir)
+        self.instrumentation = Instrumentation(profile_dir=config.profile_dir)
+        self.tracker = tracker
+        self.thread_budget = None if config.threads is None else ThreadBudget(config.threads)
+        self.stage_name = None
+        self.deadline = None
+        self.stage_deadline = None
+        self.stage_budget = None
+        # video the analysis stages decode, set by ingest
+        self.analysis_path = config.video_path
+        # pixel thresholds (tuned on the input's resolution) are multiplied by this, set by decode
+        self.pixel_scale = 1.0
+
+    def run(self):
+        """
+        Run (or resume) every stage
+        Returns dict with video info, formations per team, possession, written image filenames
+        and per-stage metrics
+        """
+        if self.config.timeout is not None:
+            self.deadline = time.monotonic() + self.config.timeout
+
+        # components (Tracker, TeamAssigner, FormationAnalyzer) report to the active instrumentation
+        previous = activate(self.instrumentation)
+        try:
+            self.prepare_checkpoints()
+
+            with self.stage('ingest') as stage:
+                if self.ingest() is not None:
+                    stage.add(1)
+            with self.stage('decode') as stage:
+                video_info = self.decode()
+                self.pixel_scale = get_pixel_scale(video_info)
+                stage.add(video_info['frame_count'])
+            with self.stage('detect'):
+                self.detect()
+            with self.stage('track') as stage:
+                tracks = self.track()
+                stage.add(len(tracks['players']))
+            with self.stage('camera') as stage:
+                camera_movement = self.camera(tracks)
+                if camera_movement is not None:
+                    stage.add(len(camera_movement))
+            with self.stage('team') as stage:
+                tracks = self.team(tracks)
+                stage.add(len(tracks['players']))
+            with self.stage('formation') as stage:
+                analysis = self.formation(tracks, video_info, camera_movement)
+                stage.add(len(tracks['players']))
+            with self.stage('render') as stage:
+                outputs = self.render(tracks, analysis, video_info)
+                stage.add(len(outputs['images']) + len(outputs['data_files']))
+            with self.stage('video') as stage:
+                video_file = self.video(tracks, analysis, video_info)
+                if video_file is not None:
+                    stage.add(len(tracks['players']))
+        finally:
+            activate(previous)
+            if self.tracker is not None:
+                self.tracker.close()
+
+        return {
+            'video': video_info,
+            'frames': len(tracks['players']),
+            'formations': analysis['formations'],
+            'formation_timeline': analysis.get('formation_timeline'),
+            'tactical_metrics': analysis['tactical_metrics'],
+            'heatmaps': analysis['heatmaps'],
+            'events': analysis['events'],
+            'possession': analysis['possession'],
+            'images': outputs['images'],
+            'data_files': outputs['data_files'],
+            'video_file': video_file,
+            'metrics': self.instrumentation.summary(),
+        }
+
+    @contextmanager
+    def stage(self, name):
+        self.stage_budget = (self.config.stage_budgets or {}).get(name)
+        self.stage_deadline = None if self.stage_budget is None else time.monotonic() + self.stage_budget
+        self.stage_name = name
+        if self.thread_budget is not None:
+            self.thread_budget.apply(name)
+        with self.instrumentation.stage(name, profile=True) as stage:
+            self.check_stop(name)
+            yield stage
+
+    def prepare_checkpoints(self):
+        """Drop checkpoints left by a different video or configuration"""
+        video_stat = os.stat(self.config.video_path)
+        fingerprint = {
+            'video_path': os.path.abspath(self.config.video_path),
+            'video_size': video_stat.st_size,
+            'video_mtime': video_stat.st_mtime,
+            'model_path': self.config.model_path,
+            'tracks_stub_path': self.config.tracks_stub_path,
+            'chunk_size': self.config.chunk_size,
+            'ball_tile_size': self.config.ball_tile_size,
+            'camera_compensation': self.config.camera_compensation,
+            'analysis_profile': self.config.analysis_profile,
+            'analysis_video_path': self.config.analysis_video_path,
+        }
+
+        if not self.config.resume or not self.checkpoints.has('manifest') \
+                or self.checkpoints.load('manifest') != fingerprint:
+            self.checkpoints.clear()
+        self.checkpoints.save('manifest', fingerprint)
+
+    def check_stop(self, stage):
+        """
+        Called between batches, chunks and frames: stops the job when it was cancelled or
+        ran out of time, finished work is already checkpointed
+        """
+        if self.config.cancel_path is not None and os.path.exists(self.config.cancel_path):
+            raise PipelineCancelled(f"Pipeline cancelled during {stage} stage")
+        now = time.monotonic()
+        if self.deadline is not None and now > self.deadline:
+            raise PipelineTimeout(f"Pipeline timed out during {stage} stage")
+        if self.stage_deadline is not None and now > self.stage_deadline:
+            raise PipelineTimeout(f"{stage} stage went over its {self.stage_budget:g}s budget")
+
+    def get_tracker(self):
+        if self.tracker is None:
+            # ultralytics (and torch) are only imported when there is something to detect or track
+            from trackers import Tracker
+            self.tracker = Tracker(self.config.model_path, inference_address=self.config.inference_address)
+            if self.thread_budget is not None:
+                # torch came in with the import, size its pool for the running stage
+                self.thread_budget.apply(self.stage_name)
+        return self.tracker
+
+    def scale_pixels(self, pixels):
+        """A pixel threshold for the analyzed video, e.g. 320 px of a 1080p input is 213 px of its 720p copy"""
+        return pixels * self.pixel_scale
+
+    def use_tracks_stub(self):
+        return self.config.tracks_stub_path is not None and os.path.exists(self.config.tracks_stub_path)
+
+    def chunk_name(self, stage, chunk_num):
+        return f'{stage}_{chunk_num:05d}'
+
+    def ingest(self):
+        """
+        Point the analysis at a copy of the input in the analysis profile: the caller's
+        (config.analysis_video_path) or one transcoded here, the input itself when there is no
+        profile, it is already within it or tracks come from a stub (recorded on the input)
+        Returns the analysis video path, None when the input is analyzed as it is
+        """
+        if self.checkpoints.has('ingest'):
+            path = self.checkpoints.load('ingest')['path']
+            if path is None or os.path.exists(path):
+                self.analysis_path = path or self.config.video_path
+                return path
+
+        path = None
+        if self.use_tracks_stub():
+            pass
+        elif self.config.analysis_video_path is not None and os.path.exists(self.config.analysis_video_path):
+            path = self.config.analysis_video_path
+        elif self.config.analysis_profile is not None \
+                and needs_transcode(get_video_info(self.config.video_path), self.config.analysis_profile):
+            path = os.path.join(self.config.checkpoint_dir, ANALYSIS_VIDEO_FILENAME)
+            os.makedirs(self.config.checkpoint_dir, exist_ok=True)
+            info = transcode_video(self.config.video_path, path, self.config.analysis_profile,
+                                   before_frame=lambda: self.check_stop('ingest'))
+            source = info['source']
+            print(f"Transcoded {source['width']}x{source['height']} at {source['fps']:g} fps to "
+                  f"{info['width']}x{info['height']} at {info['fps']:g} fps for analysis")
+
+        self.checkpoints.save('ingest', {'path': path})
+        self.analysis_path = path or self.config.video_path
+        return path
+
+    def decode(self):
+        """
+        Video info of the analyzed video, with 'source' holding the input's when it was transcoded
+        (diagrams and the annotated video are drawn at the input's size)
+        """
+        if self.checkpoints.has('decode'):
+            return self.checkpoints.load('decode')
+
+        video_info = get_video_info(self.analysis_path)
+        if self.analysis_path != self.config.video_path:
+            video_info['source'] = get_video_info(self.config.video_path)
+        self.checkpoints.save('decode', video_info)
+        return video_info
+
+    def get_ball_tracker(self, resume_chunk):
+        from trackers import BallTracker
+        ball_tracker = BallTracker(self.get_tracker(), tile_size=int(round(self.scale_pixels(self.config.ball_tile_size))))
+        if resume_chunk:
+            ball_tracker.set_state(self.checkpoints.load(self.chunk_name('ball', resume_chunk - 1))['state'])
+        return ball_tracker
+
+    def detect(self):
+        """
+        Detect objects chunk by chunk, each chunk's supervision detections are checkpointed,
+        and the ball boxes of the tiled ball search when it is on
+        """
+        if self.use_tracks_stub() or self.checkpoints.has('detect'):
+            return
+
+        chunk_size = self.config.chunk_size
+
+        # chunks are written in order, resume after the last finished one
+        resume_chunk = 0
+        while self.checkpoints.has(self.chunk_name('detect', resume_chunk)):
+            resume_chunk += 1
+
+        if resume_chunk:
+            print(f"Resuming detection at frame {resume_chunk * chunk_size}")
+
+        ball_tracker = None
+        num_chunks = resume_chunk
+        for first_frame, frames in read_video_chunks(self.analysis_path, chunk_size,
+                                                     resume_chunk * chunk_size):
+            self.check_stop('detect')
+
+            tracker = self.get_tracker()
+            detections = [
+                tracker.to_supervision(detection)
+                for detection in tracker.detect_frames(frames, before_batch=lambda: self.check_stop('detect'))
+            ]
+
+            chunk_num = first_frame // chunk_size
+            if self.config.ball_tile_size is not None:
+                if ball_tracker is None:
+                    ball_tracker = self.get_ball_tracker(resume_chunk)
+                with track_stage('ball_tracker.update', items=len(frames)):
+                    balls = [
+                        ball_tracker.update(first_frame + i, frame, detection_supervision, cls_names_inv)
+                        for i, (frame, (detection_supervision, cls_names_inv)) in enumerate(zip(frames, detections))
+                    ]
+                # the ball chunk goes first, a detect chunk on disk always has its ball chunk
+                self.checkpoints.save(self.chunk_name('ball', chunk_num),
+                                      {'bboxes': balls, 'state': ball_tracker.get_state()})
+            self.checkpoints.save(self.chunk_name('detect', chunk_num), detections)
+            num_chunks += 1
+
+        if ball_tracker is not None:
+            stats = ball_tracker.stats
+            print(f"Ball search: {stats['full_frame']} full-frame and {stats['tile']} tile detections "
+                  f"in {stats['frames']} frames, {stats['tile_searches']} tile searches, track lost {stats['lost']} times")
+
+        self.checkpoints.save('detect', {'num_chunks': num_chunks})
+
+    def track(self):
+        if self.checkpoints.has('track'):
+            return self.checkpoints.load('track')
+
+        if self.use_tracks_stub():
+            with open(self.config.tracks_stub_path, 'rb') as f:
+                tracks = pickle.load(f)
+        else:
+            tracks = {
+                "players": [],
+                "referees": [],
+                "ball": []
+            }
+
+            # ByteTrack is cheap next to detection, so it replays every chunk in one go
+            tracker = self.get_tracker()
+            tracker.reset_tracking()
+            for chunk_num in range(self.checkpoints.load('detect')['num_chunks']):
+                self.check_stop('track')
+                detections = self.checkpoints.load(self.chunk_name('detect', chunk_num))
+                balls = None
+                if self.config.ball_tile_size is not None:
+                    balls = self.checkpoints.load(self.chunk_name('ball', chunk_num))['bboxes']
+                for i, (detection_supervision, cls_names_inv) in enumerate(detections):
+                    tracker.add_frame_tracks(tracks, detection_supervision, cls_names_inv)
+                    if balls is not None:
+                        # the tiled ball search replaces the full-frame ball detections
+                        tracks["ball"][-1] = {} if balls[i] is None else {1: {"bbox": balls[i]}}
+
+        self.checkpoints.save('track', tracks)
+        return tracks
+
+    def camera(self, tracks):
+        """
+        Camera offset per frame from sparse optical flow on downscaled frames (see
+        CameraMovementEstimator), None when camera compensation is off
+        """
+        if not self.config.camera_compensation:
+            return None
+        if self.checkpoints.has('camera'):
+            return self.checkpoints.load('camera')
+
+        estimator = CameraMovementEstimator()
+        frames = (frame for _, frame in islice(read_video_frames(self.analysis_path), len(tracks['players'])))
+        camera_movement = estimator.get_camera_movement(frames, tracks, before_frame=lambda: self.check_stop('camera'))
+
+        if len(camera_movement):
+            pan = camera_movement.max(axis=0) - camera_movement.min(axis=0)
+            print(f"Camera movement: {pan[0]:.0f} px horizontal and {pan[1]:.0f} px vertical pan, "
+                  f"features picked {estimator.redetections} times")
+        self.checkpoints.save('camera', camera_movement)
+        return camera_movement
+
+    def team(self, tracks):
+        """
+        Assign a team to every player id, crops are only taken on the frame an id first appears
+        and not at all for ids that take over the team of a track lost nearby
+        """
+        if self.checkpoints.has('team'):
+            return self.checkpoints.load('team')
+
+        num_frames = len(tracks['players'])
+        if self.checkpoints.has('team_progress'):
+            progress = self.checkpoints.load('team_progress')
+        else:
+            progress = {'frames_done': 0,
+                        'team_assigner': TeamAssigner(inherit_distance=self.scale_pixels(INHERIT_DISTANCE))}
+        team_assigner = progress['team_assigner']
+
+        # frames after the last new player id don't need decoding at all
+        seen_ids = set()
+        last_new_id_frame = 0
+        for frame_num, player_track in enumerate(tracks['players']):
+            if not seen_ids.issuperset(player_track):
+                seen_ids.update(player_track)
+                last_new_id_frame = frame_num
+
+        if progress['frames_done'] <= last_new_id_frame:
+            for first_frame, frames in read_video_chunks(self.analysis_path, self.config.chunk_size,
+                                                         progress['frames_done']):
+                for frame_num in range(first_frame, min(first_frame + len(frames), num_frames)):
+                    try:
+                        self.check_stop('team')
+                    except (PipelineCancelled, PipelineTimeout):
+                        # keep the frames of this chunk that are already done
+                        progress['frames_done'] = frame_num
+                        self.checkpoints.save('team_progress', progress)
+                        raise
+
+                    frame = frames[frame_num - first_frame]
+                    if frame_num == 0:
+                        team_assigner.assign_team_color(frame, tracks['players'][0])
+
+                    team_assigner.update_tracks(frame_num, tracks['players'][frame_num])
+                    for player_id, track in tracks['players'][frame_num].items():
+                        team_assigner.get_player_team(frame, track['bbox'], player_id)
+
+                progress['frames_done'] = first_frame + len(frames)
+                self.checkpoints.save('team_progress', progress)
+
+                if progress['frames_done'] > last_new_id_frame:
+                    break
+
+            print(f"Team assignment: {team_assigner.crop_count} crops, {team_assigner.inherited_count} ids inherited "
+                  f"a lost track's team, {team_assigner.evicted_count} ids evicted")
+
+        for player_track in tracks['players']:
+            for player_id, track in player_track.items():
+                team = team_assigner.get_known_team(player_id)
+                track['team'] = team
+                track['team_color'] = team_assigner.team_colors[team]
+
+        self.checkpoints.save('team', tracks)
+        return tracks
+
+    def formation(self, tracks, video_info, camera_movement=None):
+        if self.checkpoints.has('formation'):
+            analysis = self.checkpoints.load('formation')
+            if analysis.get('formation_window') == self.config.formation_window and 'events' in analysis:
+                return analysis
+            # analyzed with another window, the render and video stages have to write the new results too
+            self.checkpoints.remove('render')
+            self.checkpoints.remove('video')
+
+        # positions are normalized against the canvas the camera covered when they follow its pans
+        frame_width, frame_height = video_info['width'], video_info['height']
+        if camera_movement is not None:
+            frame_width, frame_height = add_adjusted_positions(tracks, camera_movement, frame_width, frame_height)
+
+        print("\nAnalyzing formations at first, middle, and last frames...")
+        formations = get_team_formations(tracks, TEAM_IDS, frame_width, frame_height,
+                                         workers=self.config.formation_workers, threads=self.config.threads)
+
+        possession = PossessionEngine(max_player_ball_distance=self.scale_pixels(MAX_PLAYER_BALL_DISTANCE)) \
+            .get_match_possession(tracks)
+        events = EventExtractor().get_match_events(tracks, possession, frame_width)
+
+        timeline = None
+        if self.config.formation_window:
+            print(f"Estimating formations every {self.config.formation_window} frames...")
+            timeline = FormationSmoother(window_frames=self.config.formation_window, team_ids=TEAM_IDS) \
+                .get_formations_over_time(tracks, frame_width, frame_height)
+
+        print("Computing tactical metrics for every frame...")
+        tactical_metrics = TacticalMetrics(frame_width, frame_height, team_ids=TEAM_IDS).get_match_metrics(tracks)
+
+        print("Building heatmaps...")
+        heatmaps = HeatmapBuilder(frame_width, frame_height, team_ids=TEAM_IDS)
+        heatmaps.update(tracks)
+
+        analysis = {'formations': formations, 'possession': possession,
+                    'formation_window': self.config.formation_window, 'formation_timeline': timeline,
+                    'tactical_metrics': tactical_metrics, 'heatmaps': heatmaps.get_heatmaps(), 'events': events}
+        self.checkpoints.save('formation', analysis)
+        return analysis
+
+    def render(self, tracks, analysis, video_info):
+        """
+        Write results.json, the Parquet track table and (unless disabled) per-team formation
+        diagrams and side-by-side comparisons to config.output_dir
+        Returns dict with the written image and data filenames
+        """
+        output_dir = self.config.output_dir
+        if self.checkpoints.has('render'):
+            outputs = self.checkpoints.load('render')
+            # rendered with images toggled the other way, write them (or the results without them) again
+            if outputs.get('render_images') == self.config.render_images and \
+                    all(os.path.exists(os.path.join(output_dir, filename))
+                        for filename in outputs['images'] + outputs['data_files']):
+                return outputs
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        data_files = [RESULTS_FILENAME]
+        write_results(build_results(analysis, video_info), os.path.join(output_dir, RESULTS_FILENAME))
+        if write_track_table(tracks, analysis['possession']['ball_holder'], os.path.join(output_dir, TRACKS_FILENAME)):
+            data_files.append(TRACKS_FILENAME)
+        if write_metrics_table(analysis['tactical_metrics'], os.path.join(output_dir, METRICS_FILENAME)):
+            data_files.append(METRICS_FILENAME)
+        write_heatmaps(analysis['heatmaps'], os.path.join(output_dir, HEATMAPS_FILENAME))
+        data_files.append(HEATMAPS_FILENAME)
+        for filename, name in ((EVENTS_FILENAME, 'events'), (RUNS_FILENAME, 'runs')):
+            if write_event_table(analysis['events'][name], os.path.join(output_dir, filename)):
+                data_files.append(filename)
+
+        images = []
+        if self.config.render_images:
+            formation_analyzer = FormationAnalyzer()
+            frame_width, frame_height = get_render_size(video_info)
+
+            # PNG encoding runs in the background while the next diagram is drawn
+            with ImageWriter(max_workers=self.config.image_writers) as writer:
+                diagrams = {}
+                for team_id in TEAM_IDS:
+                    for label, formation in analysis['formations'][team_id]:
+                        self.check_stop('render')
+                        diagram = formation_analyzer.draw_team_formation(formation, frame_width, frame_height, label)
+                        filename = f'team{team_id}_formation_{label.lower()}.png'
+                        writer.write(os.path.join(output_dir, filename), diagram)
+                        diagrams[team_id, label] = diagram
+                        images.append(filename)
+
+                # Create side-by-side comparisons for each time point
+                for label, _ in analysis['formations'][1]:
+                    combined = np.hstack([diagrams[1, label], diagrams[2, label]])
+                    filename = f'formations_comparison_{label.lower()}.png'
+                    writer.write(os.path.join(output_dir, filename), combined)
+                    images.append(filename)
+
+                for team_id in TEAM_IDS:
+                    diagram = draw_heatmap_diagram(analysis['heatmaps']['teams'][team_id], frame_width, frame_height,
+                                                   f"Team {team_id} heatmap")
+                    filename = f'team{team_id}_heatmap.png'
+                    writer.write(os.path.join(output_dir, filename), diagram)
+                    images.append(filename)
+
+        outputs = {'images': images, 'data_files': data_files, 'render_images': self.config.render_images}
+        self.checkpoints.save('render', outputs)
+        return outputs
+
+    def video(self, tracks, analysis, video_info):
+        """
+        Write the annotated match video to config.output_dir when config.render_video is set
+        Frames are decoded one at a time and drawn in place, encoding runs on a writer thread
+        behind a short queue so memory stays bounded on any match length
+        Returns the video filename, None when video output is off
+        """
+        if not self.config.render_video:
+            return None
+
+        path = os.path.join(self.config.output_dir, VIDEO_FILENAME)
+        if self.checkpoints.has('video') and os.path.exists(path):
+            return self.checkpoints.load('video')['video_file']
+
+        os.makedirs(self.config.output_dir, exist_ok=True)
+        # drawn on the input video: tracks of a transcoded copy are scaled up and each input
+        # frame shows the analysis frame it was reduced to
+        source = video_info.get('source', video_info)
+        annotator = VideoAnnotator(tracks, analysis['possession'], analysis['formations'],
+                                   analysis.get('formation_timeline'), scale=source['width'] / video_info['width'])
+        fps = source['fps'] or 25
+        frame_size = (source['width'], source['height'])
+
+        with BackgroundVideoWriter(path, fps, frame_size, codec=self.config.video_codec) as writer:
+            for source_frame, frame in read_video_frames(self.config.video_path):
+                self.check_stop('video')
+                frame_num = get_analysis_frame(source_frame, source['fps'], video_info['fps'])
+                with track_stage('video_annotator.draw', items=1):
+                    annotator.draw_frame(frame, frame_num)
+                writer.write(frame)
+
+        self.checkpoints.save('video', {'video_file': VIDEO_FILENAME})
+        return VIDEO_FILENAME
@@ -0,0 +1,341 @@
+import json
+import cv2
+import numpy as np
+import sys
+sys.path.append('../')
+from formation_analyzer import FormationAnalyzer, METRIC_NAMES, draw_heatmap_diagram
+from player_ball_assigner import get_event_counts
+
+RESULTS_FILENAME = 'results.json'
+TRACKS_FILENAME = 'tracks.parquet'
+METRICS_FILENAME = 'tactical_metrics.parquet'
+HEATMAPS_FILENAME = 'heatmaps.npz'
+EVENTS_FILENAME = 'events.parquet'
+RUNS_FILENAME = 'possession_runs.parquet'
+
+RESULTS_VERSION = 1
+
+
+def to_color(color):
+    return [int(round(float(c))) for c in color]
+
+
+def build_results(analysis, video_info):
+    """
+    Compact, JSON-serializable match result: normalized positions, line assignments,
+    formation labels, ball position and team color for every analyzed frame
+    """
+    formations = []
+    for team_id, team_formations in analysis['formations'].items():
+        for label, formation in team_formations:
+            line_of_player = {
+                player_id: line_num
+                for line_num, player_ids in formation['lines'].items()
+                for player_id in player_ids
+            }
+            formations.append({
+                'team': int(team_id),
+                'label': label,
+                'frame': int(formation['frame_num']),
+                'formation': formation['formation'],
+                'team_color': to_color(formation['team_color']),
+                'players': [
+                    {
+                        'id': int(player_id),
+                        'x': round(float(x), 2),
+                        'y': round(float(y), 2),
+                        'line': line_of_player.get(player_id),
+                    }
+                    for player_id, (x, y) in formation['positions'].items()
+                ],
+                'ball': None if formation['ball_position'] is None
+                        else [round(float(c), 2) for c in formation['ball_position']],
+            })
+
+    possession = analysis['possession']
+    results = {
+        'version': RESULTS_VERSION,
+        'video': video_info,
+        'possession': {
+            'percentages': {str(team): round(pct, 2) for team, pct in possession['possession_percentages'].items()},
+            'events': possession['events'],
+        },
+        'formations': formations,
+    }
+
+    if analysis.get('formation_timeline'):
+        results['formation_timeline'] = [
+            {
+                'team': int(team_id),
+                'start': int(formation['window'][0]),
+                'end': int(formation['window'][1]),
+                'formation': formation['formation'],
+                'players': [
+                    {'id': int(player_id), 'x': round(float(x), 2), 'y': round(float(y), 2)}
+                    for player_id, (x, y) in formation['positions'].items()
+                ],
+            }
+            for team_id, team_formations in analysis['formation_timeline'].items()
+            for formation in team_formations
+        ]
+
+    if analysis.get('tactical_metrics'):
+        # match averages, the per-frame series is in the metrics table
+        results['tactical_metrics'] = {
+            str(team_id): {
+                name: None if np.isnan(values).all() else round(float(np.nanmean(values)), 2)
+                for name, values in team_metrics.items()
+            }
+            for team_id, team_metrics in analysis['tactical_metrics'].items()
+            if team_id != 'frames'
+        }
+
+    if analysis.get('events'):
+        # counts per team, the events themselves are in the event table
+        results['events'] = {
+            str(team_id): counts for team_id, counts in get_event_counts(analysis['events']['events']).items()
+        }
+    return results
+
+
+def write_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, separators=(',', ':'))
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_track_table(tracks, ball_holder, path):
+    """
+    Full track table as Parquet, one row per detection:
+    frame, object, track_id, x1, y1, x2, y2, team, has_ball
+    Returns False when pyarrow isn't installed
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed, skipping track table")
+        return False
+
+    columns = {name: [] for name in ['frame', 'object', 'track_id', 'x1', 'y1', 'x2', 'y2', 'team', 'has_ball']}
+    for object_type, object_name in [('players', 'player'), ('referees', 'referee'), ('ball', 'ball')]:
+        for frame_num, frame_tracks in enumerate(tracks[object_type]):
+            for track_id, track in frame_tracks.items():
+                x1, y1, x2, y2 = track['bbox']
+                columns['frame'].append(frame_num)
+                columns['object'].append(object_name)
+                columns['track_id'].append(int(track_id))
+                columns['x1'].append(x1)
+                columns['y1'].append(y1)
+                columns['x2'].append(x2)
+                columns['y2'].append(y2)
+                columns['team'].append(int(track.get('team', 0)))
+                columns['has_ball'].append(object_type == 'players' and bool(ball_holder[frame_num] == track_id))
+
+    table = pa.table({
+        'frame': pa.array(columns['frame'], pa.int32()),
+        'object': pa.array(columns['object']).dictionary_encode(),
+        'track_id': pa.array(columns['track_id'], pa.int32()),
+        'x1': pa.array(columns['x1'], pa.float32()),
+        'y1': pa.array(columns['y1'], pa.float32()),
+        'x2': pa.array(columns['x2'], pa.float32()),
+        'y2': pa.array(columns['y2'], pa.float32()),
+        'team': pa.array(columns['team'], pa.int8()),
+        'has_ball': pa.array(columns['has_ball'], pa.bool_()),
+    })
+    pq.write_table(table, path, compression='zstd')
+    return True
+
+
+def write_metrics_table(metrics, path):
+    """
+    Tactical metrics time series as Parquet, one row per frame and team:
+    frame, team and every metric of METRIC_NAMES (float32, null where undefined)
+    Returns False when pyarrow isn't installed
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed, skipping metrics table")
+        return False
+
+    team_ids = [team_id for team_id in metrics if team_id != 'frames']
+    frames = np.arange(metrics['frames'], dtype=np.int32)
+    columns = {
+        'frame': pa.array(np.tile(frames, len(team_ids))),
+        'team': pa.array(np.repeat(np.array(team_ids, dtype=np.int8), len(frames))),
+    }
+    for name in METRIC_NAMES:
+        values = np.concatenate([metrics[team_id][name] for team_id in team_ids]).astype(np.float32)
+        columns[name] = pa.array(values, mask=np.isnan(values))
+
+    pq.write_table(pa.table(columns), path, compression='zstd')
+    return True
+
+
+def write_event_table(table, path):
+    """
+    Event or possession run table (EventExtractor) as Parquet, one row per event / run
+    Returns False when pyarrow isn't installed
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed, skipping event table")
+        return False
+
+    columns = {}
+    for name, values in table.items():
+        values = np.asarray(values)
+        if values.dtype.kind == 'U':
+            columns[name] = pa.array(values.tolist(), pa.string()).dictionary_encode()
+        elif values.dtype.kind == 'f':
+            columns[name] = pa.array(values.astype(np.float32), mask=np.isnan(values))
+        else:
+            columns[name] = pa.array(values.astype(np.int32))
+    pq.write_table(pa.table(columns), path, compression='zstd')
+    return True
+
+
+def load_event_table(path):
+    """Table written by write_event_table as {column: numpy array}, NaN for missing positions"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pq.read_table(path)
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name == 'type':
+            columns[name] = np.array(column.to_pylist(), dtype=str)
+        elif pa.types.is_floating(column.type):
+            columns[name] = column.to_numpy(zero_copy_only=False).astype(np.float64)
+        else:
+            columns[name] = column.to_numpy().astype(np.int64)
+    return columns
+
+
+def write_heatmaps(heatmaps, path):
+    """Heatmap grids (HeatmapBuilder.get_heatmaps) as a compressed .npz, frame counts per cell"""
+    team_ids = sorted(heatmaps['teams'])
+    np.savez_compressed(
+        path,
+        frames=heatmaps['frames'],
+        bins=np.array(heatmaps['bins']),
+        track_ids=heatmaps['track_ids'],
+        track_grids=heatmaps['track_grids'],
+        team_ids=np.array(team_ids),
+        team_grids=np.stack([heatmaps['teams'][team_id] for team_id in team_ids]),
+    )
+
+
+def load_heatmaps(path):
+    """Heatmaps written by write_heatmaps, in the HeatmapBuilder.get_heatmaps format"""
+    with np.load(path) as data:
+        return {
+            'frames': int(data['frames']),
+            'bins': tuple(int(b) for b in data['bins']),
+            'track_ids': data['track_ids'],
+            'track_grids': data['track_grids'],
+            'teams': {int(team_id): grid for team_id, grid in zip(data['team_ids'], data['team_grids'])},
+        }
+
+
+def get_heatmap_grid(heatmaps, name):
+    """Grid and title of a heatmap diagram: team1_heatmap or player12_heatmap (any track id)"""
+    kind = name[:-len('_heatmap')] if name.endswith('_heatmap') else ''
+    if kind.startswith('team') and kind[4:].isdigit() and int(kind[4:]) in heatmaps['teams']:
+        return heatmaps['teams'][int(kind[4:])], f"Team {kind[4:]} heatmap"
+    if kind.startswith('player') and kind[6:].isdigit():
+        rows = np.flatnonzero(heatmaps['track_ids'] == int(kind[6:]))
+        if len(rows):
+            grid = heatmaps['track_grids'][rows[0]]
+            return grid, f"Player {kind[6:]} heatmap ({int(grid.sum())} frames)"
+    raise KeyError(f"Unknown heatmap: {name}")
+
+
+def get_diagram_names(results):
+    """Diagram names available for results, same names as the PNGs the render stage writes"""
+    names = []
+    labels = []
+    for formation in results['formations']:
+        names.append(f"team{formation['team']}_formation_{formation['label'].lower()}")
+        if formation['label'] not in labels:
+            labels.append(formation['label'])
+    names += [f"formations_comparison_{label.lower()}" for label in labels]
+    return names
+
+
+def to_formation(entry):
+    """Rebuild a get_team_formation style dict from a results.json formation entry"""
+    lines = {}
+    for player in entry['players']:
+        if player['line'] is not None:
+            lines.setdefault(player['line'], []).append(player['id'])
+    return {
+        'frame_num': entry['frame'],
+        'formation': entry['formation'],
+        'positions': {player['id']: (player['x'], player['y']) for player in entry['players']},
+        'lines': lines,
+        'team_color': tuple(entry['team_color']),
+        'ball_position': None if entry['ball'] is None else tuple(entry['ball']),
+    }
+
+
+def get_render_size(video_info):
+    """(width, height) diagrams and the annotated video are drawn at: the input's, also when a smaller copy was analyzed"""
+    video = video_info.get('source', video_info)
+    return video['width'], video['height']
+
+
+def render_diagram(results, name, width=None, heatmaps=None):
+    """
+    Draw a formation diagram from results.json data
+    name is a team diagram (team1_formation_start) or a comparison (formations_comparison_start),
+    or with heatmaps (load_heatmaps) a team or player heatmap (team1_heatmap, player12_heatmap)
+    width defaults to the size of the rendered PNGs and the height keeps the video aspect ratio
+    """
+    video_width, video_height = get_render_size(results['video'])
+    formation_analyzer = FormationAnalyzer()
+
+    def get_height(diagram_width):
+        return max(1, round(diagram_width * video_height / video_width))
+
+    entries = {
+        f"team{entry['team']}_formation_{entry['label'].lower()}": entry
+        for entry in results['formations']
+    }
+
+    if heatmaps is not None and name.endswith('_heatmap'):
+        grid, title = get_heatmap_grid(heatmaps, name)
+        diagram_width = width or video_width
+        return draw_heatmap_diagram(grid, diagram_width, get_height(diagram_width), title)
+
+    if name in entries:
+        entry = entries[name]
+        diagram_width = width or video_width
+        return formation_analyzer.draw_team_formation(to_formation(entry), diagram_width,
+                                                      get_height(diagram_width), entry['label'])
+
+    if name.startswith('formations_comparison_'):
+        label = name[len('formations_comparison_'):]
+        team_entries = [entries.get(f"team{team_id}_formation_{label}") for team_id in (1, 2)]
+        if all(team_entries):
+            # width is for the combined image, each team gets half
+            half_width = max(1, width // 2) if width else video_width
+            return np.hstack([
+                formation_analyzer.draw_team_formation(to_formation(entry), half_width,
+                                                       get_height(half_width), entry['label'])
+                for entry in team_entries
+            ])
+
+    raise KeyError(f"Unknown diagram: {name}")
+
+
+def save_diagram(results, name, path, width=None, heatmaps=None):
+    cv2.imwrite(str(path), render_diagram(results, name, width, heatmaps))
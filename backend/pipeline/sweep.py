@@ -0,0 +1,250 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_cpu_count, get_frame_bboxes, get_track_teams, get_ball_positions, init_worker_threads, \
+    get_pixel_scale
+from formation_analyzer import FormationAnalyzer, FORMATIONS, PERSPECTIVE, slice_tracks
+from formation_analyzer.formation_pool import get_pool_context
+from player_ball_assigner import PossessionEngine, MAX_PLAYER_BALL_DISTANCE
+from camera_movement_estimator import add_adjusted_positions
+from .checkpoints import CheckpointStore
+from .pipeline import TEAM_IDS
+
+# Analysis settings a sweep can vary: name -> (type, default)
+# formations names a template set, 'default' is FORMATIONS, others come from a templates file
+# max_player_ball_distance is in pixels of the input video, like the pipeline's threshold
+SWEEP_PARAMETERS = {
+    'formations': (str, 'default'),
+    'perspective_max_range': (float, PERSPECTIVE['max_range']),
+    'perspective_spread': (float, PERSPECTIVE['spread']),
+    'perspective_min_range': (float, PERSPECTIVE['min_range']),
+    'max_player_ball_distance': (float, MAX_PLAYER_BALL_DISTANCE),
+    'min_hold_frames': (int, 5),
+}
+
+# Data shared with the sweep workers, set by init_sweep_worker
+sweep_data = None
+
+
+class SharedArrays:
+    """
+    Numpy arrays copied once into shared memory blocks, so every worker maps the same pages
+    instead of receiving its own pickled copy. Workers attach() to get read-only views
+    The creating process closes and unlinks the blocks with release()
+    """
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks[name] = block
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(specs):
+        """Read-only views of the arrays in specs, returns (arrays, blocks), keep the blocks open while in use"""
+        arrays = {}
+        blocks = []
+        for name, (block_name, shape, dtype) in specs.items():
+            block = SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            array.flags.writeable = False
+            arrays[name] = array
+            blocks.append(block)
+        return arrays, blocks
+
+    def release(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+
+def load_cached_tracks(checkpoint_dir, camera_compensation=True):
+    """
+    Tracks with team assignments from a pipeline run's checkpoints (team stage finished)
+    Returns (tracks, video_info, frame_width, frame_height), positions are camera-compensated
+    and normalized against the camera canvas when the camera checkpoint exists, like the formation stage
+    """
+    checkpoints = CheckpointStore(checkpoint_dir)
+    if not checkpoints.has('team') or not checkpoints.has('decode'):
+        raise FileNotFoundError(f"No team assignments in {checkpoint_dir}, run main.py on the video first")
+
+    tracks = checkpoints.load('team')
+    video_info = checkpoints.load('decode')
+    frame_width, frame_height = video_info['width'], video_info['height']
+    if camera_compensation and checkpoints.has('camera'):
+        frame_width, frame_height = add_adjusted_positions(tracks, checkpoints.load('camera'),
+                                                           frame_width, frame_height)
+    return tracks, video_info, frame_width, frame_height
+
+
+def parse_parameter(value):
+    """NAME=V1,V2,... from the command line, returns (name, values) with values of the parameter's type"""
+    name, _, values = value.partition('=')
+    if name not in SWEEP_PARAMETERS or not values:
+        raise ValueError(f"Expected NAME=V1,V2,... with a name from {', '.join(SWEEP_PARAMETERS)}, got {value}")
+    value_type = SWEEP_PARAMETERS[name][0]
+    return name, [value_type(v) for v in values.split(',')]
+
+
+def get_grid(values):
+    """
+    Every combination of the swept values ({name: [values]}), other parameters at their defaults
+    Returns list of {name: value} configurations covering all of SWEEP_PARAMETERS
+    """
+    names = [name for name in SWEEP_PARAMETERS if name in values]
+    defaults = {name: default for name, (_, default) in SWEEP_PARAMETERS.items()}
+    return [{**defaults, **dict(zip(names, combination))}
+            for combination in itertools.product(*(values[name] for name in names))]
+
+
+def init_sweep_worker(specs, windows, frame_width, frame_height, template_sets, pixel_scale, threads):
+    """Process pool initializer: map the shared arrays and keep the formation windows for every configuration"""
+    global sweep_data
+    if threads is not None:
+        init_worker_threads(threads)
+    arrays, blocks = SharedArrays.attach(specs)
+    sweep_data = {
+        'arrays': arrays,
+        'blocks': blocks,
+        'windows': windows,
+        'frame_width': frame_width,
+        'frame_height': frame_height,
+        'template_sets': template_sets,
+        'pixel_scale': pixel_scale,
+    }
+
+
+def evaluate(config):
+    """Formations and possession for one configuration, runs in a worker on sweep_data"""
+    start = time.perf_counter()
+    formation_analyzer = FormationAnalyzer(
+        formations=sweep_data['template_sets'][config['formations']],
+        perspective={
+            'max_range': config['perspective_max_range'],
+            'spread': config['perspective_spread'],
+            'min_range': config['perspective_min_range'],
+        },
+    )
+
+    formations = {team_id: {} for team_id in TEAM_IDS}
+    for team_id, label, window_tracks, offset, candidate_frames in sweep_data['windows']:
+        frame_num = formation_analyzer.get_best_frame_for_formation(window_tracks, team_id, candidate_frames)
+        formation = formation_analyzer.get_team_formation(window_tracks, team_id, sweep_data['frame_width'],
+                                                          sweep_data['frame_height'], frame_num)
+        formations[team_id][label] = {'frame': frame_num + offset, 'formation': formation['formation']}
+
+    arrays = sweep_data['arrays']
+    possession_engine = PossessionEngine(min_hold_frames=config['min_hold_frames'],
+                                         max_player_ball_distance=config['max_player_ball_distance'] *
+                                         sweep_data['pixel_scale'])
+    possession = possession_engine.get_possession(arrays['frame_ids'], arrays['bboxes'], arrays['track_ids'],
+                                                  arrays['track_teams'], arrays['ball_positions'])
+
+    return {
+        'config': config,
+        'formations': formations,
+        'possession': {team_id: round(pct, 2) for team_id, pct in possession['possession_percentages'].items()},
+        'possession_changes': len(possession['events']),
+        'turnovers': sum(event['turnover'] for event in possession['events']),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_sweep(tracks, frame_width, frame_height, grid, template_sets=None, workers=None, threads=None,
+              pixel_scale=1.0):
+    """
+    Evaluate every configuration of grid (see get_grid) on one match's tracks
+    The match arrays possession needs are built once and shared read-only with the workers
+    through shared memory, formation windows are sliced once and sent to each worker once
+    rather than per configuration
+    workers None uses one per configuration up to the CPU count, 1 runs in-process
+    threads (the CPU count when None) is shared out between the workers
+    pixel_scale (get_pixel_scale) maps pixel settings onto tracks of a transcoded copy
+    Returns one result per configuration, in grid order
+    """
+    template_sets = {'default': FORMATIONS, **(template_sets or {})}
+    unknown = {config['formations'] for config in grid} - set(template_sets)
+    if unknown:
+        raise ValueError(f"Unknown formation template sets: {', '.join(sorted(unknown))}")
+
+    windows = []
+    for team_id in TEAM_IDS:
+        for label, candidate_frames in FormationAnalyzer().get_formation_windows(tracks):
+            window_tracks, offset = slice_tracks(tracks, candidate_frames)
+            windows.append((team_id, label, window_tracks, offset, [f - offset for f in candidate_frames]))
+
+    frame_ids, bboxes, teams = get_frame_bboxes(tracks, 'players')
+    track_ids, track_teams = get_track_teams(frame_ids, teams)
+    shared = SharedArrays({
+        'frame_ids': frame_ids,
+        'bboxes': bboxes,
+        'track_ids': track_ids,
+        'track_teams': track_teams,
+        'ball_positions': get_ball_positions(tracks),
+    })
+    del frame_ids, bboxes, teams
+
+    if workers is None:
+        workers = min(len(grid), get_cpu_count())
+    initargs = (shared.specs, windows, frame_width, frame_height, template_sets, pixel_scale)
+    try:
+        if workers <= 1:
+            init_sweep_worker(*initargs, None)
+            try:
+                return [evaluate(config) for config in grid]
+            finally:
+                for block in sweep_data['blocks']:
+                    block.close()
+
+        worker_threads = max(1, (threads or get_cpu_count()) // workers)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_pool_context(),
+                                 initializer=init_sweep_worker, initargs=initargs + (worker_threads,)) as executor:
+            return list(executor.map(evaluate, grid))
+    finally:
+        shared.release()
+
+
+def get_report_rows(results):
+    """
+    Side-by-side table of sweep results: the swept parameters (those that differ between
+    configurations), each team's formation per window and the possession outcome
+    Returns (header, rows)
+    """
+    if not results:
+        return [], []
+    swept = [name for name in SWEEP_PARAMETERS if len({str(r['config'][name]) for r in results}) > 1]
+    labels = list(results[0]['formations'][TEAM_IDS[0]])
+
+    header = swept + [f"team{team_id}_{label.lower()}" for team_id in TEAM_IDS for label in labels] + \
+        [f"possession_{team_id}" for team_id in TEAM_IDS] + ['changes', 'turnovers']
+    rows = [
+        [result['config'][name] for name in swept] +
+        [result['formations'][team_id][label]['formation'] for team_id in TEAM_IDS for label in labels] +
+        [result['possession'][team_id] for team_id in TEAM_IDS] +
+        [result['possession_changes'], result['turnovers']]
+        for result in results
+    ]
+    return header, rows
+
+
+def write_sweep(results, path):
+    """Sweep results as JSON (team ids as strings)"""
+    serializable = [
+        {**result,
+         'formations': {str(team_id): windows for team_id, windows in result['formations'].items()},
+         'possession': {str(team_id): pct for team_id, pct in result['possession'].items()}}
+        for result in results
+    ]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(serializable, f, indent=2)
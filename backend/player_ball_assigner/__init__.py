@@ -1 +1,3 @@
-from .player_ball_assigner import PlayerBallAssigner
\ No newline at end of file
+from .player_ball_assigner import PlayerBallAssigner, MAX_PLAYER_BALL_DISTANCE
+from .possession_engine import PossessionEngine
+from .event_extractor import EventExtractor, EVENT_TYPES, EVENT_COLUMNS, RUN_COLUMNS, get_event_counts
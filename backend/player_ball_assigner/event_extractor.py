@@ -0,0 +1,138 @@
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_ball_positions
+from instrumentation import track_stage
+
+EVENT_TYPES = ['pass', 'switch', 'turnover']
+
+# Columns of the possession run table (one row per spell of one player holding the ball)
+RUN_COLUMNS = ['player', 'team', 'start', 'end', 'first_touch', 'last_touch',
+               'first_x', 'first_y', 'last_x', 'last_y']
+
+# Columns of the event table
+EVENT_COLUMNS = ['type', 'from_player', 'to_player', 'from_team', 'to_team',
+                 'start_frame', 'end_frame', 'start_x', 'start_y', 'end_x', 'end_y', 'distance']
+
+
+class EventExtractor:
+    """
+    Passes, long-ball switches and turnovers for a whole match from the possession arrays
+    (PossessionEngine.get_match_possession) and the ball trajectory, in two linear passes:
+      - get_possession_runs() run-length encodes the ball holder into spells, each with the
+        frames the holder was actually touching the ball first and last
+      - get_events() pairs every spell with the next one: same team within max_pass_frames is a
+        pass (a switch when it is long and crosses the pitch), another team is a turnover
+    The run table is small (a few thousand rows for a match), so events can be recomputed from it
+    with other thresholds in well under a millisecond
+    Positions are in units of 1% of the frame (canvas) width on both axes, like TacticalMetrics
+    """
+    def __init__(self, max_pass_frames=75, long_ball_distance=25.0, switch_width=20.0):
+        # ball in flight longer than this between two teammates is a loose ball, not a pass
+        self.max_pass_frames = max_pass_frames
+        # a switch is a pass covering long_ball_distance, switch_width of it across the pitch
+        self.long_ball_distance = long_ball_distance
+        self.switch_width = switch_width
+
+    def get_possession_runs(self, ball_holder, team_possession, ball_contact, ball_positions):
+        """
+        Run table (RUN_COLUMNS -> array) of the spells where a player holds the ball
+        ball_holder, team_possession and ball_contact are per-frame arrays (track id / team,
+        -1 / 0 for none), ball_positions is (frames, 2) already scaled to the output units
+        """
+        num_frames = len(ball_holder)
+        if not num_frames:
+            return {name: np.empty(0, dtype=np.float64 if name.endswith(('_x', '_y')) else np.int64)
+                    for name in RUN_COLUMNS}
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(ball_holder)) + 1))
+        ends = np.append(starts[1:], num_frames)
+
+        # last touch so far at every frame, and next touch from every frame onwards
+        frames = np.arange(num_frames)
+        touching = (ball_contact == ball_holder) & (ball_holder != -1)
+        last_touch = np.maximum.accumulate(np.where(touching, frames, -1))[ends - 1]
+        first_touch = np.minimum.accumulate(np.where(touching, frames, num_frames)[::-1])[::-1][starts]
+        # hysteresis only switches the holder on a run of touches, a spell without one keeps its bounds
+        last_touch = np.where(last_touch >= starts, last_touch, ends - 1)
+        first_touch = np.where(first_touch < ends, first_touch, starts)
+
+        held = ball_holder[starts] != -1
+        return {
+            'player': ball_holder[starts][held].astype(np.int64),
+            'team': team_possession[starts][held].astype(np.int64),
+            'start': starts[held],
+            'end': ends[held],
+            'first_touch': first_touch[held],
+            'last_touch': last_touch[held],
+            'first_x': ball_positions[first_touch[held], 0],
+            'first_y': ball_positions[first_touch[held], 1],
+            'last_x': ball_positions[last_touch[held], 0],
+            'last_y': ball_positions[last_touch[held], 1],
+        }
+
+    def get_events(self, runs):
+        """
+        Event table (EVENT_COLUMNS -> array, 'type' as strings of EVENT_TYPES) from a run table,
+        one event per consecutive pair of spells that is a pass, switch or turnover
+        """
+        current = {name: np.asarray(values)[:-1] for name, values in runs.items()}
+        following = {name: np.asarray(values)[1:] for name, values in runs.items()}
+
+        start_x, start_y = current['last_x'], current['last_y']
+        end_x, end_y = following['first_x'], following['first_y']
+        distance = np.hypot(end_x - start_x, end_y - start_y)
+        flight = following['first_touch'] - current['last_touch']
+
+        known = (current['team'] != 0) & (following['team'] != 0)
+        same_team = known & (current['team'] == following['team'])
+        is_pass = same_team & (current['player'] != following['player']) & (flight <= self.max_pass_frames)
+        is_switch = is_pass & (distance >= self.long_ball_distance) & \
+            (np.abs(end_y - start_y) >= self.switch_width)
+        is_turnover = known & ~same_team
+
+        # switches are passes too, the first matching condition names the event
+        types = np.select([is_switch, is_pass, is_turnover], ['switch', 'pass', 'turnover'], default='')
+        keep = types != ''
+        return {
+            'type': types[keep],
+            'from_player': current['player'][keep],
+            'to_player': following['player'][keep],
+            'from_team': current['team'][keep],
+            'to_team': following['team'][keep],
+            'start_frame': current['last_touch'][keep],
+            'end_frame': following['first_touch'][keep],
+            'start_x': start_x[keep].astype(np.float32),
+            'start_y': start_y[keep].astype(np.float32),
+            'end_x': end_x[keep].astype(np.float32),
+            'end_y': end_y[keep].astype(np.float32),
+            'distance': distance[keep].astype(np.float32),
+        }
+
+    def get_match_events(self, tracks, possession, frame_width):
+        """
+        Runs and events of a whole match from its tracks (for the ball trajectory) and
+        possession (PossessionEngine.get_match_possession)
+        Returns {'runs': run table, 'events': event table}
+        """
+        num_frames = len(possession['ball_holder'])
+        with track_stage('events.runs', items=num_frames):
+            ball_positions = get_ball_positions(tracks, adjusted=True) * (100 / frame_width)
+            runs = self.get_possession_runs(possession['ball_holder'], possession['team_possession'],
+                                            possession['ball_contact'], ball_positions)
+        with track_stage('events.extract', items=len(runs['player'])):
+            events = self.get_events(runs)
+        return {'runs': runs, 'events': events}
+
+
+def get_event_counts(events, team_ids=(1, 2)):
+    """{team_id: {'passes', 'switches', 'turnovers_won'}} from an event table"""
+    types, from_team, to_team = events['type'], events['from_team'], events['to_team']
+    return {
+        team_id: {
+            'passes': int(((types == 'pass') & (from_team == team_id)).sum()),
+            'switches': int(((types == 'switch') & (from_team == team_id)).sum()),
+            'turnovers_won': int(((types == 'turnover') & (to_team == team_id)).sum()),
+        }
+        for team_id in team_ids
+    }
@@ -2,9 +2,12 @@ import sys
 sys.path.append('../')
 from utils import get_center_of_bbox, get_bbox_width, measure_distance
 
+# Pixels between a player's foot and the ball for possession, tuned on 1080p broadcast frames
+MAX_PLAYER_BALL_DISTANCE = 70
+
 class PlayerBallAssigner:
-    def __init__(self):
-        self.max_player_ball_distance = 70  # Maximum distance to consider a player associated with the ball
+    def __init__(self, max_player_ball_distance=MAX_PLAYER_BALL_DISTANCE):
+        self.max_player_ball_distance = max_player_ball_distance  # Maximum distance to consider a player associated with the ball
     
     def assign_ball_to_player(self, players, ball_bbox):
         ball_position = get_center_of_bbox(ball_bbox)
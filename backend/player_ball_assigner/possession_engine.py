@@ -0,0 +1,134 @@
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_frame_bboxes, get_ball_positions, get_track_teams
+from .player_ball_assigner import PlayerBallAssigner, MAX_PLAYER_BALL_DISTANCE
+
+class PossessionEngine(PlayerBallAssigner):
+    """
+    Whole-match possession built on the same foot-to-ball rule as assign_ball_to_player,
+    computed for every frame and every player at once with array operations
+    """
+    def __init__(self, min_hold_frames=5, max_player_ball_distance=MAX_PLAYER_BALL_DISTANCE):
+        super().__init__(max_player_ball_distance)
+        # A player must be closest to the ball for this many consecutive frames before
+        # possession switches to them, stops possession flickering between nearby players
+        self.min_hold_frames = min_hold_frames
+
+    def get_foot_ball_distances(self, bboxes, ball_positions):
+        """
+        Distance from the ball to the nearest foot (bottom corners of the bbox)
+        bboxes is (frames, slots, 4), ball_positions is (frames, 2)
+        Returns (frames, slots) distances, inf where the slot is padding or the ball is missing
+        """
+        ball_x = ball_positions[:, None, 0]
+        ball_y = ball_positions[:, None, 1]
+
+        dx = np.minimum(np.abs(bboxes[:, :, 0] - ball_x), np.abs(bboxes[:, :, 2] - ball_x))
+        dy = bboxes[:, :, 3] - ball_y
+        distances = np.sqrt(dx ** 2 + dy ** 2)
+
+        return np.where(np.isnan(distances), np.inf, distances)
+
+    def assign_ball_to_players(self, bboxes, ball_positions):
+        """
+        Per-frame nearest player slot within max_player_ball_distance, -1 if none
+        """
+        num_frames = bboxes.shape[0]
+        if bboxes.shape[1] == 0:
+            return np.full(num_frames, -1, dtype=np.int64)
+
+        distances = self.get_foot_ball_distances(bboxes, ball_positions)
+        nearest = np.argmin(distances, axis=1)
+        nearest_distance = distances[np.arange(num_frames), nearest]
+
+        return np.where(nearest_distance < self.max_player_ball_distance, nearest, -1)
+
+    def apply_hysteresis(self, assigned):
+        """
+        Only keep runs of the same player lasting at least min_hold_frames, the previous
+        holder keeps possession through shorter runs and frames where nobody is close
+        """
+        if len(assigned) == 0:
+            return assigned
+
+        # run-length encode the raw per-frame assignment
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(assigned)) + 1))
+        run_lengths = np.diff(np.concatenate((run_starts, [len(assigned)])))
+        run_values = assigned[run_starts]
+
+        confirmed = (run_values != -1) & (run_lengths >= self.min_hold_frames)
+
+        # forward fill the last confirmed run over the runs that follow it
+        last_confirmed = np.where(confirmed, np.arange(len(run_starts)), -1)
+        last_confirmed = np.maximum.accumulate(last_confirmed)
+        held = np.where(last_confirmed >= 0, run_values[np.maximum(last_confirmed, 0)], -1)
+
+        return np.repeat(held, run_lengths)
+
+    def get_possession_events(self, holders, holder_teams):
+        """
+        One event per change of ball holder (including the first player to get the ball)
+        holders and holder_teams are per-frame track ids and teams, -1 / 0 for none
+        """
+        change_frames = np.flatnonzero(np.diff(holders)) + 1
+        if len(holders) and holders[0] != -1:
+            change_frames = np.concatenate(([0], change_frames))
+
+        events = []
+        for frame_num in change_frames:
+            previous = holders[frame_num - 1] if frame_num > 0 else -1
+            from_team = int(holder_teams[frame_num - 1]) if frame_num > 0 else 0
+            to_team = int(holder_teams[frame_num])
+            events.append({
+                'frame': int(frame_num),
+                'from_player': int(previous),
+                'to_player': int(holders[frame_num]),
+                'from_team': from_team,
+                'to_team': to_team,
+                'turnover': from_team != 0 and from_team != to_team,
+            })
+
+        return events
+
+    def get_match_possession(self, tracks):
+        """
+        Possession for a whole match in one pass over the track table
+        Returns dict with per-frame ball holder (track id, -1 if none) and team (0 if none),
+        per-frame ball contact (nearest player's track id before hysteresis, -1 if none),
+        per-team possession percentages and possession-change events
+        """
+        frame_ids, bboxes, teams = get_frame_bboxes(tracks, 'players')
+        track_ids, track_teams = get_track_teams(frame_ids, teams)
+        return self.get_possession(frame_ids, bboxes, track_ids, track_teams, get_ball_positions(tracks))
+
+    def get_possession(self, frame_ids, bboxes, track_ids, track_teams, ball_positions):
+        """
+        get_match_possession from the match arrays: per-frame track ids (frames, slots) and bboxes
+        (frames, slots, 4) (get_frame_bboxes), sorted track ids with their majority team
+        (get_track_teams) and ball centers (frames, 2)
+        """
+        slots = self.assign_ball_to_players(bboxes, ball_positions)
+        # a trailing sentinel column maps slot -1 to "no player"
+        frame_ids = np.concatenate([frame_ids, np.full((len(frame_ids), 1), -1, dtype=np.int64)], axis=1)
+        ball_contact = frame_ids[np.arange(len(frame_ids)), slots]
+        ball_holder = self.apply_hysteresis(ball_contact)
+
+        # and a trailing sentinel team maps holder -1 to "no team"
+        rows = np.where(ball_holder >= 0, np.searchsorted(track_ids, ball_holder), len(track_ids))
+        team_possession = np.append(track_teams, 0)[rows]
+
+        team_frames = {1: int((team_possession == 1).sum()), 2: int((team_possession == 2).sum())}
+        total_frames = team_frames[1] + team_frames[2]
+        possession_percentages = {
+            team: (100 * count / total_frames if total_frames else 0.0)
+            for team, count in team_frames.items()
+        }
+
+        return {
+            'ball_holder': ball_holder,
+            'team_possession': team_possession,
+            'ball_contact': ball_contact,
+            'possession_percentages': possession_percentages,
+            'events': self.get_possession_events(ball_holder, team_possession),
+        }
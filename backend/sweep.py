@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pipeline.sweep import SWEEP_PARAMETERS, load_cached_tracks, parse_parameter, get_grid, run_sweep, \
+    get_report_rows, write_sweep
+from utils import get_pixel_scale
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Re-run formation and possession analysis over cached tracks for a grid of settings")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--video', default='input_videos/08fd33_4.mp4',
+                        help="Video already processed by main.py, its checkpoints are used")
+    source.add_argument('--checkpoint-dir', default=None,
+                        help="Checkpoints of a run with the team stage finished (default: checkpoints/<video name>)")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2',
+                        help=f"Values to sweep (repeatable), names: {', '.join(SWEEP_PARAMETERS)}")
+    parser.add_argument('--formations', default=None,
+                        help="JSON file of formation template sets, {set name: {formation: [players per line]}}, "
+                             "swept with --param formations=default,<set name>")
+    parser.add_argument('--no-camera-compensation', action='store_true',
+                        help="Analyze in raw image coordinates even when camera movement was estimated")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Worker processes, 0 for one per configuration up to the CPU count")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Threads shared out between the workers, default the CPU count")
+    parser.add_argument('--output', default=None, help="Write every configuration's results as JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    try:
+        values = dict(parse_parameter(value) for value in args.param)
+    except ValueError as e:
+        raise SystemExit(f"--param: {e}")
+    template_sets = None
+    if args.formations:
+        with open(args.formations) as f:
+            template_sets = json.load(f)
+
+    checkpoint_dir = args.checkpoint_dir or os.path.join('checkpoints', os.path.splitext(os.path.basename(args.video))[0])
+    try:
+        tracks, video_info, frame_width, frame_height = load_cached_tracks(checkpoint_dir, not args.no_camera_compensation)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+
+    grid = get_grid(values)
+    print(f"Evaluating {len(grid)} configurations on {len(tracks['players'])} cached frames...")
+    start = time.perf_counter()
+    try:
+        results = run_sweep(tracks, frame_width, frame_height, grid, template_sets,
+                            workers=args.workers or None, threads=args.threads,
+                            pixel_scale=get_pixel_scale(video_info))
+    except ValueError as e:
+        sys.exit(str(e))
+    seconds = time.perf_counter() - start
+
+    header, rows = get_report_rows(results)
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    print()
+    for row in [header] + rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+    print(f"\n{len(grid)} configurations in {seconds:.1f}s")
+
+    if args.output:
+        write_sweep(results, args.output)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
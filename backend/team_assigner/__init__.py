@@ -1 +1 @@
-from .team_assigner import TeamAssigner
\ No newline at end of file
+from .team_assigner import TeamAssigner, INHERIT_DISTANCE
\ No newline at end of file
@@ -1,9 +1,34 @@
 from sklearn.cluster import KMeans
+import sys
+sys.path.append('../')
+from utils import get_foot_position, measure_distance
+from instrumentation import track_stage
+
+# Pixels a new id may appear from a lost track to inherit its team, tuned on 1080p broadcast frames
+INHERIT_DISTANCE = 80
 
 class TeamAssigner:
-    def __init__(self):
+    def __init__(self, max_missing_frames=250, inherit_frames=25, inherit_distance=INHERIT_DISTANCE):
         self.team_colors = {}
         self.player_team_dict = {}
+
+        # Track lifecycle, active when update_tracks is called every frame:
+        # ids unseen for max_missing_frames leave player_team_dict for evicted_teams, and a new id
+        # appearing within inherit_distance pixels of where a track was last seen (in the last
+        # inherit_frames frames) takes that track's team without cropping
+        self.max_missing_frames = max_missing_frames
+        self.inherit_frames = inherit_frames
+        self.inherit_distance = inherit_distance
+        self.frame_num = None
+        self.last_seen = {}
+        self.inherited_from = set()
+        self.last_eviction = 0
+        # team of every evicted id, one byte per track id (0 = not evicted)
+        self.evicted_teams = bytearray()
+
+        self.crop_count = 0
+        self.inherited_count = 0
+        self.evicted_count = 0
     
     def get_clustering_model(self, image):
         # Reshape the image to 2D array
@@ -16,6 +41,10 @@ class TeamAssigner:
         return kmeans
 
     def get_player_color(self, frame, bbox):
+        with track_stage('team_assigner.player_color', items=1):
+            return self.get_crop_color(frame, bbox)
+
+    def get_crop_color(self, frame, bbox):
         image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])]
 
         top_half_image = image[0:int(image.shape[0]/2),:]
@@ -47,8 +76,9 @@ class TeamAssigner:
             player_color = self.get_player_color(frame, bbox)
             player_colors.append(player_color)
         
-        kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10)
-        kmeans.fit(player_colors)
+        with track_stage('team_assigner.fit', items=len(player_colors)):
+            kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10)
+            kmeans.fit(player_colors)
 
         self.kmeans = kmeans
 
@@ -56,14 +86,84 @@ class TeamAssigner:
         self.team_colors[2] = kmeans.cluster_centers_[1]
 
 
+    def update_tracks(self, frame_num, player_detections):
+        """
+        Record where every player id is in this frame and evict ids unseen for max_missing_frames
+        Call once per frame before get_player_team for that frame's players
+        """
+        self.frame_num = frame_num
+        for player_id, player_detection in player_detections.items():
+            self.last_seen[player_id] = (frame_num, get_foot_position(player_detection["bbox"]))
+
+        # sweeping a few times per eviction window keeps memory bounded without a scan every frame
+        if frame_num - self.last_eviction >= max(1, self.max_missing_frames // 10):
+            self.last_eviction = frame_num
+            self.evict_tracks(frame_num - self.max_missing_frames)
+
+    def evict_tracks(self, oldest_frame):
+        stale_ids = [player_id for player_id, (last_frame, _) in self.last_seen.items() if last_frame < oldest_frame]
+        for player_id in stale_ids:
+            del self.last_seen[player_id]
+            self.inherited_from.discard(player_id)
+            team_id = self.player_team_dict.pop(player_id, None)
+            if team_id is not None:
+                player_id = int(player_id)
+                if player_id >= len(self.evicted_teams):
+                    self.evicted_teams.extend(bytes(player_id + 1 - len(self.evicted_teams)))
+                self.evicted_teams[player_id] = int(team_id)
+                self.evicted_count += 1
+
+    def get_known_team(self, player_id):
+        """Team of a player id seen before (active or evicted) without cropping, None if unknown"""
+        if player_id in self.player_team_dict:
+            return self.player_team_dict[player_id]
+        if 0 <= player_id < len(self.evicted_teams) and self.evicted_teams[player_id]:
+            return self.evicted_teams[player_id]
+        return None
+
+    def get_inherited_team(self, player_bbox, player_id):
+        """
+        Team of the track lost closest to where this new id appeared, None when there is no such
+        track or nearby lost tracks disagree on the team
+        """
+        if self.frame_num is None:
+            return None
+
+        foot_position = get_foot_position(player_bbox)
+        candidates = []
+        for lost_id, (last_frame, position) in self.last_seen.items():
+            if last_frame >= self.frame_num or self.frame_num - last_frame > self.inherit_frames:
+                continue
+            if lost_id == player_id or lost_id in self.inherited_from or lost_id not in self.player_team_dict:
+                continue
+            distance = measure_distance(foot_position, position)
+            if distance <= self.inherit_distance:
+                candidates.append((distance, lost_id))
+
+        if not candidates or len({self.player_team_dict[lost_id] for _, lost_id in candidates}) > 1:
+            return None
+
+        _, lost_id = min(candidates)
+        # one new id per lost track
+        self.inherited_from.add(lost_id)
+        return self.player_team_dict[lost_id]
+
     def get_player_team(self, frame, player_bbox, player_id):
         if player_id in self.player_team_dict:
             return self.player_team_dict[player_id]
 
-        player_color = self.get_player_color(frame, player_bbox)
+        team_id = self.get_known_team(player_id)
+        if team_id is None:
+            team_id = self.get_inherited_team(player_bbox, player_id)
+            if team_id is not None:
+                self.inherited_count += 1
+
+        if team_id is None:
+            player_color = self.get_player_color(frame, player_bbox)
+            self.crop_count += 1
 
-        team_id = self.kmeans.predict(player_color.reshape(1,-1))[0]
-        team_id += 1
+            team_id = self.kmeans.predict(player_color.reshape(1,-1))[0]
+            team_id += 1
 
         # Player 91 is the goalkeeper (all goalkeepers are hardcoded to team 2)
         if player_id == 91:
@@ -1 +1,3 @@
-from .tracker import Tracker
\ No newline at end of file
+from .tracker import Tracker
+from .ball_tracker import BallTracker
+from .inference_server import InferenceServer, InferenceClient, serve
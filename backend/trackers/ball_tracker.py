@@ -0,0 +1,119 @@
+from collections import deque
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_center_of_bbox
+from instrumentation import track_stage
+
+class BallTracker:
+    """
+    Single ball track across frames, searched for on a small tile around where the ball is expected:
+      - the next position is extrapolated from the recent trajectory (constant velocity fit)
+      - a full-frame ball detection near that point is taken as is, no extra inference
+      - otherwise the detector runs on a tile_size tile around it at native resolution, where the
+        ball is several times larger than in the downscaled full frame
+      - after max_missed frames without the ball the track is lost and the most confident
+        full-frame ball detection starts a new one
+    Frames must be passed in order, get_state()/set_state() carry the track over a restart
+    """
+    def __init__(self, tracker, tile_size=320, tile_imgsz=None, conf=0.1, history=5, max_missed=10,
+                 gate=None):
+        self.tracker = tracker
+        self.tile_size = tile_size
+        # detector input size for the tile, larger than tile_size upsamples it
+        self.tile_imgsz = tile_imgsz or tile_size
+        self.conf = conf
+        self.history = history
+        self.max_missed = max_missed
+        # full-frame detections further than this from the predicted position are ignored while tracking
+        self.gate = tile_size if gate is None else gate
+        self.trajectory = deque(maxlen=history)
+        self.missed = 0
+        self.stats = {'frames': 0, 'full_frame': 0, 'tile': 0, 'tile_searches': 0, 'lost': 0}
+
+    def get_state(self):
+        return {'trajectory': list(self.trajectory), 'missed': self.missed, 'stats': dict(self.stats)}
+
+    def set_state(self, state):
+        self.trajectory = deque(state['trajectory'], maxlen=self.history)
+        self.missed = state['missed']
+        self.stats = dict(state['stats'])
+
+    def is_tracking(self):
+        return len(self.trajectory) > 0 and self.missed <= self.max_missed
+
+    def predict_position(self, frame_num):
+        """Ball center expected at frame_num from a least squares fit over the recent trajectory"""
+        points = np.array(self.trajectory, dtype=np.float64)
+        if len(points) == 1:
+            return points[0, 1:]
+        frames = points[:, 0] - points[-1, 0]
+        velocity = np.polyfit(frames, points[:, 1:], 1)[0]
+        return points[-1, 1:] + velocity * (frame_num - points[-1, 0])
+
+    def get_tile(self, frame, center):
+        """(x1, y1) corner of the tile around center, shifted to stay inside the frame"""
+        frame_height, frame_width = frame.shape[:2]
+        half = self.tile_size // 2
+        x1 = int(np.clip(center[0] - half, 0, max(0, frame_width - self.tile_size)))
+        y1 = int(np.clip(center[1] - half, 0, max(0, frame_height - self.tile_size)))
+        return x1, y1
+
+    def detect_tile(self, frame, center, ball_cls):
+        """Ball boxes (in frame coordinates) and confidences found on the tile around center"""
+        x1, y1 = self.get_tile(frame, center)
+        tile = frame[y1:y1 + self.tile_size, x1:x1 + self.tile_size]
+        with track_stage('ball_tracker.tile', items=1):
+            result = self.tracker.model.predict(tile, imgsz=self.tile_imgsz, conf=self.conf,
+                                                classes=[ball_cls], verbose=False)[0]
+        detections, _ = self.tracker.to_supervision(result)
+        mask = detections.class_id == ball_cls
+        return detections.xyxy[mask] + [x1, y1, x1, y1], detections.confidence[mask]
+
+    def pick_nearest(self, boxes, center, max_distance):
+        if len(boxes) == 0:
+            return None
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        distances = np.linalg.norm(centers - center, axis=1)
+        nearest = int(np.argmin(distances))
+        return boxes[nearest] if distances[nearest] <= max_distance else None
+
+    def update(self, frame_num, frame, detection_supervision, cls_names_inv):
+        """
+        Ball bbox [x1, y1, x2, y2] for this frame given its full-frame supervision detections, None if not found
+        """
+        self.stats['frames'] += 1
+        ball_cls = cls_names_inv['ball']
+        mask = detection_supervision.class_id == ball_cls
+        boxes = detection_supervision.xyxy[mask]
+        confidences = detection_supervision.confidence[mask]
+
+        bbox = None
+        if self.is_tracking():
+            center = self.predict_position(frame_num)
+            bbox = self.pick_nearest(boxes, center, self.gate)
+            if bbox is not None:
+                self.stats['full_frame'] += 1
+            else:
+                self.stats['tile_searches'] += 1
+                tile_boxes, _ = self.detect_tile(frame, center, ball_cls)
+                bbox = self.pick_nearest(tile_boxes, center, self.tile_size)
+                if bbox is not None:
+                    self.stats['tile'] += 1
+        elif len(boxes):
+            # lost, start over from the most confident full-frame detection
+            bbox = boxes[int(np.argmax(confidences))]
+            self.stats['full_frame'] += 1
+
+        if bbox is None:
+            self.missed += 1
+            if self.missed == self.max_missed + 1:
+                self.stats['lost'] += 1
+            return None
+
+        if not self.is_tracking():
+            self.trajectory.clear()
+        self.missed = 0
+        bbox = [float(value) for value in bbox]
+        self.trajectory.append((frame_num, *get_center_of_bbox(bbox)))
+        return bbox
@@ -0,0 +1,233 @@
+import time
+import threading
+import numpy as np
+from multiprocessing import current_process
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.connection import Listener, Client, wait
+import sys
+sys.path.append('../')
+from instrumentation import track_stage
+from utils import init_worker_threads
+
+
+class ServedResult:
+    """
+    One frame's detections as returned by the inference server, stands in for an ultralytics
+    result: Tracker.to_supervision() takes either
+    """
+    def __init__(self, detections, names):
+        self.detections = detections
+        self.names = names
+
+
+class InferenceClient:
+    """
+    Stands in for a Tracker's YOLO model: predict() sends the frames to the shared inference
+    server and blocks until their detections come back
+    Frames go through a shared memory buffer owned by the client rather than the connection,
+    pickling full HD frames through a pipe costs about as much as detecting them
+    One request at a time per client, a job's frames are predicted in order
+    """
+    def __init__(self, address, authkey=None):
+        # processes spawned by the same parent share its authkey
+        self.conn = Client(address, authkey=authkey or current_process().authkey)
+        self.buffer = None
+
+    def write_frames(self, frames):
+        """Copy frames into the shared buffer (grown as needed), returns their (shape, offset)"""
+        size = sum(frame.nbytes for frame in frames)
+        if self.buffer is None or self.buffer.size < size:
+            self.release_buffer()
+            self.buffer = SharedMemory(create=True, size=size)
+        layout = []
+        offset = 0
+        for frame in frames:
+            np.ndarray(frame.shape, dtype=np.uint8, buffer=self.buffer.buf, offset=offset)[...] = frame
+            layout.append((frame.shape, offset))
+            offset += frame.nbytes
+        return layout
+
+    def release_buffer(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer.unlink()
+            self.buffer = None
+
+    def predict(self, source, **kwargs):
+        """Same call as YOLO.predict for a uint8 frame or a list of them, returns a list of ServedResult"""
+        frames = source if isinstance(source, list) else [source]
+        kwargs.pop('verbose', None)
+        layout = self.write_frames(frames)
+        self.conn.send(('predict', (self.buffer.name, layout), kwargs))
+        status, payload = self.conn.recv()
+        if status == 'error':
+            raise RuntimeError(f"Inference server failed: {payload}")
+        return [ServedResult(detections, names) for detections, names in payload]
+
+    def stats(self):
+        """Server counters: requests, frames, batches and the mean batch size"""
+        self.conn.send(('stats', None, None))
+        return self.conn.recv()[1]
+
+    def close(self):
+        self.conn.close()
+        self.release_buffer()
+
+
+class InferenceServer:
+    """
+    One detector shared by every job on the host:
+      - jobs connect with an InferenceClient and send the frame batches they would predict themselves
+      - requests from all connected jobs are coalesced into batches of up to max_batch frames, a
+        batch goes out once it is full, every connected job is waiting on it, or max_wait seconds
+        after its first request arrived
+      - requests with different predict arguments (the ball tracker's tiles) are batched separately
+      - results are split back and sent to each job in the order its frames came in
+    One model in one process keeps the weights cached once and lets the inference threads work on
+    large batches, instead of every job's model competing for the same cores
+    """
+    def __init__(self, model_path, max_batch=32, max_wait=0.02, address=None, authkey=None):
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        # multiprocessing picks a unix socket or named pipe when None, clients need the final address
+        self.listener = Listener(address, authkey=authkey or current_process().authkey)
+        self.address = self.listener.address
+        self._model = None
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        # each client's shared frame buffer, attached on its first request
+        self.buffers = {}
+        self.stats = {'requests': 0, 'frames': 0, 'batches': 0, 'clients': 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path)
+        return self._model
+
+    def accept_connections(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            with self.connections_lock:
+                self.connections.append(conn)
+                self.stats['clients'] += 1
+
+    def drop(self, conn):
+        with self.connections_lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        self.detach(conn)
+        conn.close()
+
+    def detach(self, conn):
+        buffer = self.buffers.pop(conn, None)
+        if buffer is not None:
+            buffer.close()
+
+    def read_frames(self, conn, buffer_name, layout):
+        """Views of a request's frames in the client's shared buffer, nothing is copied"""
+        if conn not in self.buffers or self.buffers[conn].name != buffer_name:
+            # the client grew its buffer
+            self.detach(conn)
+            self.buffers[conn] = SharedMemory(name=buffer_name)
+        buffer = self.buffers[conn].buf
+        return [np.ndarray(shape, dtype=np.uint8, buffer=buffer, offset=offset) for shape, offset in layout]
+
+    def receive(self, timeout, pending):
+        """Read the requests of every connection ready within timeout, predict requests go to pending"""
+        with self.connections_lock:
+            connections = list(self.connections)
+        if not connections:
+            time.sleep(min(timeout, 0.05))
+            return
+        # new connections are picked up on the next call
+        for conn in wait(connections, timeout=min(timeout, 0.1)):
+            try:
+                kind, frames, kwargs = conn.recv()
+                if kind == 'predict':
+                    frames = self.read_frames(conn, *frames)
+            except (EOFError, OSError):
+                self.drop(conn)
+                continue
+            if kind == 'stats':
+                mean_batch = self.stats['frames'] / self.stats['batches'] if self.stats['batches'] else 0
+                self.send(conn, ('stats', {**self.stats, 'mean_batch': round(mean_batch, 2)}))
+            else:
+                pending.append((conn, frames, kwargs))
+
+    def predict(self, requests):
+        """Predict the frames of requests sharing the same arguments and send each its results"""
+        kwargs = dict(requests[0][2])
+        frames = [frame for _, request_frames, _ in requests for frame in request_frames]
+        try:
+            from supervision import Detections
+            detections = []
+            for i in range(0, len(frames), self.max_batch):
+                batch = frames[i:i + self.max_batch]
+                with track_stage('inference_server.predict', items=len(batch)):
+                    results = self.model.predict(batch, verbose=False, **kwargs)
+                detections += [(Detections.from_ultralytics(result), result.names) for result in results]
+                self.stats['batches'] += 1
+            self.stats['frames'] += len(frames)
+        except Exception as e:
+            for conn, _, _ in requests:
+                self.send(conn, ('error', f"{type(e).__name__}: {e}"))
+            return
+
+        start = 0
+        for conn, request_frames, _ in requests:
+            self.send(conn, ('ok', detections[start:start + len(request_frames)]))
+            start += len(request_frames)
+
+    def send(self, conn, message):
+        try:
+            conn.send(message)
+        except OSError:
+            self.drop(conn)
+
+    def serve_forever(self):
+        threading.Thread(target=self.accept_connections, daemon=True).start()
+        pending = []
+        while True:
+            self.receive(1.0, pending)
+            if not pending:
+                continue
+
+            # coalesce: wait for more requests until the batch is full, everyone waits or the deadline passes
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                with self.connections_lock:
+                    waiting_all = len({id(conn) for conn, _, _ in pending}) >= len(self.connections)
+                if waiting_all or sum(len(frames) for _, frames, _ in pending) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.receive(remaining, pending)
+
+            self.stats['requests'] += len(pending)
+            groups = {}
+            for request in pending:
+                groups.setdefault(repr(sorted(request[2].items())), []).append(request)
+            pending = []
+            for requests in groups.values():
+                self.predict(requests)
+
+
+def serve(model_path, ready_conn, max_batch=32, max_wait=0.02, threads=None):
+    """
+    Process target: start an InferenceServer, send its address on ready_conn and serve until killed
+    The authkey is the process's own, so clients spawned by the same parent can connect
+    threads budgets the server's thread pools (torch included), None leaves the defaults
+    """
+    if threads is not None:
+        init_worker_threads(threads)
+    server = InferenceServer(model_path, max_batch=max_batch, max_wait=max_wait)
+    ready_conn.send(server.address)
+    ready_conn.close()
+    server.serve_forever()
@@ -8,21 +8,103 @@ import cv2
 import sys
 sys.path.append('../')
 from utils import get_center_of_bbox, get_bbox_width
+from instrumentation import track_stage
+from .inference_server import InferenceClient, ServedResult
 
 class Tracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, inference_address=None):
+        self.model_path = model_path
+        # Address of a shared InferenceServer, detection then runs there instead of on an own model
+        self.inference_address = inference_address
+        self._model = None
+        self.tracker = sv.ByteTrack()
+
+    def reset_tracking(self):
+        # New ByteTrack state for the next video, the detection model stays loaded
         self.tracker = sv.ByteTrack()
     
-    def detect_frames(self, frames):
+    @property
+    def model(self):
+        # Loaded on first use so tracking cached detections doesn't need the weights
+        if self._model is None:
+            if self.inference_address is not None:
+                self._model = InferenceClient(self.inference_address)
+            else:
+                self._model = YOLO(self.model_path)
+        return self._model
+    
+    def close(self):
+        # Disconnect from the inference server and free the shared frame buffer, the next predict reconnects
+        if isinstance(self._model, InferenceClient):
+            self._model.close()
+            self._model = None
+
+    def detect_frames(self, frames, before_batch=None):
         # Sending frames in batches to avoid memory issues
+        # before_batch() is called ahead of every batch, raising from it stops detection
         batch_size = 20
         detections = []
         for i in range(0, len(frames), batch_size):
-            detections_batch = self.model.predict(frames[i:i+batch_size], conf=0.1)
+            if before_batch is not None:
+                before_batch()
+            batch = frames[i:i+batch_size]
+            with track_stage('tracker.predict', items=len(batch)):
+                detections_batch = self.model.predict(batch, conf=0.1, verbose=False)
             detections += detections_batch
         return detections
 
+    def to_supervision(self, detection):
+        """
+        Convert an ultralytics (or inference server) result to supervision format with goalkeepers merged into players
+        Returns (detection_supervision, cls_names_inv)
+        """
+        cls_names = detection.names
+        # Replace key as value and value as key to invert dictionary 
+        # {0: 'person', 1: 'goal', ...} -> {'person': 0, 'goal': 1, ...}
+        cls_names_inv = {v:k for k, v in cls_names.items()}
+        
+        # Covert to supervision detection format, the inference server already did
+        if isinstance(detection, ServedResult):
+            detection_supervision = detection.detections
+        else:
+            detection_supervision = sv.Detections.from_ultralytics(detection)
+
+        # Convert goalkeeper object to player object for tracking 
+        for object_id, class_id in enumerate(detection_supervision.class_id):
+            if class_id == cls_names_inv['goalkeeper']:
+                detection_supervision.class_id[object_id] = cls_names_inv['player']
+
+        return detection_supervision, cls_names_inv
+
+    def add_frame_tracks(self, tracks, detection_supervision, cls_names_inv):
+        """
+        Run ByteTrack on one frame of supervision detections and append it to tracks
+        """
+        # Track objects
+        with track_stage('tracker.bytetrack', items=1):
+            detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
+
+        tracks["players"].append({})
+        tracks["referees"].append({})
+        tracks["ball"].append({})
+
+        for frame_detection in detection_with_tracks:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+            track_id = frame_detection[4]
+
+            if cls_id == cls_names_inv['player']:
+                tracks["players"][-1][track_id] = {"bbox":bbox}
+            
+            if cls_id == cls_names_inv['referee']:
+                tracks["referees"][-1][track_id] = {"bbox":bbox}
+
+        # Keep the most confident ball when there are several
+        ball_ids = np.flatnonzero(detection_supervision.class_id == cls_names_inv['ball'])
+        if len(ball_ids):
+            best = ball_ids[np.argmax(detection_supervision.confidence[ball_ids])]
+            tracks["ball"][-1][1] = {"bbox":detection_supervision.xyxy[best].tolist()}
+
     def get_object_tracks(self, frames, read_from_stub = False, stub_path = None):
         
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
@@ -39,48 +121,12 @@ class Tracker:
             "ball": []
         }
 
-        for frame_num, detection in enumerate(detections):
-            cls_names = detection.names
-            # Replace key as value and value as key to invert dictionary 
-            # {0: 'person', 1: 'goal', ...} -> {'person': 0, 'goal': 1, ...}
-            cls_names_inv = {v:k for k, v in cls_names.items()}
-            print(cls_names)
-            
-            # Covert to supervision detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
-
-            # Convert goalkeeper object to player object for tracking 
-            for object_id, class_id in enumerate(detection_supervision.class_id):
-                if class_id == cls_names_inv['goalkeeper']:
-                    detection_supervision.class_id[object_id] = cls_names_inv['player']
-
-            # Track objects
-            detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
-
-            tracks["players"].append({})
-            tracks["referees"].append({})
-            tracks["ball"].append({})
-
-            for frame_detection in detection_with_tracks:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                track_id = frame_detection[4]
-
-                if cls_id == cls_names_inv['player']:
-                    tracks["players"][frame_num][track_id] = {"bbox":bbox}
-                
-                if cls_id == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][track_id] = {"bbox":bbox}
-
-            for frame_detection in detection_supervision:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-
-                if cls_id == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox":bbox}
+        for detection in detections:
+            detection_supervision, cls_names_inv = self.to_supervision(detection)
+            self.add_frame_tracks(tracks, detection_supervision, cls_names_inv)
 
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
                 pickle.dump(tracks, f)
         
-        return tracks
\ No newline at end of file
+        return tracks
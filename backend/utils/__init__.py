@@ -1,2 +1,6 @@
-from .video_utils import read_video
-from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance
\ No newline at end of file
+from .video_utils import read_video, get_video_info, read_video_chunks, read_video_frames, BackgroundVideoWriter
+from .bbox_utils import get_center_of_bbox, get_track_position, get_bbox_width, get_foot_position, measure_distance
+from .track_utils import get_frame_bboxes, get_frame_arrays, get_ball_positions, get_track_teams
+from .image_utils import ImageWriter
+from .thread_budget import ThreadBudget, STAGE_LIBRARIES, get_cpu_count, init_worker_threads
+from .transcode import ANALYSIS_PROFILE, transcode_video, needs_transcode, get_analysis_frame, get_pixel_scale
@@ -2,9 +2,19 @@ def get_center_of_bbox(bbox):
     x1, y1, x2, y2 = bbox
     return int((x1 + x2) / 2), int((y1 + y2) / 2)
 
+def get_track_position(track):
+    """Camera-compensated position when the track has one, else its bbox center"""
+    if 'position_adjusted' in track:
+        return track['position_adjusted']
+    return get_center_of_bbox(track['bbox'])
+
 def get_bbox_width(bbox):
     x1, y1, x2, y2 = bbox
     return int(x2 - x1)
 
+def get_foot_position(bbox):
+    x1, y1, x2, y2 = bbox
+    return int((x1 + x2) / 2), int(y2)
+
 def measure_distance(p1, p2):
     return ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2) ** 0.5
\ No newline at end of file
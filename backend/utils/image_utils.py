@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+
+class ImageWriter:
+    """
+    Encode and write images on background threads, cv2.imwrite releases the GIL while
+    encoding so several images compress at once while the caller keeps drawing
+    At most max_pending images wait in memory, write() blocks beyond that
+    Images must not be modified after they are handed to write()
+    """
+    def __init__(self, max_workers=4, max_pending=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = []
+
+    def write(self, path, image):
+        self.slots.acquire()
+        try:
+            self.futures.append(self.executor.submit(self.encode_and_write, path, image))
+        except Exception:
+            self.slots.release()
+            raise
+
+    def encode_and_write(self, path, image):
+        try:
+            if not cv2.imwrite(str(path), image):
+                raise IOError(f"Could not write image: {path}")
+        finally:
+            self.slots.release()
+
+    def close(self):
+        """Wait for every write, raises the first write error"""
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.executor.shutdown()
+            self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # already failing, don't mask the original error with a write error
+            self.executor.shutdown()
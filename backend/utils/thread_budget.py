@@ -0,0 +1,95 @@
+import os
+import sys
+
+# Thread pool sizes OpenMP, BLAS and torch read once when they load
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                   'NUMEXPR_NUM_THREADS']
+
+LIBRARIES = ('torch', 'blas', 'opencv')
+
+# Library doing each stage's heavy lifting, it gets the process's whole budget while the
+# others are held at one thread. blas covers the OpenMP and BLAS pools of numpy, scipy and
+# sklearn (KMeans), torch only matters where detection runs in the process
+STAGE_LIBRARIES = {
+    'ingest': ('opencv',),
+    'decode': (),
+    'detect': ('torch',),
+    'track': (),
+    'camera': ('opencv',),
+    'team': ('blas',),
+    'formation': ('blas',),
+    'render': ('opencv',),
+    'video': ('opencv',),
+}
+
+
+def get_cpu_count():
+    """CPUs this process may run on (affinity and cgroup cpusets included where the OS reports them)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class ThreadBudget:
+    """
+    Threads one worker process may use, split between torch, OpenMP/BLAS and OpenCV per stage
+    so several workers on a host don't each start a full-size thread pool per library:
+      - environ() holds the pools to the budget from process start, set it before the libraries load
+      - apply(stage) sets the stage's libraries to the budget and the others to one thread, for
+        libraries that are already loaded (torch and sklearn are never imported by it)
+    """
+    def __init__(self, threads, stage_libraries=None):
+        self.threads = max(1, int(threads))
+        self.stage_libraries = STAGE_LIBRARIES if stage_libraries is None else stage_libraries
+
+    @classmethod
+    def for_workers(cls, workers, cpus=None):
+        """Equal share of the host's CPUs for each of workers processes"""
+        return cls(max(1, (cpus or get_cpu_count()) // max(1, workers)))
+
+    def get_stage_threads(self, stage=None):
+        """
+        {library: threads} for a stage, every library gets the budget when stage is None or unknown
+        openmp is the OpenMP runtimes' size: torch and sklearn's loops both run on OpenMP (and may
+        share one runtime), so it is the larger of the two
+        """
+        libraries = self.stage_libraries.get(stage, LIBRARIES)
+        threads = {library: self.threads if library in libraries else 1 for library in LIBRARIES}
+        threads['openmp'] = max(threads['torch'], threads['blas'])
+        return threads
+
+    def environ(self):
+        return {name: str(self.threads) for name in THREAD_ENV_VARS}
+
+    def apply(self, stage=None):
+        """Resize the thread pools of the loaded libraries for stage, returns the thread counts"""
+        threads = self.get_stage_threads(stage)
+
+        import cv2
+        cv2.setNumThreads(threads['opencv'])
+
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.get_num_threads() != threads['torch']:
+            torch.set_num_threads(threads['torch'])
+
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            # pools keep the size environ() gave them at start
+            pass
+        else:
+            # by API, an unqualified limit would also cap the OpenMP runtime torch just sized.
+            # openmp is never below torch's count, so torch keeps its threads either way
+            threadpool_limits(limits=threads['blas'], user_api='blas')
+            threadpool_limits(limits=threads['openmp'], user_api='openmp')
+
+        return threads
+
+
+def init_worker_threads(threads):
+    """
+    Process pool initializer: budget the worker's thread pools before anything heavy is loaded
+    """
+    budget = ThreadBudget(threads)
+    os.environ.update(budget.environ())
+    budget.apply()
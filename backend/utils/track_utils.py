@@ -0,0 +1,87 @@
+import numpy as np
+
+def get_frame_bboxes(tracks, object_type='players'):
+    """
+    Per-frame padded bboxes of the detections in each frame for whole-match vectorized analysis,
+    one column per detection slot (not per track id) so memory stays linear in match length
+    however often the tracker hands out new ids; slots are in track id order within a frame
+    Returns (track_ids, bboxes, teams):
+      track_ids - (frames, slots) int array, -1 padding
+      bboxes    - (frames, slots, 4) array of bboxes, NaN padding
+      teams     - (frames, slots) int array, 0 padding or unknown team
+    """
+    frames = tracks[object_type]
+    slots = max((len(frame) for frame in frames), default=0)
+
+    track_ids = np.full((len(frames), slots), -1, dtype=np.int64)
+    bboxes = np.full((len(frames), slots, 4), np.nan)
+    teams = np.zeros((len(frames), slots), dtype=np.int64)
+
+    for frame_num, frame in enumerate(frames):
+        for slot, track_id in enumerate(sorted(frame)):
+            track = frame[track_id]
+            track_ids[frame_num, slot] = track_id
+            bboxes[frame_num, slot] = track['bbox']
+            teams[frame_num, slot] = track.get('team', 0)
+
+    return track_ids, bboxes, teams
+
+def get_ball_positions(tracks, adjusted=False):
+    """
+    Ball center for every frame as a (frames, 2) array, NaN where the ball wasn't detected
+    Centers are truncated to whole pixels like get_center_of_bbox
+    adjusted uses the camera-compensated position when the ball track has one
+    """
+    positions = np.full((len(tracks['ball']), 2), np.nan)
+    for frame_num, ball in enumerate(tracks['ball']):
+        if 1 in ball:
+            if adjusted and 'position_adjusted' in ball[1]:
+                positions[frame_num] = ball[1]['position_adjusted']
+            else:
+                x1, y1, x2, y2 = ball[1]['bbox']
+                positions[frame_num] = (x1 + x2) / 2, (y1 + y2) / 2
+    return np.trunc(positions)
+
+def get_track_teams(track_ids, teams):
+    """
+    Majority team per track from per-frame (frames, slots) track id and team arrays
+    Returns (track_ids, track_teams): sorted unique track ids and their team, 0 for tracks never assigned
+    """
+    valid = track_ids >= 0
+    unique_ids, rows = np.unique(track_ids[valid], return_inverse=True)
+    slot_teams = teams[valid]
+    team1_votes = np.bincount(rows, weights=slot_teams == 1, minlength=len(unique_ids))
+    team2_votes = np.bincount(rows, weights=slot_teams == 2, minlength=len(unique_ids))
+    track_teams = np.where(team2_votes > team1_votes, 2, 1)
+    return unique_ids, np.where(team1_votes + team2_votes > 0, track_teams, 0)
+
+def get_frame_arrays(tracks, object_type='players', whole_pixels=False):
+    """
+    Per-frame padded arrays of the detections in each frame, compact for long matches
+    (one column per detection slot, not per track id)
+    whole_pixels truncates bbox centers like get_center_of_bbox, matching get_track_position
+    Returns (track_ids, positions, teams):
+      track_ids - (frames, slots) int array, -1 padding
+      positions - (frames, slots, 2) float array of camera-compensated positions when the
+                  tracks have them (else bbox centers), NaN padding
+      teams     - (frames, slots) int array, 0 padding or unknown team
+    """
+    frames = tracks[object_type]
+    slots = max((len(frame) for frame in frames), default=0)
+
+    track_ids = np.full((len(frames), slots), -1, dtype=np.int64)
+    positions = np.full((len(frames), slots, 2), np.nan)
+    teams = np.zeros((len(frames), slots), dtype=np.int64)
+
+    for frame_num, frame in enumerate(frames):
+        for slot, (track_id, track) in enumerate(frame.items()):
+            track_ids[frame_num, slot] = track_id
+            if 'position_adjusted' in track:
+                positions[frame_num, slot] = track['position_adjusted']
+            else:
+                x1, y1, x2, y2 = track['bbox']
+                center = (x1 + x2) / 2, (y1 + y2) / 2
+                positions[frame_num, slot] = (int(center[0]), int(center[1])) if whole_pixels else center
+            teams[frame_num, slot] = track.get('team', 0)
+
+    return track_ids, positions, teams
@@ -0,0 +1,95 @@
+import math
+import os
+import cv2
+from .video_utils import get_video_info, BackgroundVideoWriter
+
+# Canonical analysis profile: frames no taller than this, at most this frame rate, and a
+# keyframe every keyframe_interval frames so seeking to a resume point decodes little
+ANALYSIS_PROFILE = {'max_height': 720, 'max_fps': 25, 'keyframe_interval': 25}
+
+
+def get_analysis_size(width, height, max_height):
+    """Frame size scaled down (never up) to max_height, aspect kept and both sides even"""
+    if not max_height or height <= max_height:
+        return width, height
+    scale = max_height / height
+    return int(round(width * scale / 2)) * 2, int(max_height) // 2 * 2
+
+
+def get_analysis_fps(source_fps, max_fps):
+    """Frame rate of the analysis video, the source's when it is already at most max_fps"""
+    if not max_fps or not source_fps or source_fps <= max_fps:
+        return source_fps
+    return float(max_fps)
+
+
+def get_analysis_frame(source_frame, source_fps, fps):
+    """
+    Analysis frame shown at a source frame: the source frames with the same floor(frame * fps / source_fps)
+    map to one analysis frame, the first of them is the one transcode_video keeps
+    """
+    if not source_fps or not fps or fps >= source_fps:
+        return source_frame
+    return int(math.floor(source_frame * fps / source_fps + 1e-9))
+
+
+def get_pixel_scale(video_info):
+    """
+    Analysis pixels per input pixel (decode stage video info): pixel thresholds are tuned on
+    the input's resolution and multiplied by it, so a transcoded copy behaves like the input
+    """
+    source = video_info.get('source')
+    return 1.0 if source is None else video_info['height'] / source['height']
+
+
+def needs_transcode(video_info, profile=ANALYSIS_PROFILE):
+    """True when the video is larger or faster than the profile"""
+    size = get_analysis_size(video_info['width'], video_info['height'], profile.get('max_height'))
+    fps = get_analysis_fps(video_info['fps'], profile.get('max_fps'))
+    return size != (video_info['width'], video_info['height']) or fps != video_info['fps']
+
+
+def transcode_video(source_path, path, profile=ANALYSIS_PROFILE, codec='mp4v', before_frame=None):
+    """
+    Re-encode a video to the analysis profile: scaled down, frames dropped evenly down to
+    max_fps and a keyframe every keyframe_interval frames where the writer backend supports
+    setting it (FFmpeg's mp4v default of one every 12 frames otherwise)
+    Dropped frames are only grabbed, not converted, and a background thread encodes while the
+    next frames are decoded. The file is written under a temporary name and renamed once complete
+    before_frame is called before each source frame is decoded (cancellation checks)
+    Returns the video info of the written file plus 'source' with the original's
+    """
+    source_info = get_video_info(source_path)
+    size = get_analysis_size(source_info['width'], source_info['height'], profile.get('max_height'))
+    fps = get_analysis_fps(source_info['fps'], profile.get('max_fps')) or 25
+
+    tmp_path = f"{path}.tmp{os.path.splitext(path)[1]}"
+    params = [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, int(profile['keyframe_interval'])] \
+        if profile.get('keyframe_interval') else []
+    cap = cv2.VideoCapture(source_path)
+    try:
+        with BackgroundVideoWriter(tmp_path, fps, size, codec=codec, params=params) as writer:
+            source_frame = 0
+            last_frame = -1
+            while True:
+                if before_frame is not None:
+                    before_frame()
+                if not cap.grab():
+                    break
+                frame_num = get_analysis_frame(source_frame, source_info['fps'], fps)
+                source_frame += 1
+                if frame_num == last_frame:
+                    continue
+                last_frame = frame_num
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                if (frame.shape[1], frame.shape[0]) != size:
+                    # bilinear like the detector's own letterbox resize, INTER_AREA costs 2-3x more
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+                writer.write(frame)
+    finally:
+        cap.release()
+    os.replace(tmp_path, path)
+
+    return {'frame_count': writer.frame_count, 'fps': fps, 'width': size[0], 'height': size[1], 'source': source_info}
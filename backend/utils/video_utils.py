@@ -1,3 +1,5 @@
+import queue
+import threading
 import cv2
 
 def read_video(video_path):
@@ -12,3 +14,115 @@ def read_video(video_path):
     cap.release()
     return frames
 
+def get_video_info(video_path):
+    """Returns frame count, fps and frame size of a video without decoding it."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    info = {
+        'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    }
+    cap.release()
+    return info
+
+def open_video(video_path):
+    """VideoCapture of a video, raises instead of reading no frames when it can't be opened (e.g. deleted)."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+    return cap
+
+def read_video_chunks(video_path, chunk_size, start_frame=0):
+    """Yields (first_frame_num, frames) chunks of a video, starting at start_frame."""
+    cap = open_video(video_path)
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_num = start_frame
+    chunk = []
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        chunk.append(frame)
+        if len(chunk) == chunk_size:
+            yield frame_num, chunk
+            frame_num += len(chunk)
+            chunk = []
+    if chunk:
+        yield frame_num, chunk
+    cap.release()
+
+def read_video_frames(video_path, start_frame=0):
+    """Yields (frame_num, frame) one frame at a time, starting at start_frame."""
+    cap = open_video(video_path)
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frame_num = start_frame
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_num, frame
+        frame_num += 1
+    cap.release()
+
+class BackgroundVideoWriter:
+    """
+    Encode frames into a video file on a dedicated thread, cv2.VideoWriter releases the GIL
+    while encoding so the caller decodes and draws the next frames meanwhile
+    At most max_pending frames wait in memory, write() blocks beyond that
+    Frames must not be modified after they are handed to write()
+    """
+    def __init__(self, path, fps, frame_size, codec='mp4v', max_pending=8, params=None):
+        self.path = str(path)
+        # params are cv2.VIDEOWRITER_PROP_* pairs, e.g. the keyframe interval
+        self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*codec), fps, frame_size, params or [])
+        if not self.writer.isOpened():
+            raise IOError(f"Could not open video writer: {self.path} ({codec})")
+        self.frames = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.frame_count = 0
+        self.thread = threading.Thread(target=self.encode_frames, daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.frames.put(frame)
+
+    def encode_frames(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                # keep draining so write() never blocks on a dead writer
+                continue
+            try:
+                self.writer.write(frame)
+                self.frame_count += 1
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """Wait for every queued frame and finish the file, raises the first encoding error"""
+        self.frames.put(None)
+        self.thread.join()
+        self.writer.release()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # already failing, don't mask the original error with an encoding error
+            self.frames.put(None)
+            self.thread.join()
+            self.writer.release()
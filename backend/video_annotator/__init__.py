@@ -0,0 +1 @@
+from .video_annotator import VideoAnnotator
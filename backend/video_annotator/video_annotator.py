@@ -0,0 +1,133 @@
+import numpy as np
+import cv2
+import sys
+sys.path.append('../')
+from utils import get_center_of_bbox, get_bbox_width
+
+REFEREE_COLOR = (0, 255, 255)
+BALL_COLOR = (0, 255, 0)
+BALL_HOLDER_COLOR = (0, 0, 255)
+TEXT_COLOR = (255, 255, 255)
+
+# Top-left overlay with each team's formation and possession so far
+PANEL_ORIGIN = (20, 20)
+PANEL_SIZE = (420, 90)
+
+
+def to_color(color):
+    return tuple(int(channel) for channel in color)
+
+
+class VideoAnnotator:
+    """
+    Draws match overlays on video frames in place, nothing is copied per frame:
+      - team-colored ellipses under players with their track id, yellow ellipses under referees
+      - a triangle over the ball and a red one over the player holding it
+      - a panel with each team's current formation and possession up to that frame
+    Possession and formation labels per frame are worked out once up front
+    scale maps track coordinates onto the frames, for tracks of a downscaled copy of the video
+    """
+    def __init__(self, tracks, possession, formations=None, formation_timeline=None, scale=1.0):
+        self.tracks = tracks
+        self.scale = scale
+        self.ball_holder = np.asarray(possession['ball_holder'])
+
+        # possession share up to every frame from cumulative frame counts
+        team_possession = np.asarray(possession['team_possession'])
+        team1 = np.cumsum(team_possession == 1)
+        team2 = np.cumsum(team_possession == 2)
+        total = np.maximum(team1 + team2, 1)
+        self.possession_percentages = {1: 100 * team1 / total, 2: 100 * team2 / total}
+
+        self.formation_labels = {
+            team_id: self.get_formation_labels(team_id, len(tracks['players']), formations, formation_timeline)
+            for team_id in (1, 2)
+        }
+
+    def get_formation_labels(self, team_id, num_frames, formations, formation_timeline):
+        """
+        Formation shown on every frame: the window's formation from the timeline when there
+        is one, else the latest snapshot formation (start, middle, end) at or before the frame
+        """
+        labels = np.full(num_frames, '', dtype=object)
+        if formation_timeline and formation_timeline.get(team_id):
+            windows = formation_timeline[team_id]
+            for formation in windows:
+                start, end = formation['window']
+                labels[start:end + 1] = formation['formation']
+            # frames after the last window keep its label
+            labels[windows[-1]['window'][1] + 1:] = windows[-1]['formation']
+            return labels
+
+        for _, formation in sorted((formations or {}).get(team_id, []), key=lambda item: item[1]['frame_num']):
+            labels[formation['frame_num']:] = formation['formation']
+        # frames before the first snapshot show it too
+        first = next((label for label in labels if label), '')
+        labels[labels == ''] = first
+        return labels
+
+    def scale_bbox(self, bbox):
+        if self.scale == 1.0:
+            return bbox
+        return [coordinate * self.scale for coordinate in bbox]
+
+    def draw_ellipse(self, frame, bbox, color, track_id=None):
+        bbox = self.scale_bbox(bbox)
+        y2 = int(bbox[3])
+        x_center, _ = get_center_of_bbox(bbox)
+        width = get_bbox_width(bbox)
+
+        cv2.ellipse(frame, center=(x_center, y2), axes=(int(width), int(0.35 * width)), angle=0.0,
+                    startAngle=-45, endAngle=235, color=color, thickness=2, lineType=cv2.LINE_4)
+
+        if track_id is not None:
+            x1_rect, y1_rect = x_center - 20, y2 + 5
+            cv2.rectangle(frame, (x1_rect, y1_rect), (x1_rect + 40, y1_rect + 20), color, cv2.FILLED)
+            cv2.putText(frame, f"{track_id}", (x1_rect + 8, y1_rect + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                        (0, 0, 0), 2)
+
+    def draw_triangle(self, frame, bbox, color):
+        bbox = self.scale_bbox(bbox)
+        y = int(bbox[1])
+        x, _ = get_center_of_bbox(bbox)
+        points = np.array([[x, y], [x - 10, y - 20], [x + 10, y - 20]])
+        cv2.drawContours(frame, [points], 0, color, cv2.FILLED)
+        cv2.drawContours(frame, [points], 0, (0, 0, 0), 2)
+
+    def draw_panel(self, frame, frame_num):
+        lines = [
+            f"Team {team_id}: {self.formation_labels[team_id][frame_num] or '-'}   "
+            f"Possession {self.possession_percentages[team_id][frame_num]:.0f}%"
+            for team_id in (1, 2)
+        ]
+        text_width = max(cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0][0] for line in lines)
+
+        x1, y1 = PANEL_ORIGIN
+        height, width = frame.shape[:2]
+        x2, y2 = min(width, x1 + max(PANEL_SIZE[0], text_width + 24)), min(height, y1 + PANEL_SIZE[1])
+        # darken the panel area in place instead of blending a copied overlay
+        panel = frame[y1:y2, x1:x2]
+        np.right_shift(panel, 1, out=panel)
+
+        for row, line in enumerate(lines):
+            cv2.putText(frame, line, (x1 + 12, y1 + 35 + 35 * row), cv2.FONT_HERSHEY_SIMPLEX, 0.7, TEXT_COLOR, 2)
+
+    def draw_frame(self, frame, frame_num):
+        """Draw every overlay of frame_num onto frame, returns the same frame"""
+        if frame_num >= len(self.tracks['players']):
+            return frame
+
+        holder = self.ball_holder[frame_num]
+        for track_id, player in self.tracks['players'][frame_num].items():
+            self.draw_ellipse(frame, player['bbox'], to_color(player.get('team_color', (0, 0, 255))), track_id)
+            if track_id == holder:
+                self.draw_triangle(frame, player['bbox'], BALL_HOLDER_COLOR)
+
+        for referee in self.tracks['referees'][frame_num].values():
+            self.draw_ellipse(frame, referee['bbox'], REFEREE_COLOR)
+
+        for ball in self.tracks['ball'][frame_num].values():
+            self.draw_triangle(frame, ball['bbox'], BALL_COLOR)
+
+        self.draw_panel(frame, frame_num)
+        return frame
@@ -40,9 +40,9 @@ export default function ResultsPage() {
           
           // Automatically fetch AI analysis
           fetchAnalysis()
-        } else if (data.status === "failed") {
+        } else if (data.status === "failed" || data.status === "cancelled") {
           clearInterval(pollInterval)
-          setError(data.error || "Processing failed")
+          setError(data.error || (data.status === "cancelled" ? "Processing was cancelled" : "Processing failed"))
           setStatus("failed")
         } else {
           setStatus(data.status)